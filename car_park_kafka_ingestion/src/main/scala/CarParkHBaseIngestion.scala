@@ -9,6 +9,8 @@ import org.apache.hadoop.hbase.util.Bytes
 import com.fasterxml.jackson.databind.ObjectMapper
 import java.util.Properties
 import java.io.FileInputStream
+import java.time.LocalDateTime
+import java.time.format.DateTimeFormatter
 import scala.collection.JavaConverters._
 import org.apache.kafka.clients.consumer.ConsumerRecord
 
@@ -16,6 +18,9 @@ object CarParkHBaseIngestion {
 
   val HBASE_TABLE = "ayaachi_parking_availability_latest"
   val KAFKA_TOPIC = "ayaachi_car_park"
+  val RECORD_TIME_FORMAT = DateTimeFormatter.ofPattern("dd-MM-yyyy H:mm:ss")
+  // Same as latest_consumer.py, so the chatbot's row cache can compare the stream with the row
+  val LAST_UPDATED_FORMAT = DateTimeFormatter.ofPattern("yyyy-MM-dd HH:mm:ss")
 
   def main(args: Array[String]): Unit = {
     if (args.length < 1) {
@@ -75,6 +80,10 @@ object CarParkHBaseIngestion {
                 val trafficCondition = json.get("traffic_condition_nearby").asText()
                 val latitude = json.get("latitude").asDouble()
                 val longitude = json.get("longitude").asDouble()
+                val lastUpdated = LocalDateTime.parse(
+                  s"${json.get("last_updated_date").asText()} ${json.get("last_updated_time").asText()}",
+                  RECORD_TIME_FORMAT
+                ).format(LAST_UPDATED_FORMAT)
 
                 // Calculation: Capacity - Occupancy - QueueLength
                 val availableOccupancy = capacity - occupancy - queueLength
@@ -91,6 +100,7 @@ object CarParkHBaseIngestion {
                 put.addColumn(family, Bytes.toBytes("traffic_condition"), Bytes.toBytes(trafficCondition))
                 put.addColumn(family, Bytes.toBytes("latitude"), Bytes.toBytes(latitude.toString))
                 put.addColumn(family, Bytes.toBytes("longitude"), Bytes.toBytes(longitude.toString))
+                put.addColumn(family, Bytes.toBytes("last_updated"), Bytes.toBytes(lastUpdated))
 
                 table.put(put)
                 successCount += 1
@@ -1,15 +1,26 @@
 
+import gc
 import os
 import json
 import logging
-from flask import Flask, request, jsonify, send_from_directory
-from openai import OpenAI
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 
 # Import the AI configurations and tools
 from tool_conf import TOOL_LIST, AVAILABLE_FUNCTIONS
-from prompts import SYSTEM_PROMPT
-from tools import initialize_rag
-from ingest import create_vector_db
+from prompts import PHRASING_PROMPT, SYSTEM_PROMPT
+from tools import (BASE_DIRECTORY, config_data, initialize_rag, initialize_local_engine, hive_result_cache,
+                   hive_pool, hbase_pool, hbase_row_cache, embedding_cache_stats, geocode_cache,
+                   prewarm_geocode_cache, GEOCODING_PREWARM, query_guard, get_car_park_locations,
+                   get_car_park_statuses, rank_car_parks, start_stream_listeners)
+from session_store import create_session_store, compact_history, message_to_dict, new_session_id
+from metrics import (REGISTRY, AGENT_ITERATIONS, CHAT_REQUEST_SECONDS, Trace, record_llm_call, record_route,
+                     record_tool_call, span, use_trace)
+from intent_router import IntentRouter, render_ranking, render_status
+from result_format import format_rows
 
 MODEL = "gpt-3.5-turbo"
 
@@ -18,23 +29,162 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 app = Flask(__name__, static_folder='public')
 
-# Init OpenAI client
-client = OpenAI(
-    api_key=os.environ.get("OPENAI_API_KEY"),
-)
+# OpenAI client, created on the first model call (importing openai takes most of the startup time)
+client = None
+client_lock = threading.Lock()
+
+def get_client():
+    global client
+    with client_lock:
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI(
+                api_key=os.environ.get("OPENAI_API_KEY"),
+            )
+    return client
 
 # A dictionary to map tool names to actual functions
 available_functions = AVAILABLE_FUNCTIONS
 
+# Bounded pool for running the blocking pyhive/happybase/FAISS tool calls concurrently
+CHAT_CONFIG = config_data.get("chat", {})
+tool_executor = ThreadPoolExecutor(
+    max_workers=CHAT_CONFIG.get("tool_workers", 8),
+    thread_name_prefix="tool",
+)
+
+# Server-side conversation history
+SESSION_CONFIG = config_data.get("sessions", {})
+session_store = create_session_store(SESSION_CONFIG, base_dir=BASE_DIRECTORY)
+
+def compact(messages):
+    return compact_history(
+        messages,
+        token_budget=SESSION_CONFIG.get("token_budget", 6000),
+        max_tool_output_chars=SESSION_CONFIG.get("max_tool_output_chars", 4000),
+    )
+
+# Fast path for templated questions
+ROUTER_CONFIG = dict(config_data.get("router", {}))
+ROUTER_ENABLED = ROUTER_CONFIG.pop("enabled", True)
+ROUTER_PHRASING = ROUTER_CONFIG.pop("phrasing", "template")
+intent_router = IntentRouter(lambda: get_car_park_locations().names, **ROUTER_CONFIG)
+
+def lookup_route(route):
+    """Runs the lookup behind a route. Returns (column names, rows, templated answer)."""
+    if route.intent == "car_park_status":
+        statuses = get_car_park_statuses(route.system_code_numbers)
+        if all(status is None for status in statuses.values()):
+            raise ValueError(f"no data for {', '.join(route.system_code_numbers)}")
+        names = ["system_code_number"] + list(route.fields) + ["as_of", "source"]
+        rows = [[lot] + [status.get(name) for name in names[1:]] for lot, status in statuses.items() if status]
+        return names, rows, render_status(route, statuses)
+
+    ranking = route.ranking
+    rows = rank_car_parks(ranking.metric, top=ranking.top, ascending=ranking.ascending)
+    return ["system_code_number", ranking.metric, "as_of"], rows, render_ranking(route, rows)
+
+def route_request(messages, trace):
+    """
+    Runs the intent router on the latest user message and, when it is
+    confident, the lookup behind the route. Returns (question, column
+    names, rows, templated answer), or None to use the agent loop. The path
+    taken is recorded on `trace` and in chatbot_router_decisions_total.
+    """
+    last = messages[-1] if messages else None
+    if not ROUTER_ENABLED or not isinstance(last, dict) or last.get("role") != "user":
+        record_route(trace, "agent", "disabled" if not ROUTER_ENABLED else "no_question")
+        return None
+    question = last.get("content") or ""
+    try:
+        with use_trace(trace):
+            with span("router"):
+                route, reason = intent_router.route(question)
+            if route is not None:
+                names, rows, answer = lookup_route(route)
+    except Exception as e:
+        logging.warning(f"Fast path failed, using the agent loop: {e}")
+        route, reason = None, "lookup_failed"
+    if route is None:
+        record_route(trace, "agent", reason)
+        return None
+    logging.info(f"Fast path answered a {route.intent} question")
+    record_route(trace, "fast", route.intent)
+    return question, names, rows, answer
+
+def phrasing_messages(question, names, rows):
+    """The single model call that phrases a fast-path answer: the question and the looked-up data, no tools."""
+    return [
+        {"role": "system", "content": PHRASING_PROMPT},
+        {"role": "user", "content": f"Question: {question}\n\nData:\n{format_rows(names, rows)}"},
+    ]
+
+# Tool execution
+def run_tool_call(function_name, arguments, trace):
+    """Runs a single tool requested by the model and returns its output as a string."""
+    logging.info(f"Model requested to call function: {function_name}")
+    started = time.perf_counter()
+    with use_trace(trace):
+        try:
+            function_to_call = available_functions[function_name]
+            with span("serialize:tool_arguments"):
+                function_args = json.loads(arguments or "{}")
+            result = function_to_call(**function_args)
+        except Exception as e:
+            logging.error(f"Tool {function_name} failed: {e}", exc_info=True)
+            result = f"Error running tool {function_name}: {e}"
+    record_tool_call(trace, function_name, started, result)
+    return result
+
+def submit_tool_calls(tool_calls, trace):
+    """Submits all tool calls of one model turn to the tool executor."""
+    return [
+        tool_executor.submit(run_tool_call, tool_call["function"]["name"], tool_call["function"]["arguments"], trace)
+        for tool_call in tool_calls
+    ]
+
+def tool_message(tool_call, content):
+    return {
+        "tool_call_id": tool_call["id"],
+        "role": "tool",
+        "name": tool_call["function"]["name"],
+        "content": content,
+    }
+
+def tool_calls_as_dicts(tool_calls):
+    return [
+        {
+            "id": tool_call.id,
+            "type": "function",
+            "function": {"name": tool_call.function.name, "arguments": tool_call.function.arguments},
+        }
+        for tool_call in tool_calls
+    ]
+
 # Chat handling
-def handle_chat_interaction(messages):
+def handle_chat_interaction(messages, trace=None):
     """
     Handles the main chat interaction loop with the OpenAI model,
-    including tool calls.
+    including tool calls. Independent tool calls from the same model
+    turn are executed concurrently. Model and tool calls are timed into
+    `trace`. Questions the intent router recognizes skip the loop.
     """
+    trace = trace or Trace()
+    fast = route_request(messages, trace)
+    if fast is not None:
+        question, names, rows, answer = fast
+        if ROUTER_PHRASING == "llm":
+            started = time.perf_counter()
+            response = get_client().chat.completions.create(model=MODEL, messages=phrasing_messages(question, names, rows))
+            record_llm_call(trace, MODEL, started, response.choices[0].finish_reason, response.usage)
+            answer = response.choices[0].message.content
+        messages.append({"role": "assistant", "content": answer})
+        return messages[-1]
+
     # Loop until the model gives a final answer ('stop')
     while True:
-        response = client.chat.completions.create(
+        started = time.perf_counter()
+        response = get_client().chat.completions.create(
             model=MODEL,
             messages=messages,
             tools=TOOL_LIST,
@@ -42,25 +192,16 @@ def handle_chat_interaction(messages):
         )
 
         choice = response.choices[0]
+        record_llm_call(trace, MODEL, started, choice.finish_reason, response.usage)
         response_message = choice.message
         messages.append(response_message)  # Append the response to history
 
         # If the model wants to call tools, handle them
         if choice.finish_reason == 'tool_calls':
-            for tool_call in response_message.tool_calls:
-                function_name = tool_call.function.name
-                logging.info(f"Model requested to call function: {function_name}")
-                function_to_call = available_functions[function_name]
-                function_args = json.loads(tool_call.function.arguments)
-                function_response = function_to_call(**function_args)
-                messages.append(
-                    {
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": function_response,
-                    }
-                )
+            tool_calls = tool_calls_as_dicts(response_message.tool_calls)
+            futures = submit_tool_calls(tool_calls, trace)
+            for tool_call, future in zip(tool_calls, futures):
+                messages.append(tool_message(tool_call, future.result()))
             # Go back to the start of the loop to let the model process the tool results
             continue
 
@@ -75,6 +216,154 @@ def handle_chat_interaction(messages):
     # The last message in the history is the final reply
     return messages[-1]
 
+def format_sse(event, data):
+    """Formats a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_chat_interaction(messages, trace=None, timings=False):
+    """
+    Streaming variant of `handle_chat_interaction`. Yields server-sent events:
+    `tool_start`/`tool_end` while tools run, `token` for each piece of the
+    final answer and `done` with the complete assistant message (and the
+    timing breakdown of `trace` when `timings` is set).
+    """
+    trace = trace or Trace()
+    fast = route_request(messages, trace)
+    if fast is not None:
+        question, names, rows, answer = fast
+        if ROUTER_PHRASING == "llm":
+            started = time.perf_counter()
+            stream = get_client().chat.completions.create(
+                model=MODEL,
+                messages=phrasing_messages(question, names, rows),
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            answer, finish_reason, usage = "", None, None
+            for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                if chunk.choices[0].delta.content:
+                    answer += chunk.choices[0].delta.content
+                    yield format_sse("token", {"content": chunk.choices[0].delta.content})
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+            record_llm_call(trace, MODEL, started, finish_reason, usage)
+        else:
+            yield format_sse("token", {"content": answer})
+        messages.append({"role": "assistant", "content": answer})
+        done = {"reply": messages[-1]}
+        if timings:
+            done["timings"] = trace.summary()
+        yield format_sse("done", done)
+        return
+
+    while True:
+        started = time.perf_counter()
+        stream = get_client().chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            tools=TOOL_LIST,
+            tool_choice="auto",
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+
+        content = ""
+        tool_calls = {}
+        finish_reason = None
+        usage = None
+        for chunk in stream:
+            # With include_usage the last chunk carries the token counts and no choices
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            delta = choice.delta
+            if delta.content:
+                content += delta.content
+                yield format_sse("token", {"content": delta.content})
+            # Tool calls arrive as fragments, keyed by their index in the turn
+            for fragment in delta.tool_calls or []:
+                tool_call = tool_calls.setdefault(
+                    fragment.index,
+                    {"id": None, "type": "function", "function": {"name": "", "arguments": ""}},
+                )
+                if fragment.id:
+                    tool_call["id"] = fragment.id
+                if fragment.function and fragment.function.name:
+                    tool_call["function"]["name"] += fragment.function.name
+                if fragment.function and fragment.function.arguments:
+                    tool_call["function"]["arguments"] += fragment.function.arguments
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+        record_llm_call(trace, MODEL, started, finish_reason, usage)
+
+        assistant_message = {"role": "assistant", "content": content or None}
+        if finish_reason == 'tool_calls':
+            ordered_calls = [tool_calls[index] for index in sorted(tool_calls)]
+            assistant_message["tool_calls"] = ordered_calls
+            messages.append(assistant_message)
+
+            futures = submit_tool_calls(ordered_calls, trace)
+            pending = {future: tool_call for future, tool_call in zip(futures, ordered_calls)}
+            for tool_call in ordered_calls:
+                yield format_sse("tool_start", {"id": tool_call["id"], "name": tool_call["function"]["name"]})
+            for future in as_completed(pending):
+                tool_call = pending[future]
+                yield format_sse("tool_end", {"id": tool_call["id"], "name": tool_call["function"]["name"]})
+            for tool_call, future in zip(ordered_calls, futures):
+                messages.append(tool_message(tool_call, future.result()))
+            continue
+
+        if finish_reason != 'stop':
+            logging.warning(f"Unexpected finish reason: {finish_reason}")
+        messages.append(assistant_message)
+        done = {"reply": assistant_message}
+        if timings:
+            done["timings"] = trace.summary()
+        yield format_sse("done", done)
+        return
+
+def prepare_messages(data):
+    """
+    Returns the session id and the conversation history for a request.
+
+    Clients send a `session_id` and the new `message`; the history is kept on
+    the server. A request without a known `session_id` starts a new session.
+    Requests that still post the full `messages` array are served statelessly.
+    """
+    if 'messages' in data:
+        messages = data['messages']
+
+        # Add the system prompt on the first conversation
+        if len(messages) == 1:
+            messages.insert(0, {"role": "system", "content": SYSTEM_PROMPT})
+        return None, messages
+
+    session_id = data.get('session_id')
+    messages = session_store.get(session_id) if session_id else None
+    if messages is None:
+        session_id = new_session_id()
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    messages.append({"role": "user", "content": data['message']})
+    return session_id, compact(messages)
+
+def save_session(session_id, messages):
+    if session_id is not None:
+        with span("serialize:session"):
+            session_store.save(session_id, compact(messages))
+
+def wants_timings(data):
+    """A per-request timing breakdown is returned when the body or query string sets `timings`."""
+    return bool(data.get('timings')) or request.args.get('timings', '').lower() in ('1', 'true', 'yes')
+
+def finish_request(endpoint, trace, status):
+    CHAT_REQUEST_SECONDS.observe(time.perf_counter() - trace.started, endpoint=endpoint, status=status)
+    AGENT_ITERATIONS.observe(trace.iterations)
+
 # --- Flask Web Routes ---
 @app.route('/')
 def index():
@@ -89,26 +378,122 @@ def chat():
     """
     The main web endpoint for handling chat requests.
     """
+    trace = Trace()
     try:
-        data = request.get_json()
-        messages = data['messages']
+        with use_trace(trace):
+            data = request.get_json()
+            session_id, messages = prepare_messages(data)
 
-        # Add the system prompt on the first conversation
-        if len(messages) == 1:
-            messages.insert(0, {"role": "system", "content": SYSTEM_PROMPT})
+            # Call chat handler
+            final_reply = handle_chat_interaction(messages, trace)
+            save_session(session_id, messages)
 
-        # Call chat handler
-        final_reply = handle_chat_interaction(messages)
-
-        return jsonify({'reply': final_reply.to_dict()})
+            with span("serialize:response"):
+                body = {'reply': message_to_dict(final_reply), 'session_id': session_id}
+            if wants_timings(data):
+                body['timings'] = trace.summary()
+        finish_request('chat', trace, 'ok')
+        return jsonify(body)
 
     except Exception as e:
         logging.error(f"An error occurred: {e}", exc_info=True)
+        finish_request('chat', trace, 'error')
         return jsonify({'error': 'Error processing your request'}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    Streaming chat endpoint. Sends tool progress and then the answer tokens
+    to the client as server-sent events.
+    """
+    data = request.get_json()
+    session_id, messages = prepare_messages(data)
+    timings = wants_timings(data)
+    trace = Trace()
+
+    def generate():
+        try:
+            if session_id is not None:
+                yield format_sse("session", {"session_id": session_id})
+            yield from stream_chat_interaction(messages, trace, timings)
+            save_session(session_id, messages)
+            finish_request('chat_stream', trace, 'ok')
+        except Exception as e:
+            logging.error(f"An error occurred: {e}", exc_info=True)
+            finish_request('chat_stream', trace, 'error')
+            yield format_sse("error", {"error": "Error processing your request"})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """
+    Reports the Hive result, HBase row, query embedding and geocode cache counters, the query guard's
+    decisions and connection pool usage.
+    """
+    return jsonify({
+        'hive_result_cache': hive_result_cache.stats(),
+        'hbase_row_cache': hbase_row_cache.stats(),
+        'embedding_cache': embedding_cache_stats(),
+        'geocode_cache': geocode_cache.stats(),
+        'query_guard': query_guard.stats(),
+        'connection_pools': [hive_pool.stats(), hbase_pool.stats()],
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Request, model, tool and backend latency histograms and token counters in
+    the Prometheus text format.
+    """
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+# Startup
+SERVING_CONFIG = config_data.get("serving", {})
+
+def initialize(preload=False):
+    """
+    Loads the state every request shares: the embedding model and FAISS
+    index, the local analytics engine and the geocode cache.
+
+    With `preload` (the pre-fork server, see gunicorn.conf.py) this runs once
+    in the master before the workers fork, so they share it instead of each
+    loading a copy: the index is memory-mapped read-only, the geocode cache
+    is prewarmed before returning, pooled connections are closed so no
+    socket is shared across processes, and the loaded objects are moved out
+    of the garbage collector's reach so collections in the workers do not
+    copy their pages.
+    """
+    # Updates the FAISS index in place
+    initialize_rag(mmap_index=preload and SERVING_CONFIG.get("mmap_index", True))
+    initialize_local_engine()
+    if GEOCODING_PREWARM:
+        prewarm = prewarm_geocode_cache()
+        if preload:
+            prewarm.join()
+    if preload:
+        hive_pool.close_all()
+        hbase_pool.close_all()
+        # Imported once for all workers; each creates its own client (and HTTP connections) on first use
+        import openai
+        gc.collect()
+        gc.freeze()
+    else:
+        start_stream_listeners()
+
+def after_fork():
+    """Starts the per-process background work in a freshly forked worker."""
+    start_stream_listeners()
+    torch = sys.modules.get("torch")
+    if torch is not None and SERVING_CONFIG.get("torch_threads"):
+        # Keeps the workers from oversubscribing the cores with intra-op threads
+        torch.set_num_threads(SERVING_CONFIG["torch_threads"])
+
 if __name__ == '__main__':
-    # Initialize the RAG system on startup
-    create_vector_db()
-    initialize_rag()
+    initialize()
     # RUN ITTTT!!!!!
     app.run(host='0.0.0.0', port=3030, debug=True)
@@ -0,0 +1,174 @@
+"""
+Drives `/api/chat` end to end with every external service replaced by a
+deterministic local stand-in (see fakes.py), so changes to app.py and
+tools.py can be measured reproducibly and offline.
+
+- OpenAI: a fake chat completions server replays the tool-call scripts of
+  `--scenarios` (benchmarks/chat_scenarios.json by default), costing
+  `--llm-ms` per call plus `--llm-us-per-token` per prompt token.
+- Hive: SQLite over data/dataset.csv, `--hive-ms` per statement.
+- HBase: the latest record of each car park, `--hbase-ms` per round trip.
+- Nominatim: `--geocode-ms` per request.
+- The knowledge base is indexed with a deterministic fake embedding model.
+
+The Flask app runs in-process on a threaded server and `--requests`
+questions (cycling through the scenarios) are posted by `--concurrency`
+clients. The report has throughput, p50/p95/p99 latency, the per-scenario
+p50 and path (fast path or agent loop), and where the time went (from the
+`timings` breakdown). `--no-router` sends every question through the agent
+loop; `--phrasing llm` phrases fast-path answers with one model call.
+
+Usage (from the chatbot/ directory):
+    python benchmarks/bench_chat_agent.py --requests 200 --concurrency 8
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from openai import OpenAI
+from werkzeug.serving import make_server
+
+import app
+import tools
+from connection_pool import ConnectionPool
+from embedding_cache import EmbeddingCache
+from fakes import (FakeChatCompletionsServer, FakeHBaseConnection, FakeHBaseTable, FakeHiveDatabase,
+                   latest_hbase_rows, load_scenarios, make_fake_reverse)
+from geocode_cache import GeocodeCache
+from ingest import update_vector_db
+
+SCENARIOS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chat_scenarios.json")
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def install_backend_fakes(args, counters):
+    """Points the Hive, HBase and geocoding tools at the local stand-ins."""
+    database = FakeHiveDatabase()
+    tools.hive_pool = ConnectionPool("hive", lambda: database.connect(args.hive_ms / 1000), **tools.HIVE_POOL_CONFIG)
+    hbase_table = FakeHBaseTable(latest_hbase_rows(), args.hbase_ms / 1000, counters)
+    tools.hbase_pool = ConnectionPool("hbase", lambda: FakeHBaseConnection(hbase_table), **tools.HBASE_POOL_CONFIG)
+    tools.hbase_row_cache.pool = tools.hbase_pool
+    tools.geocode_cache = GeocodeCache()
+    tools.geocode_cache._reverse = make_fake_reverse(args.geocode_ms / 1000, counters)
+
+    if args.no_caches:
+        tools.hive_result_cache.enabled = False
+        tools.hbase_row_cache.enabled = False
+    return database
+
+
+def install_fakes(args, index_dir, counters):
+    """Points the tools at the local stand-ins, with the knowledge base indexed by a fake embedding model."""
+    database = install_backend_fakes(args, counters)
+    embeddings = DeterministicFakeEmbedding(size=384)
+    tools.vector_db = update_vector_db(tools.KNOWLEDGE_BASE_PATH, index_dir, embeddings=embeddings)
+    tools.query_embedding_cache = EmbeddingCache(embeddings)
+    return database
+
+
+def post_chat(url, question):
+    body = json.dumps({"message": question, "timings": True}).encode("utf-8")
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=120) as response:
+            payload = json.loads(response.read())
+            status = response.status
+    except urllib.error.HTTPError as e:
+        payload, status = {}, e.code
+    return question, (time.perf_counter() - start) * 1000, status, payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--scenarios", default=SCENARIOS_PATH, help="JSON file of scripted conversations.")
+    parser.add_argument("--llm-ms", type=float, default=50.0)
+    parser.add_argument("--llm-us-per-token", type=float, default=0.0)
+    parser.add_argument("--hive-ms", type=float, default=200.0)
+    parser.add_argument("--hbase-ms", type=float, default=2.0)
+    parser.add_argument("--geocode-ms", type=float, default=150.0)
+    parser.add_argument("--no-caches", action="store_true", help="Disable the Hive result and HBase row caches.")
+    parser.add_argument("--no-router", action="store_true", help="Send every question through the agent loop.")
+    parser.add_argument("--phrasing", choices=["template", "llm"], default=app.ROUTER_PHRASING,
+                        help="How fast-path answers are phrased.")
+    parser.add_argument("--warmup", type=int, default=1, help="Passes over the scenarios before measuring.")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    scenarios = load_scenarios(args.scenarios)
+    questions = list(scenarios)
+    counters = {"round_trips": 0, "requests": 0}
+
+    llm = FakeChatCompletionsServer(scenarios, args.llm_ms / 1000, args.llm_us_per_token / 1e6).start()
+    app.client = OpenAI(api_key="benchmark", base_url=llm.base_url, max_retries=0)
+    app.ROUTER_ENABLED = not args.no_router
+    app.ROUTER_PHRASING = args.phrasing
+    with tempfile.TemporaryDirectory() as index_dir:
+        database = install_fakes(args, index_dir, counters)
+        tools.initialize_local_engine()
+        server = make_server("127.0.0.1", 0, app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, name="chat-server", daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/api/chat"
+
+        for _ in range(args.warmup):
+            for question in questions:
+                post_chat(url, question)
+        llm.calls, counters["round_trips"], counters["requests"] = 0, 0, 0
+
+        workload = [questions[index % len(questions)] for index in range(args.requests)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(lambda question: post_chat(url, question), workload))
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+    llm.stop()
+
+    latencies = sorted(latency for _, latency, _, _ in results)
+    errors = sum(status != 200 for _, _, status, _ in results)
+    print(f"{args.requests} chat requests over {len(questions)} scenarios ({database.rows} Hive rows), "
+          f"concurrency {args.concurrency}, caches {'off' if args.no_caches else 'on'}, "
+          f"router {'off' if args.no_router else 'on (' + args.phrasing + ' phrasing)'}")
+    print(f"LLM {args.llm_ms} ms/call, Hive {args.hive_ms} ms/statement, HBase {args.hbase_ms} ms/round trip, "
+          f"Nominatim {args.geocode_ms} ms/request\n")
+    print(f"throughput {args.requests / elapsed:8.1f} req/s | p50 {percentile(latencies, 0.50):8.1f} ms | "
+          f"p95 {percentile(latencies, 0.95):8.1f} ms | p99 {percentile(latencies, 0.99):8.1f} ms | {errors} errors")
+    print(f"LLM calls {llm.calls} | HBase round trips {counters['round_trips']} | "
+          f"Nominatim requests {counters['requests']}\n")
+
+    print("p50 by scenario:")
+    for question in questions:
+        scenario_results = [(latency, payload) for asked, latency, _, payload in results if asked == question]
+        scenario_latencies = sorted(latency for latency, _ in scenario_results)
+        paths = {payload.get("timings", {}).get("path") for _, payload in scenario_results}
+        print(f"  {percentile(scenario_latencies, 0.5):8.1f} ms  {'/'.join(sorted(map(str, paths))):<6} {question}")
+
+    totals = {}
+    for _, _, _, payload in results:
+        for kind, milliseconds in payload.get("timings", {}).get("totals_ms", {}).items():
+            totals.setdefault(kind, []).append(milliseconds)
+    print("\nmean time per request by span kind:")
+    for kind, values in sorted(totals.items(), key=lambda item: -sum(item[1])):
+        print(f"  {kind:<10} {sum(values) / len(results):8.1f} ms  (in {len(values)} requests, "
+              f"median {statistics.median(values):.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
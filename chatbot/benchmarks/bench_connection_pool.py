@@ -0,0 +1,147 @@
+"""
+Compares per-call latency of the pooled Hive/HBase connections against the
+original open/close-per-call behaviour of the chatbot tools.
+
+HiveServer2 and the HBase Thrift server are replaced by local stub servers
+that speak a tiny line protocol over TCP: opening a session costs
+`--hive-handshake-ms` / `--hbase-handshake-ms` (standing in for the
+Thrift + SASL + OpenSession round trips) and every request costs
+`--query-ms`.
+
+Usage (from the chatbot/ directory):
+    python benchmarks/bench_connection_pool.py --calls 200 --concurrency 8
+"""
+import argparse
+import os
+import socket
+import socketserver
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_pool import ConnectionPool
+
+
+class StubThriftHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            command = line.strip()
+            if command == b"OPEN":
+                time.sleep(self.server.handshake_s)
+            elif command == b"QUERY":
+                time.sleep(self.server.query_s)
+            else:
+                break
+            self.wfile.write(b"OK\n")
+            self.wfile.flush()
+
+
+class StubThriftServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_ms, query_ms):
+        super().__init__(("127.0.0.1", 0), StubThriftHandler)
+        self.handshake_s = handshake_ms / 1000.0
+        self.query_s = query_ms / 1000.0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+class StubConnection:
+    """A client session against a stub server, shaped like the Thrift clients."""
+
+    def __init__(self, port):
+        self.sock = socket.create_connection(("127.0.0.1", port))
+        self.reader = self.sock.makefile("rb")
+        self._call(b"OPEN")
+
+    def _call(self, command):
+        self.sock.sendall(command + b"\n")
+        return self.reader.readline()
+
+    def query(self):
+        return self._call(b"QUERY")
+
+    def is_open(self):
+        return self.sock.fileno() != -1
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+def run_unpooled(port):
+    conn = StubConnection(port)
+    try:
+        return conn.query()
+    finally:
+        conn.close()
+
+
+def run_pooled(pool):
+    with pool.connection() as conn:
+        return conn.query()
+
+
+def measure(fn, calls, concurrency):
+    def timed(_):
+        start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - start) * 1000
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(timed, range(calls)))
+    wall = time.perf_counter() - wall_start
+    return {
+        "mean": statistics.mean(latencies),
+        "p50": latencies[int(0.50 * (len(latencies) - 1))],
+        "p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "throughput": calls / wall,
+    }
+
+
+def report(label, stats):
+    print(f"{label:<22} mean {stats['mean']:8.2f} ms | p50 {stats['p50']:8.2f} ms | "
+          f"p95 {stats['p95']:8.2f} ms | {stats['throughput']:8.1f} calls/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--hive-handshake-ms", type=float, default=40.0)
+    parser.add_argument("--hbase-handshake-ms", type=float, default=5.0)
+    parser.add_argument("--query-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    backends = [
+        ("hive", StubThriftServer(args.hive_handshake_ms, args.query_ms)),
+        ("hbase", StubThriftServer(args.hbase_handshake_ms, args.query_ms)),
+    ]
+
+    print(f"{args.calls} calls, concurrency {args.concurrency}, pool size {args.pool_size}\n")
+    for name, server in backends:
+        port = server.server_address[1]
+        pool = ConnectionPool(
+            name,
+            lambda: StubConnection(port),
+            max_size=args.pool_size,
+            health_check=StubConnection.is_open,
+        )
+
+        report(f"{name} open/close", measure(lambda: run_unpooled(port), args.calls, args.concurrency))
+        report(f"{name} pooled", measure(lambda: run_pooled(pool), args.calls, args.concurrency))
+        print(f"{name} pool stats: {pool.stats()}\n")
+
+        pool.close_all()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Measures CPU time per `search_knowledge_base` query embedding with and
+without the query embedding cache.
+
+The workload replays a log of Step-1 style keyword searches (the same few
+topics with varying case, spacing and punctuation) from several threads at
+once. By default a fake model that burns CPU like a forward pass (a fixed
+cost per call plus a cost per text) stands in for all-MiniLM-L6-v2; pass
+`--real-model` to use the sentence transformer.
+
+Usage (from the chatbot/ directory):
+    python benchmarks/bench_embedding_cache.py --lookups 400 --threads 8
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+TOPICS = [
+    "hive schema car park occupancy", "latest occupancy hbase", "parking availability table",
+    "queue length traffic condition", "special day occupancy", "hbase row key format",
+    "ayaachi_parking_avail_data columns", "available occupancy calculation", "car park capacity",
+    "record timestamp format", "busiest car park", "vehicle type distribution",
+]
+
+
+class CpuBoundFakeEmbedding:
+    """Deterministic embeddings that cost CPU like a model forward pass."""
+
+    def __init__(self, call_ms, text_ms, size=384):
+        self.call_ms = call_ms
+        self.text_ms = text_ms
+        self.size = size
+
+    def _burn(self, ms):
+        end = time.thread_time() + ms / 1000
+        while time.thread_time() < end:
+            pass
+
+    def embed_documents(self, texts):
+        self._burn(self.call_ms + self.text_ms * len(texts))
+        return [np.random.default_rng(abs(hash(text)) % 2 ** 32).random(self.size).tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def query_log(lookups, seed=7):
+    rng = random.Random(seed)
+    log = []
+    for _ in range(lookups):
+        topic = rng.choice(TOPICS)
+        variant = rng.choice([topic, topic.title(), f"  {topic} ", f"{topic}?", topic.upper()])
+        log.append(variant)
+    return log
+
+
+def run(label, embed, log, threads):
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(embed, log))
+    cpu = (time.process_time() - cpu_start) * 1000
+    wall = (time.perf_counter() - wall_start) * 1000
+    print(f"{label:<34} {cpu / len(log):10.3f} {wall:10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--call-ms", type=float, default=8.0, help="Fake model cost per forward pass.")
+    parser.add_argument("--text-ms", type=float, default=2.0, help="Fake model cost per text in a batch.")
+    parser.add_argument("--real-model", action="store_true", help="Use the real sentence transformer.")
+    args = parser.parse_args()
+
+    if args.real_model:
+        from ingest import get_embeddings_model
+        model = get_embeddings_model()
+    else:
+        model = CpuBoundFakeEmbedding(args.call_ms, args.text_ms)
+
+    log = query_log(args.lookups)
+    print(f"{args.lookups} lookups of {len(TOPICS)} topics from {args.threads} threads\n")
+    print(f"{'':<34} {'cpu ms/op':>10} {'wall ms':>10}")
+
+    run("no cache (embed every call)", model.embed_query, log, args.threads)
+
+    cold = EmbeddingCache(model, max_entries=1024)
+    run("cache, cold", cold.embed_query, log, args.threads)
+    run("cache, warm", cold.embed_query, log, args.threads)
+
+    # Distinct queries only: every lookup misses, so batching is all that helps
+    distinct = [f"{topic} variant {index}" for index, topic in enumerate(log)]
+    run("no cache, all distinct", model.embed_query, distinct, args.threads)
+    batched = EmbeddingCache(model, max_entries=1024)
+    run("cache, all distinct (batched)", batched.embed_query, distinct, args.threads)
+    print(f"\nbatching: {batched.stats()}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "embedding_cache.npz")
+        cold.persist_path = path
+        cold.save()
+        restarted = EmbeddingCache(model, max_entries=1024, persist_path=path)
+        run("after restart (persisted cache)", restarted.embed_query, log, args.threads)
+
+
+if __name__ == "__main__":
+    main()
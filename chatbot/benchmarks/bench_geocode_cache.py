@@ -0,0 +1,91 @@
+"""
+Compares `get_location_from_longitude_latitude` lookups through the
+persistent geocode cache with the original one Nominatim request per call.
+
+Nominatim is replaced by an in-process fake that answers after `--rpc-ms`
+(public Nominatim allows one request per second, so the real cost of a
+miss is much higher). The workload asks for the addresses of `--lots` car
+parks, with the coordinates jittered below the cache precision as they
+would be after a round trip through HBase strings. The offline run answers
+from a gazetteer written from the warmed cache, with no network at all.
+
+Usage (from the chatbot/ directory):
+    python benchmarks/bench_geocode_cache.py --lookups 500
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from geocode_cache import GeocodeCache
+
+CENTRE = (26.1445, 91.7362)
+
+
+def make_fake_reverse(rpc_s, counter):
+    def reverse(query, timeout=None):
+        counter["requests"] += 1
+        time.sleep(rpc_s)
+        latitude, longitude = query.split(",") if isinstance(query, str) else query
+        return SimpleNamespace(raw={"lat": str(latitude), "lon": str(longitude),
+                                    "display_name": f"Car park near {float(latitude):.4f}, {float(longitude):.4f}"})
+    return reverse
+
+
+def run(label, lookup, requests, counter):
+    counter["requests"] = 0
+    start = time.perf_counter()
+    for latitude, longitude in requests:
+        lookup(latitude, longitude)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / len(requests) * 1000:8.3f} ms per lookup | {counter['requests']} network requests")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--lots", type=int, default=14)
+    parser.add_argument("--rpc-ms", type=float, default=150.0)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    lots = [(CENTRE[0] + rng.uniform(-0.02, 0.02), CENTRE[1] + rng.uniform(-0.02, 0.02)) for _ in range(args.lots)]
+    requests = []
+    for _ in range(args.lookups):
+        latitude, longitude = rng.choice(lots)
+        requests.append((latitude + rng.uniform(-1e-7, 1e-7), longitude + rng.uniform(-1e-7, 1e-7)))
+
+    counter = {"requests": 0}
+    fake_reverse = make_fake_reverse(args.rpc_ms / 1000, counter)
+    print(f"{args.lookups} lookups over {args.lots} car parks, {args.rpc_ms} ms per Nominatim request\n")
+    run("Nominatim per call", lambda latitude, longitude: fake_reverse((latitude, longitude)).raw,
+        requests[:min(50, len(requests))], counter)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache_path = os.path.join(directory, "geocode_cache.json")
+        cache = GeocodeCache(cache_path=cache_path)
+        cache._reverse = fake_reverse
+        counter["requests"] = 0
+        start = time.perf_counter()
+        cache.prewarm(lots)
+        print(f"{'prewarm':<28} {time.perf_counter() - start:8.3f} s total      | {counter['requests']} network requests")
+        run("geocode cache (warm)", cache.reverse, requests, counter)
+
+        restarted = GeocodeCache(cache_path=cache_path)
+        restarted._reverse = fake_reverse
+        run("geocode cache (restarted)", restarted.reverse, requests, counter)
+
+        offline = GeocodeCache(offline=True, gazetteer_path=cache_path)
+        run("offline gazetteer", offline.reverse, requests, counter)
+        moved = [(latitude + 0.0005, longitude) for latitude, longitude in requests]
+        run("offline gazetteer, 55 m off", offline.reverse, moved, counter)
+        print(f"\noffline stats: {offline.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Compares latest-availability lookups through the HBase row cache with the
+original one `table.row()` round trip per lookup.
+
+The HBase Thrift server is replaced by an in-process fake table of
+`--lots` car parks that charges `--rpc-ms` per round trip (plus
+`--row-us` per row returned). The workload is a stream of single and
+multi-car-park lookups, mostly for a few popular car parks, from several
+threads, with rows invalidated by a simulated ingestion stream.
+
+Usage (from the chatbot/ directory):
+    python benchmarks/bench_hbase_cache.py --lookups 2000 --concurrency 8
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connection_pool import ConnectionPool
+from hbase_cache import HBaseRowCache, decode_row
+
+TABLE = "ayaachi_parking_availability_latest"
+
+
+class FakeTable:
+    def __init__(self, rows, rpc_s, row_s, counter):
+        self._rows = rows
+        self.rpc_s = rpc_s
+        self.row_s = row_s
+        self.counter = counter
+
+    def _round_trip(self, rows):
+        self.counter["round_trips"] += 1
+        time.sleep(self.rpc_s + self.row_s * rows)
+
+    def row(self, row_key):
+        self._round_trip(1)
+        return dict(self._rows.get(row_key.encode("utf-8"), {}))
+
+    def rows(self, row_keys):
+        self._round_trip(len(row_keys))
+        return [(key.encode("utf-8"), dict(self._rows[key.encode("utf-8")]))
+                for key in row_keys if key.encode("utf-8") in self._rows]
+
+    def scan(self, limit=None):
+        items = list(self._rows.items())[:limit]
+        self._round_trip(len(items))
+        return iter(items)
+
+
+class FakeConnection:
+    def __init__(self, table):
+        self._table = table
+
+    def table(self, name):
+        return self._table
+
+
+def make_rows(lots):
+    rows = {}
+    for index in range(lots):
+        rows[f"BHMBCC{index:05d}".encode("utf-8")] = {
+            b"data:capacity": b"500", b"data:occupancy": str(index % 500).encode("utf-8"),
+            b"data:available_occupancy": str(500 - index % 500).encode("utf-8"),
+        }
+    return rows
+
+
+def workload(lots, lookups, seed=3):
+    rng = random.Random(seed)
+    names = [f"BHMBCC{index:05d}" for index in range(lots)]
+    popular = names[:5]
+    requests = []
+    for _ in range(lookups):
+        if rng.random() < 0.2:
+            requests.append(rng.sample(names, min(3, lots)))
+        else:
+            requests.append([rng.choice(popular) if rng.random() < 0.8 else rng.choice(names)])
+    return requests
+
+
+def run(label, lookup, requests, concurrency, counter):
+    counter["round_trips"] = 0
+
+    def timed(keys):
+        start = time.perf_counter()
+        lookup(keys)
+        return (time.perf_counter() - start) * 1000
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(timed, requests))
+    wall = time.perf_counter() - wall_start
+    print(f"{label:<24} mean {statistics.mean(latencies):7.3f} ms | p50 {latencies[len(latencies) // 2]:7.3f} ms | "
+          f"p95 {latencies[int(0.95 * (len(latencies) - 1))]:7.3f} ms | {len(requests) / wall:8.0f} lookups/s | "
+          f"{counter['round_trips']} round trips")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--lots", type=int, default=14)
+    parser.add_argument("--rpc-ms", type=float, default=2.0)
+    parser.add_argument("--row-us", type=float, default=20.0)
+    parser.add_argument("--ttl", type=float, default=5.0)
+    parser.add_argument("--stream-rate", type=float, default=50.0, help="Invalidations per second from the stream.")
+    args = parser.parse_args()
+
+    counter = {"round_trips": 0}
+    table = FakeTable(make_rows(args.lots), args.rpc_ms / 1000, args.row_us / 1e6, counter)
+    pool = ConnectionPool("hbase", lambda: FakeConnection(table), max_size=args.concurrency)
+    requests = workload(args.lots, args.lookups)
+
+    def uncached(keys):
+        # The original tool: one row() per car park
+        with pool.connection() as connection:
+            return {key: decode_row(connection.table(TABLE).row(key)) for key in keys}
+
+    cache = HBaseRowCache(pool, tables=[TABLE], ttl=args.ttl)
+    stop = threading.Event()
+
+    def stream():
+        rng = random.Random(5)
+        while not stop.wait(1 / args.stream_rate):
+            cache.invalidate(TABLE, [f"BHMBCC{rng.randrange(args.lots):05d}"])
+
+    print(f"{args.lookups} lookups over {args.lots} car parks, concurrency {args.concurrency}, "
+          f"{args.rpc_ms} ms per round trip\n")
+    run("row() per car park", uncached, requests, args.concurrency, counter)
+    threading.Thread(target=stream, daemon=True).start()
+    run("row cache", lambda keys: cache.get_rows(TABLE, keys), requests, args.concurrency, counter)
+    stop.set()
+    print(f"\ncache stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Measures how long importing the chatbot modules takes, with the breakdown of
+`python -X importtime`, and checks that no backend stack is imported before
+it is used.
+
+Each module is imported `--runs` times in a fresh interpreter, started
+outside the chatbot/ directory so that reading config.json and the other
+files does not depend on the working directory. The report has the median
+import time, the packages that took the longest (self time summed per
+top-level package) and the slowest direct imports.
+
+With `--check` the benchmark is a regression test: it exits with status 1
+if a module imports one of its forbidden modules (the Hive, HBase, Kafka,
+geocoding, LangChain, FAISS, torch and OpenAI stacks; importing tool_conf
+must not import tools.py either) or if the median import time exceeds
+`--max-ms`.
+
+Usage (from the chatbot/ directory):
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --check --max-ms 600
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+
+CHATBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BACKEND_MODULES = ("happybase", "pyhive", "thrift", "kafka", "geopy", "langchain_core", "langchain_community",
+                   "langchain_classic", "faiss", "torch", "sentence_transformers", "transformers", "openai")
+CHECKS = {
+    "app": BACKEND_MODULES,
+    "tool_conf": BACKEND_MODULES + ("tools",),
+}
+
+
+def parse_importtime(stderr):
+    """Returns [(module, self us, cumulative us, depth)] from the `-X importtime` output."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def import_once(module, work_dir):
+    env = dict(os.environ, PYTHONPATH=CHATBOT_DIR, OPENAI_API_KEY=os.environ.get("OPENAI_API_KEY", "benchmark"))
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=work_dir,
+                               env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+    entries = parse_importtime(completed.stderr)
+    # Children are printed before their parent: keep the modules imported by `module`, not by interpreter startup
+    end = max(index for index, entry in enumerate(entries) if entry[0] == module and entry[3] == 0)
+    start = end
+    while start > 0 and entries[start - 1][3] > 0:
+        start -= 1
+    return entries[end][2], entries[start:end + 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=list(CHECKS), help="Modules to import.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Packages and direct imports to list.")
+    parser.add_argument("--check", action="store_true", help="Fail on forbidden imports or a slow import.")
+    parser.add_argument("--max-ms", type=float, default=600.0, help="Import time budget per module for --check.")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory(prefix="bench_import_time_") as work_dir:
+        for module in args.modules:
+            runs = [import_once(module, work_dir) for _ in range(args.runs)]
+            median = statistics.median(total for total, _ in runs) / 1000
+            _, entries = sorted(runs, key=lambda run: run[0])[len(runs) // 2]
+
+            packages = Counter()
+            for name, self_us, _, _ in entries:
+                packages[name.split(".")[0]] += self_us
+            direct = sorted((entry for entry in entries if entry[3] == 1), key=lambda entry: -entry[2])
+
+            print(f"import {module}: median {median:.0f} ms over {args.runs} runs, {len(entries)} modules")
+            print("  slowest packages (self time):")
+            for package, self_us in packages.most_common(args.top):
+                print(f"    {package:<28} {self_us / 1000:8.1f} ms")
+            print(f"  slowest direct imports of {module} (cumulative):")
+            for name, _, cumulative_us, _ in direct[:args.top]:
+                print(f"    {name:<28} {cumulative_us / 1000:8.1f} ms")
+
+            imported = {name.split(".")[0] for name, _, _, _ in entries} | {name for name, _, _, _ in entries}
+            forbidden = sorted(set(CHECKS.get(module, ())) & imported)
+            if forbidden:
+                failures.append(f"import {module} imported {', '.join(forbidden)}")
+            if median > args.max_ms:
+                failures.append(f"import {module} took {median:.0f} ms, over the {args.max_ms:.0f} ms budget")
+            print()
+
+    if args.check:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        if failures:
+            sys.exit(1)
+        print("OK: no backend module imported eagerly and every import within budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Routes a fixed set of questions with the intent router of app.py and
+reports, for each, the route taken (fast-path intent, or the agent loop with
+the reason) and the time routing takes.
+
+The set holds the cookbook's templated questions, which must take the fast
+path, and questions that look like them but ask about the past, the future,
+a time of day, changes or places, which must go to the agent loop: the fast
+path only knows the current status of each car park.
+
+With `--check` the benchmark is a regression test: it exits with status 1 if
+any question is routed differently from its expected path.
+
+Usage (from the chatbot/ directory):
+    python benchmarks/bench_intent_router.py
+    python benchmarks/bench_intent_router.py --check
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from app import intent_router
+
+# (question, expected intent, or "agent" for the agent loop)
+QUESTIONS = [
+    ("How many spaces are available at BHMBCCMKT01?", "car_park_status"),
+    ("How many spaces are free at BHMBCCMKT01 right now?", "car_park_status"),
+    ("What is the capacity of BHMBCCMKT01?", "car_park_status"),
+    ("How full is BHMBCCMKT01?", "car_park_status"),
+    ("Is there a queue at BHMBCCMKT01 and Shopping?", "car_park_status"),
+    ("What is the traffic condition near BHMBCCMKT01?", "car_park_status"),
+    ("What is the current status of Shopping?", "car_park_status"),
+    ("Which 5 car parks are the busiest right now?", "car_park_ranking"),
+    ("Which car park has the longest queue?", "car_park_ranking"),
+    ("Top 3 car parks with the most free spaces", "car_park_ranking"),
+    ("Which are the emptiest car parks?", "car_park_ranking"),
+    # The future
+    ("How full is BHMBCCMKT01 in 2 hours?", "agent"),
+    ("How many spaces will be free at BHMBCCMKT01 in 30 minutes?", "agent"),
+    ("How full is BHMBCCMKT01 in an hour?", "agent"),
+    ("How busy is BHMBCCMKT01 later?", "agent"),
+    ("Is BHMBCCMKT01 full tomorrow?", "agent"),
+    ("How busy is BHMBCCMKT01 in the next hour?", "agent"),
+    ("Which car parks are the busiest later?", "agent"),
+    # Changes and history
+    ("Tell me about BHMBCCMKT01 capacity changes", "agent"),
+    ("Has the capacity of BHMBCCMKT01 changed?", "agent"),
+    ("Show the occupancy trend of BHMBCCMKT01", "agent"),
+    ("How many spaces were available at BHMBCCMKT01 this morning?", "agent"),
+    ("What was the occupancy of BHMBCCMKT01 on 4 Oct 2016?", "agent"),
+    ("How many spaces are available at BHMBCCMKT01 at 8am?", "agent"),
+    ("How busy is BHMBCCMKT01 on weekends?", "agent"),
+    ("What is the average occupancy of BHMBCCMKT01?", "agent"),
+    ("Which car parks were the busiest last week?", "agent"),
+    # Places, definitions, comparisons and unknown car parks
+    ("Which car parks near Shopping have free spaces?", "agent"),
+    ("Where is BHMBCCMKT01?", "agent"),
+    ("How is available occupancy calculated?", "agent"),
+    ("Compare BHMBCCMKT01 with Shopping", "agent"),
+    ("How many spaces are available at XYZ99?", "agent"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Routings per question for the timing.")
+    parser.add_argument("--check", action="store_true", help="Fail if any question takes the wrong path.")
+    args = parser.parse_args()
+
+    intent_router.route("How full is BHMBCCMKT01?")  # builds the car park matcher
+    wrong = []
+    timings = []
+    for question, expected in QUESTIONS:
+        route, reason = intent_router.route(question)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            intent_router.route(question)
+        timings.append((time.perf_counter() - start) / args.repeat * 1000)
+        taken = route.intent if route is not None else "agent"
+        print(f"{taken:<17} {reason or '':<17} {question}")
+        if taken != expected:
+            wrong.append((question, expected, taken))
+    print(f"\n{len(QUESTIONS)} questions, {len(wrong)} routed wrongly; routing takes "
+          f"{statistics.median(timings) * 1000:.0f} us (median)")
+
+    if args.check:
+        for question, expected, taken in wrong:
+            print(f"FAIL: {question!r} took {taken}, expected {expected}")
+        if wrong:
+            sys.exit(1)
+        print("OK: every question takes its expected path.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmarks the local analytics engine against a pandas and a plain Python
+row-loop implementation of the same queries over data/dataset.csv.
+
+`--scale N` replicates the dataset N times to see how each approach grows
+with history size. pandas is optional; it is skipped if not installed.
+
+Usage (from the chatbot/ directory):
+    python benchmarks/bench_local_engine.py --scale 10
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_engine import LocalEngine, parse_timestamp, read_raw_rows
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data", "dataset.csv")
+LOT = "BHMBCCMKT01"
+
+
+def engine_queries(engine):
+    return {
+        "avg occupancy per lot": lambda: engine.query(["avg(occupancy)"], group_by=["system_code_number"]),
+        "hourly trend for one lot": lambda: engine.query(
+            ["avg(occupancy)", "max(queue_length)"],
+            filters=[{"column": "system_code_number", "op": "=", "value": LOT}],
+            time_bucket="hour_of_day",
+        ),
+        "top 5 by max occupancy": lambda: engine.query(
+            ["max(occupancy)"], group_by=["system_code_number"], order_by="max(occupancy)", limit=5,
+        ),
+        "daily count in a window": lambda: engine.query(
+            ["count(*)"], time_bucket="day", start="2016-10-10", end="2016-11-10",
+        ),
+    }
+
+
+def row_loop_queries(rows):
+    def avg_per_lot():
+        totals = defaultdict(lambda: [0, 0])
+        for row in rows:
+            totals[row[1]][0] += int(row[5])
+            totals[row[1]][1] += 1
+        return {lot: total / count for lot, (total, count) in totals.items()}
+
+    def hourly_trend():
+        totals = defaultdict(lambda: [0, 0, 0])
+        for row in rows:
+            if row[1] == LOT:
+                hour = int(row[11][:2])
+                totals[hour][0] += int(row[5])
+                totals[hour][1] += 1
+                totals[hour][2] = max(totals[hour][2], int(row[8]))
+        return totals
+
+    def top_max_occupancy():
+        maxima = {}
+        for row in rows:
+            maxima[row[1]] = max(maxima.get(row[1], 0), int(row[5]))
+        return sorted(maxima.items(), key=lambda item: item[1], reverse=True)[:5]
+
+    def daily_count():
+        start, end = parse_timestamp("2016-10-10"), parse_timestamp("2016-11-10")
+        counts = defaultdict(int)
+        for row in rows:
+            day, month, year = row[10].split("-")
+            ts = parse_timestamp(f"{year}-{month}-{day} {row[11]}")
+            if start <= ts < end:
+                counts[ts - ts % 86400] += 1
+        return counts
+
+    return {
+        "avg occupancy per lot": avg_per_lot,
+        "hourly trend for one lot": hourly_trend,
+        "top 5 by max occupancy": top_max_occupancy,
+        "daily count in a window": daily_count,
+    }
+
+
+def pandas_queries(frame):
+    lot_rows = frame[frame["system_code_number"] == LOT]
+    window = (frame["record_timestamp"] >= "2016-10-10") & (frame["record_timestamp"] < "2016-11-10")
+    return {
+        "avg occupancy per lot": lambda: frame.groupby("system_code_number")["occupancy"].mean(),
+        "hourly trend for one lot": lambda: lot_rows.groupby(lot_rows["record_timestamp"].dt.hour).agg(
+            {"occupancy": "mean", "queue_length": "max"}),
+        "top 5 by max occupancy": lambda: frame.groupby("system_code_number")["occupancy"].max().nlargest(5),
+        "daily count in a window": lambda: frame[window].groupby(frame["record_timestamp"].dt.floor("D")).size(),
+    }
+
+
+def load_pandas(paths):
+    names = ["id", "system_code_number", "capacity", "latitude", "longitude", "occupancy", "vehicle_type",
+             "traffic_condition_nearby", "queue_length", "is_special_day", "last_updated_date", "last_updated_time"]
+    frames = []
+    for path in paths:
+        with open(path) as csv_file:
+            has_header = not csv_file.readline()[:1].isdigit()
+        frames.append(pd.read_csv(path, names=names, header=0 if has_header else None))
+    frame = pd.concat(frames, ignore_index=True)
+    frame["record_timestamp"] = pd.to_datetime(
+        frame["last_updated_date"] + " " + frame["last_updated_time"], format="%d-%m-%Y %H:%M:%S")
+    for column in ("system_code_number", "vehicle_type", "traffic_condition_nearby"):
+        frame[column] = frame[column].astype("category")
+    return frame
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1, help="Replicate the dataset this many times.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Extra copies stand in for incremental batch files
+    batch_dir = tempfile.mkdtemp()
+    try:
+        for copy in range(args.scale - 1):
+            shutil.copy(DATASET_PATH, os.path.join(batch_dir, f"raw_batch_{copy}.csv"))
+        paths = [DATASET_PATH] + sorted(os.path.join(batch_dir, name) for name in os.listdir(batch_dir))
+
+        start = time.perf_counter()
+        engine = LocalEngine(DATASET_PATH, batch_dir=batch_dir)
+        engine.refresh()
+        print(f"engine load: {engine.num_rows} rows in {(time.perf_counter() - start) * 1000:.0f} ms, "
+              f"{sum(column.nbytes for column in engine.columns.values()) / 1e6:.1f} MB")
+
+        rows = [row for path in paths for row in read_raw_rows(path)]
+        implementations = {"engine": engine_queries(engine), "row loop": row_loop_queries(rows)}
+        if pd is not None:
+            start = time.perf_counter()
+            frame = load_pandas(paths)
+            print(f"pandas load: {len(frame)} rows in {(time.perf_counter() - start) * 1000:.0f} ms")
+            implementations["pandas"] = pandas_queries(frame)
+        else:
+            print("pandas is not installed; skipping the pandas comparison.")
+
+        print(f"\n{'query':<26}" + "".join(f"{name + ' ms':>14}" for name in implementations))
+        for query in implementations["engine"]:
+            timings = [best_of(queries[query], args.repeat) for queries in implementations.values()]
+            print(f"{query:<26}" + "".join(f"{timing:>14.2f}" for timing in timings))
+    finally:
+        shutil.rmtree(batch_dir)
+
+
+if __name__ == "__main__":
+    main()
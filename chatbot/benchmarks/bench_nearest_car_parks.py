@@ -0,0 +1,108 @@
+"""
+Compares answering "which car parks near here have space" with the KD-tree
+nearest car parks lookup against what the agent had to do before: fetch
+every car park's latest row one `row()` round trip at a time and compute
+the distances itself.
+
+HBase is replaced by the in-process fake table of bench_hbase_cache.py
+(`--rpc-ms` per round trip), filled with `--lots` car parks spread around
+the dataset's city centre.
+
+Usage (from the chatbot/ directory):
+    python benchmarks/bench_nearest_car_parks.py --lots 14 --queries 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_hbase_cache import TABLE, FakeConnection, FakeTable
+from connection_pool import ConnectionPool
+from hbase_cache import HBaseRowCache, decode_row
+from spatial_index import KDTree, haversine_km
+
+CENTRE = (26.1445, 91.7362)
+
+
+def make_rows(lots, seed=7):
+    rng = random.Random(seed)
+    rows = {}
+    for index in range(lots):
+        capacity = rng.randrange(200, 2000)
+        occupancy = rng.randrange(0, capacity)
+        rows[f"BHMSYN{index:05d}".encode("utf-8")] = {
+            b"data:capacity": str(capacity).encode("utf-8"),
+            b"data:occupancy": str(occupancy).encode("utf-8"),
+            b"data:available_occupancy": str(capacity - occupancy).encode("utf-8"),
+            b"data:latitude": str(CENTRE[0] + rng.uniform(-0.05, 0.05)).encode("utf-8"),
+            b"data:longitude": str(CENTRE[1] + rng.uniform(-0.05, 0.05)).encode("utf-8"),
+        }
+    return rows
+
+
+def timed(label, answer, queries, counter):
+    counter["round_trips"] = 0
+    start = time.perf_counter()
+    answers = [answer(latitude, longitude) for latitude, longitude in queries]
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / len(queries) * 1000:8.3f} ms per question | "
+          f"{counter['round_trips'] / len(queries):7.1f} round trips per question")
+    return answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lots", type=int, default=14)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--min-available", type=int, default=100)
+    parser.add_argument("--rpc-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    counter = {"round_trips": 0}
+    rows = make_rows(args.lots)
+    table = FakeTable(rows, args.rpc_ms / 1000, 0, counter)
+    pool = ConnectionPool("hbase", lambda: FakeConnection(table), max_size=1)
+    names = [key.decode("utf-8") for key in rows]
+    rng = random.Random(11)
+    queries = [(CENTRE[0] + rng.uniform(-0.05, 0.05), CENTRE[1] + rng.uniform(-0.05, 0.05))
+               for _ in range(args.queries)]
+
+    def per_lot(latitude, longitude):
+        # The agent's only option before: one query_hbase call per car park
+        candidates = []
+        for name in names:
+            with pool.connection() as connection:
+                row = decode_row(connection.table(TABLE).row(name))
+            if int(row["data:available_occupancy"]) >= args.min_available:
+                distance = float(haversine_km(latitude, longitude, float(row["data:latitude"]),
+                                              float(row["data:longitude"])))
+                candidates.append((distance, name))
+        return [name for _, name in sorted(candidates)[:args.k]]
+
+    cache = HBaseRowCache(pool, tables=[TABLE], ttl=5)
+    live = cache.all_rows(TABLE)
+    index = KDTree({name: (float(row["data:latitude"]), float(row["data:longitude"])) for name, row in live.items()})
+
+    def nearest(latitude, longitude):
+        live = cache.all_rows(TABLE)
+        accept = lambda name: int(live[name]["data:available_occupancy"]) >= args.min_available
+        return [name for name, _ in index.nearest(latitude, longitude, k=args.k, accept=accept)]
+
+    print(f"{args.queries} questions over {args.lots} car parks, k={args.k}, "
+          f"min_available={args.min_available}, {args.rpc_ms} ms per round trip\n")
+    expected = timed("row() per car park", per_lot, queries, counter)
+    found = timed("KD-tree + row cache", nearest, queries, counter)
+    assert found == expected, "the KD-tree lookup disagrees with the brute-force answer"
+
+    start = time.perf_counter()
+    for latitude, longitude in queries:
+        index.nearest(latitude, longitude, k=args.k)
+    print(f"\nKD-tree lookup alone: {(time.perf_counter() - start) / len(queries) * 1e6:.1f} us per query")
+
+
+if __name__ == "__main__":
+    main()
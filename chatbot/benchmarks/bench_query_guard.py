@@ -0,0 +1,74 @@
+"""
+Runs every SQL example of the knowledge base (the ```sql blocks of
+knowledge_base/*.txt, which the system prompt tells the agent to copy)
+through the query guard of tools.py, and reports each decision with its
+scan estimate and the time a check takes.
+
+With `--check` the benchmark is a regression test: it exits with status 1 if
+the guard rejects any example, since each rejection costs the agent a wasted
+tool round trip on a templated question.
+
+Usage (from the chatbot/ directory):
+    python benchmarks/bench_query_guard.py
+    python benchmarks/bench_query_guard.py --check
+"""
+import argparse
+import glob
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import tools
+
+SQL_BLOCK = re.compile(r"```sql\s*\n(.*?)```", re.DOTALL)
+
+
+def knowledge_base_queries(knowledge_base_dir):
+    """[(file name, SQL)] of every ```sql block in the knowledge base."""
+    queries = []
+    for path in sorted(glob.glob(os.path.join(knowledge_base_dir, "**", "*.txt"), recursive=True)):
+        with open(path, "r") as knowledge_file:
+            for block in SQL_BLOCK.findall(knowledge_file.read()):
+                queries.append((os.path.basename(path), block.strip()))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--knowledge-base", default=tools.KNOWLEDGE_BASE_PATH)
+    parser.add_argument("--repeat", type=int, default=200, help="Checks per query for the timing.")
+    parser.add_argument("--check", action="store_true", help="Fail if any example is rejected.")
+    args = parser.parse_args()
+
+    queries = knowledge_base_queries(args.knowledge_base)
+    guard = tools.query_guard
+    guard.decide("SELECT * FROM ayaachi_parking_avail_data")  # loads the local history used for the estimates
+    rejected = []
+    timings = []
+    for name, sql in queries:
+        decision = guard.decide(sql)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            guard.decide(sql)
+        timings.append((time.perf_counter() - start) / args.repeat * 1000)
+        print(f"{decision.action:<9} {decision.reason:<20} {decision.scan_mb:9.1f} MB  {name}: {sql}")
+        if decision.action == "rejected":
+            rejected.append((name, sql, decision))
+    print(f"\n{len(queries)} examples, {len(rejected)} rejected; a check takes {statistics.median(timings):.2f} ms "
+          f"(median)")
+
+    if args.check:
+        for name, sql, decision in rejected:
+            print(f"FAIL: {name}: {sql}\n{decision.message}")
+        if rejected:
+            sys.exit(1)
+        print("OK: the guard accepts every knowledge base example.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Measures RAG startup time: the original boot sequence (re-embed the whole
+knowledge base, write the index, then load it again) against the
+manifest-based `update_vector_db` with nothing changed and with one file
+changed.
+
+By default a deterministic fake embedding model with `--embed-ms` of
+latency per chunk stands in for all-MiniLM-L6-v2, so the benchmark runs
+offline; pass `--real-model` to use the sentence transformer. `--docs N`
+adds N synthetic documents to a temporary copy of the knowledge base.
+
+Usage (from the chatbot/ directory):
+    python benchmarks/bench_rag_startup.py --docs 50
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import ingest
+
+KNOWLEDGE_BASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "knowledge_base")
+
+
+class SlowFakeEmbedding(DeterministicFakeEmbedding):
+    """Fake embeddings that cost `delay` seconds per text, like a CPU forward pass."""
+
+    delay: float = 0.0
+
+    def embed_documents(self, texts):
+        time.sleep(self.delay * len(texts))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        time.sleep(self.delay)
+        return super().embed_query(text)
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<40} {(time.perf_counter() - start) * 1000:10.1f} ms")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20, help="Synthetic documents to add to the knowledge base.")
+    parser.add_argument("--embed-ms", type=float, default=15.0, help="Fake embedding latency per chunk.")
+    parser.add_argument("--real-model", action="store_true", help="Use the real sentence transformer.")
+    args = parser.parse_args()
+
+    if args.real_model:
+        embeddings = timed("load embedding model", ingest.get_embeddings_model)
+    else:
+        embeddings = SlowFakeEmbedding(size=384, delay=args.embed_ms / 1000)
+
+    workdir = tempfile.mkdtemp()
+    try:
+        knowledge_base = os.path.join(workdir, "knowledge_base")
+        shutil.copytree(KNOWLEDGE_BASE_DIR, knowledge_base)
+        for index in range(args.docs):
+            with open(os.path.join(knowledge_base, f"synthetic_{index}.txt"), "w") as f:
+                f.write("\n\n".join(f"Runbook {index}, section {section}: car park BHMBCCMKT{section:02d} "
+                                    f"occupancy procedures. " * 20 for section in range(5)))
+
+        legacy_index = os.path.join(workdir, "legacy_index")
+        index_path = os.path.join(workdir, "faiss_index")
+
+        print(f"knowledge base: {len(os.listdir(knowledge_base))} files\n")
+
+        def legacy_boot():
+            ingest.create_vector_db(knowledge_base, legacy_index, embeddings)
+            return FAISS.load_local(legacy_index, embeddings, allow_dangerous_deserialization=True)
+
+        timed("original boot (re-embed + reload)", legacy_boot)
+        timed("first boot (build index + manifest)", lambda: ingest.update_vector_db(knowledge_base, index_path, embeddings))
+        timed("warm boot (nothing changed)", lambda: ingest.update_vector_db(knowledge_base, index_path, embeddings))
+
+        with open(os.path.join(knowledge_base, "about_the_system.txt"), "a") as f:
+            f.write("\nThe car parks report their occupancy every few minutes.\n")
+        timed("warm boot (one file changed)", lambda: ingest.update_vector_db(knowledge_base, index_path, embeddings))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
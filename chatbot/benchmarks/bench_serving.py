@@ -0,0 +1,196 @@
+"""
+Compares serving modes of the chatbot by memory and throughput:
+
+- single:   one process with the threaded development server (`python app.py`);
+- fork:     gunicorn with `--workers` workers that each load their own
+            embedding model, FAISS index and history (no preload);
+- preload:  gunicorn as configured in gunicorn.conf.py, loading everything
+            once in the master, with the FAISS index memory-mapped.
+
+Every mode serves the app of serving_app.py: the stand-ins of
+bench_chat_agent.py with a fake embedding model, whose knowledge base index
+is padded to `--index-vectors` vectors (never returned by searches) to stand
+in for a large knowledge base. The fake OpenAI server runs here. After
+`--requests` chat requests from `--concurrency` clients, the report has
+requests/s and, per process, RSS, PSS (resident memory with shared pages
+split between the processes sharing them) and USS (memory only that
+process holds), read from /proc (Linux).
+
+Usage (from the chatbot/ directory):
+    python benchmarks/bench_serving.py --workers 4 --index-vectors 200000
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import tools
+from bench_chat_agent import SCENARIOS_PATH, percentile, post_chat
+from fakes import FakeChatCompletionsServer, load_scenarios
+from ingest import update_vector_db
+
+CHATBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ("single", "fork", "preload")
+
+
+def build_index(index_dir, vectors):
+    """Indexes the knowledge base with the fake embedding model and pads it to `vectors` vectors."""
+    db = update_vector_db(tools.KNOWLEDGE_BASE_PATH, index_dir, embeddings=DeterministicFakeEmbedding(size=384))
+    padding = vectors - db.index.ntotal
+    if padding > 0:
+        # Far from every real vector, so searches never return them
+        rng = np.random.default_rng(0)
+        for start in range(0, padding, 50000):
+            count = min(50000, padding - start)
+            db.index.add((1000 + rng.standard_normal((count, db.index.d))).astype("float32"))
+        db.save_local(index_dir)
+    return db.index.ntotal
+
+
+def memory(pid):
+    """RSS, PSS and USS of a process in MB, from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as smaps:
+        for line in smaps:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)}
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as listing:
+        return [int(child) for child in listing.read().split()]
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(mode, args, settings, work_dir):
+    port = free_port()
+    env = dict(os.environ, BENCH_SERVING=json.dumps(dict(settings, port=port, preload=mode == "preload")))
+    if mode == "single":
+        command = [sys.executable, os.path.join("benchmarks", "serving_app.py")]
+    else:
+        config_path = os.path.join(CHATBOT_DIR, "gunicorn.conf.py")
+        if mode == "fork":
+            base_config_path = config_path
+            config_path = os.path.join(work_dir, "gunicorn_fork.conf.py")
+            with open(config_path, "w") as config_file:
+                config_file.write(f"__file__ = {base_config_path!r}\nexec(open(__file__).read())\n"
+                                  "preload_app = False\n")
+        command = [sys.executable, "-m", "gunicorn", "-c", config_path, "--pythonpath", "benchmarks",
+                   "--bind", f"127.0.0.1:{port}", "--workers", str(args.workers), "--threads", str(args.threads),
+                   "--access-logfile", os.devnull, "serving_app:app"]
+    log = open(os.path.join(work_dir, f"{mode}.log"), "w")
+    process = subprocess.Popen(command, cwd=CHATBOT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    expected = 1 if mode == "single" else args.workers
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"The {mode} server exited; see {log.name}.")
+        try:
+            urllib.request.urlopen(f"{url}/api/stats", timeout=5).read()
+            # Every gunicorn worker must have booted, not only the first one
+            if mode == "single" or len(children(process.pid)) >= expected:
+                break
+        except OSError:
+            pass
+        if time.perf_counter() - started > args.start_timeout:
+            process.terminate()
+            raise RuntimeError(f"The {mode} server did not start in {args.start_timeout} s; see {log.name}.")
+        time.sleep(0.2)
+    return process, url, time.perf_counter() - started
+
+
+def run_mode(mode, args, settings, questions, work_dir):
+    process, url, startup = start_server(mode, args, settings, work_dir)
+    try:
+        chat_url = f"{url}/api/chat"
+        # Warm every worker before measuring
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(lambda question: post_chat(chat_url, question), questions * args.workers))
+        workload = [questions[index % len(questions)] for index in range(args.requests)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            results = list(executor.map(lambda question: post_chat(chat_url, question), workload))
+        elapsed = time.perf_counter() - start
+
+        processes = [("server" if mode == "single" else "master", process.pid)]
+        processes += [("worker", pid) for pid in (children(process.pid) if mode != "single" else [])]
+        usage = [(role, pid, memory(pid)) for role, pid in processes]
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+
+    latencies = sorted(latency for _, latency, _, _ in results)
+    errors = sum(status != 200 for _, _, status, _ in results)
+    return {"mode": mode, "startup": startup, "rps": len(results) / elapsed, "p50": percentile(latencies, 0.5),
+            "p99": percentile(latencies, 0.99), "errors": errors, "usage": usage}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="Threads per gunicorn worker.")
+    parser.add_argument("--index-vectors", type=int, default=200000, help="Vectors in the padded FAISS index.")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", default=SCENARIOS_PATH)
+    parser.add_argument("--llm-ms", type=float, default=50.0)
+    parser.add_argument("--hive-ms", type=float, default=200.0)
+    parser.add_argument("--hbase-ms", type=float, default=2.0)
+    parser.add_argument("--geocode-ms", type=float, default=1.0)
+    parser.add_argument("--start-timeout", type=float, default=300.0)
+    args = parser.parse_args()
+
+    scenarios = load_scenarios(args.scenarios)
+    questions = list(scenarios)
+    llm = FakeChatCompletionsServer(scenarios, args.llm_ms / 1000).start()
+    work_dir = tempfile.mkdtemp(prefix="bench_serving_")
+    try:
+        index_dir = os.path.join(work_dir, "faiss_index")
+        vectors = build_index(index_dir, args.index_vectors)
+        index_mb = os.path.getsize(os.path.join(index_dir, "index.faiss")) / 2 ** 20
+        settings = {"index_dir": index_dir, "llm_url": llm.base_url, "hive_ms": args.hive_ms,
+                    "hbase_ms": args.hbase_ms, "geocode_ms": args.geocode_ms, "no_caches": False}
+        print(f"FAISS index of {vectors} vectors ({index_mb:.0f} MB), {args.workers} workers x {args.threads} "
+              f"threads, {args.requests} requests from {args.concurrency} clients, LLM {args.llm_ms} ms/call\n")
+        reports = []
+        for mode in args.modes:
+            report = run_mode(mode, args, settings, questions, work_dir)
+            reports.append(report)
+            print(f"{mode:<8} {report['rps']:7.1f} req/s | p50 {report['p50']:7.1f} ms | p99 {report['p99']:7.1f} ms"
+                  f" | {report['errors']} errors | ready in {report['startup']:.1f} s")
+            for role, pid, usage in report["usage"]:
+                print(f"    {role:<7} {pid:>7}  RSS {usage['rss']:7.1f} MB  PSS {usage['pss']:7.1f} MB  "
+                      f"USS {usage['uss']:7.1f} MB")
+            total = sum(usage["pss"] for _, _, usage in report["usage"])
+            print(f"    total PSS {total:.1f} MB\n")
+    finally:
+        llm.stop()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
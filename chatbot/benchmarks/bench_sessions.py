@@ -0,0 +1,89 @@
+"""
+Shows how request size, model context size and server-side handling time
+grow with conversation length, comparing the original protocol (the client
+posts the whole history every turn) with server-side sessions.
+
+Each simulated turn is a Hive question: a user message, an assistant tool
+call, a large `str(result)` style tool output and a final answer.
+
+Usage (from the chatbot/ directory):
+    python benchmarks/bench_sessions.py --turns 40 --tool-output-bytes 12000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompts import SYSTEM_PROMPT
+from session_store import (
+    MemorySessionStore, SQLiteSessionStore, compact_history, estimate_tokens, new_session_id,
+)
+
+
+def simulated_turn(turn, tool_output_bytes):
+    row = "('BHMBCCMKT01', 577, 412, 160, 'car', 'low', 5, 0, '2016-10-04 08:25:00'), "
+    return [
+        {"role": "assistant", "content": None, "tool_calls": [{
+            "id": f"call_{turn}",
+            "type": "function",
+            "function": {"name": "query_hive", "arguments": json.dumps({"query": "SELECT * FROM ayaachi_parking_avail_data"})},
+        }]},
+        {"tool_call_id": f"call_{turn}", "role": "tool", "name": "query_hive",
+         "content": "[" + row * (tool_output_bytes // len(row)) + "]"},
+        {"role": "assistant", "content": f"Answer number {turn}: the busiest car park was BHMBCCMKT01."},
+    ]
+
+
+def run(args):
+    legacy_history = [{"role": "system", "content": SYSTEM_PROMPT}]
+    stores = {
+        "memory": MemorySessionStore(),
+        "sqlite": SQLiteSessionStore(os.path.join(tempfile.mkdtemp(), "sessions.db")),
+    }
+    session_id = new_session_id()
+
+    print(f"{'turn':>5} | {'legacy req B':>12} | {'session req B':>13} | {'legacy ctx tok':>14} | "
+          f"{'session ctx tok':>15} | {'memory ms':>9} | {'sqlite ms':>9}")
+    for turn in range(1, args.turns + 1):
+        user_message = {"role": "user", "content": f"Question number {turn}: which car park is the busiest?"}
+
+        # Original protocol: the client resends everything and the model sees everything
+        legacy_history.append(user_message)
+        legacy_request = len(json.dumps({"messages": legacy_history[1:]}))
+        legacy_context = estimate_tokens(legacy_history)
+        legacy_history.extend(simulated_turn(turn, args.tool_output_bytes))
+
+        # Session protocol: the client sends the id and the new message only
+        session_request = len(json.dumps({"session_id": session_id, "message": user_message["content"]}))
+        timings = {}
+        for name, store in stores.items():
+            start = time.perf_counter()
+            messages = store.get(session_id) or [{"role": "system", "content": SYSTEM_PROMPT}]
+            messages.append(user_message)
+            messages = compact_history(messages, args.token_budget, args.max_tool_output_chars)
+            session_context = estimate_tokens(messages)
+            messages.extend(simulated_turn(turn, args.tool_output_bytes))
+            store.save(session_id, compact_history(messages, args.token_budget, args.max_tool_output_chars))
+            timings[name] = (time.perf_counter() - start) * 1000
+
+        if turn == 1 or turn % args.report_every == 0:
+            print(f"{turn:>5} | {legacy_request:>12} | {session_request:>13} | {legacy_context:>14} | "
+                  f"{session_context:>15} | {timings['memory']:>9.2f} | {timings['sqlite']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--report-every", type=int, default=5)
+    parser.add_argument("--tool-output-bytes", type=int, default=12000)
+    parser.add_argument("--token-budget", type=int, default=6000)
+    parser.add_argument("--max-tool-output-chars", type=int, default=4000)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Deterministic local stand-ins for the chatbot's external services, for
+benchmarks that must run offline and reproducibly:
+
+- FakeChatCompletionsServer: an HTTP server speaking the OpenAI chat
+  completions API that replays scripted tool-call sequences;
+- FakeHiveConnection: a pyhive-like connection whose cursors run the SQL
+  on SQLite tables loaded from data/dataset.csv;
+- FakeHBaseConnection: a happybase-like connection over the latest record
+  of each car park;
+- make_fake_reverse: a Nominatim `reverse` stand-in.
+
+Every fake takes an injectable latency.
+"""
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from local_engine import LocalEngine, format_timestamp, parse_raw_rows, read_raw_rows
+
+CHATBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_PATH = os.path.join(CHATBOT_DIR, "..", "data", "dataset.csv")
+
+HISTORY_TABLE = "ayaachi_parking_avail_data"
+LATEST_VIEW = "ayaachi_parking_latest_hbase_map"
+HISTORY_COLUMNS = [
+    "id", "system_code_number", "capacity", "occupancy", "available_occupancy", "vehicle_type",
+    "traffic_condition_nearby", "queue_length", "is_special_day", "record_timestamp", "latitude", "longitude",
+]
+LATEST_COLUMNS = [
+    "system_code_number", "capacity", "occupancy", "available_occupancy", "queue_length",
+    "traffic_condition_nearby", "latitude", "longitude",
+]
+
+_database_ids = itertools.count()
+
+
+# Hive
+
+class FakeHiveDatabase:
+    """
+    The Hive tables as a shared in-memory SQLite database. The connection
+    held here keeps the database alive; `connect` opens more connections to it.
+    """
+
+    def __init__(self, dataset_path=DATASET_PATH):
+        self.uri = f"file:fake_hive_{next(_database_ids)}?mode=memory&cache=shared"
+        self._keeper = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        columns = parse_raw_rows(read_raw_rows(dataset_path))
+        history = [columns[name].tolist() for name in HISTORY_COLUMNS]
+        timestamp_index = HISTORY_COLUMNS.index("record_timestamp")
+        history[timestamp_index] = [format_timestamp(value) for value in history[timestamp_index]]
+        self._keeper.execute(f"CREATE TABLE {HISTORY_TABLE} ({', '.join(HISTORY_COLUMNS)})")
+        self._keeper.executemany(
+            f"INSERT INTO {HISTORY_TABLE} VALUES ({', '.join('?' * len(HISTORY_COLUMNS))})", zip(*history)
+        )
+        latest = _latest_records(dataset_path)
+        self._keeper.execute(f"CREATE TABLE {LATEST_VIEW} ({', '.join(LATEST_COLUMNS)})")
+        self._keeper.executemany(
+            f"INSERT INTO {LATEST_VIEW} VALUES ({', '.join('?' * len(LATEST_COLUMNS))})",
+            [[record[name] for name in LATEST_COLUMNS] for record in latest.values()],
+        )
+        self._keeper.commit()
+        self.rows = len(history[0])
+
+    def connect(self, latency_s=0.0):
+        return FakeHiveConnection(sqlite3.connect(self.uri, uri=True, check_same_thread=False), latency_s)
+
+
+class FakeHiveCursor:
+    def __init__(self, cursor, latency_s):
+        self._cursor = cursor
+        self.latency_s = latency_s
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, sql, parameters=()):
+        time.sleep(self.latency_s)
+        self._cursor.execute(sql, parameters)
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class FakeHiveConnection:
+    """Charges `latency_s` per statement, standing in for HiveServer2 compiling and scheduling the query."""
+
+    def __init__(self, connection, latency_s):
+        self._connection = connection
+        self.latency_s = latency_s
+
+    def cursor(self):
+        return FakeHiveCursor(self._connection.cursor(), self.latency_s)
+
+    def close(self):
+        self._connection.close()
+
+
+# HBase
+
+class FakeHBaseTable:
+    def __init__(self, rows, latency_s, counter):
+        self._rows = rows
+        self.latency_s = latency_s
+        self.counter = counter
+        self.written_ms = int(time.time() * 1000)
+
+    def _round_trip(self):
+        self.counter["round_trips"] += 1
+        time.sleep(self.latency_s)
+
+    def _cells(self, row, include_timestamp):
+        # Every cell was written when the fake table was built
+        return {column: (value, self.written_ms) for column, value in row.items()} if include_timestamp else dict(row)
+
+    def row(self, row_key, include_timestamp=False):
+        self._round_trip()
+        return self._cells(self._rows.get(_to_bytes(row_key), {}), include_timestamp)
+
+    def rows(self, row_keys, include_timestamp=False):
+        self._round_trip()
+        found = ((_to_bytes(key), self._rows.get(_to_bytes(key))) for key in row_keys)
+        return [(key, self._cells(row, include_timestamp)) for key, row in found if row is not None]
+
+    def scan(self, limit=None, columns=None, include_timestamp=False):
+        self._round_trip()
+        return iter([(key, self._cells(row, include_timestamp)) for key, row in self._rows.items()][:limit])
+
+
+class FakeHBaseConnection:
+    """Every table name resolves to the latest-availability rows."""
+
+    def __init__(self, table):
+        self._table = table
+
+    def table(self, name):
+        return self._table
+
+    def close(self):
+        pass
+
+
+def latest_hbase_rows(dataset_path=DATASET_PATH):
+    """The rows the ingestion pipeline keeps in `ayaachi_parking_availability_latest`, from the dataset."""
+    rows = {}
+    for system_code_number, record in _latest_records(dataset_path).items():
+        columns = {
+            "capacity": record["capacity"],
+            "occupancy": record["occupancy"],
+            "available_occupancy": record["available_occupancy"],
+            "queue_length": record["queue_length"],
+            "traffic_condition": record["traffic_condition_nearby"],
+            "latitude": record["latitude"],
+            "longitude": record["longitude"],
+            "last_updated": record["record_timestamp"],
+        }
+        rows[_to_bytes(system_code_number)] = {
+            _to_bytes(f"data:{name}"): _to_bytes(str(value)) for name, value in columns.items()
+        }
+    return rows
+
+
+def _latest_records(dataset_path):
+    engine = LocalEngine(dataset_path)
+    engine.refresh()
+    return engine.latest()
+
+
+def _to_bytes(value):
+    return value if isinstance(value, bytes) else str(value).encode("utf-8")
+
+
+# Geocoding
+
+def make_fake_reverse(latency_s, counter):
+    """A stand-in for `Nominatim.reverse` that answers every coordinate after `latency_s`."""
+    def reverse(query, timeout=None):
+        counter["requests"] += 1
+        time.sleep(latency_s)
+        latitude, longitude = (float(value) for value in (query.split(",") if isinstance(query, str) else query))
+        return SimpleNamespace(raw={
+            "lat": str(latitude), "lon": str(longitude),
+            "display_name": f"Car park near {latitude:.4f}, {longitude:.4f}",
+        })
+    return reverse
+
+
+# Chat completions
+
+class FakeChatCompletionsServer:
+    """
+    Serves `POST /v1/chat/completions` (non-streaming) on localhost.
+
+    `scenarios` maps a user question to its script: a list of steps, each
+    either `{"tool_calls": [{"name": ..., "arguments": {...}}, ...]}` or
+    `{"content": "final answer"}`. The step to replay is the number of
+    assistant messages after the last user message, so a request that
+    follows the script gets the next step. Each response costs `latency_s`
+    plus `per_token_s` per prompt token (estimated as 4 characters per
+    token), and reports that estimate as usage.
+    """
+
+    def __init__(self, scenarios, latency_s=0.0, per_token_s=0.0):
+        self.scenarios = scenarios
+        self.latency_s = latency_s
+        self.per_token_s = per_token_s
+        self.calls = 0
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def respond(self, request):
+        with self._lock:
+            self.calls += 1
+            call_id = next(self._ids)
+        messages = request["messages"]
+        last_user = max(index for index, message in enumerate(messages) if message.get("role") == "user")
+        question = messages[last_user].get("content", "")
+        step_index = sum(message.get("role") == "assistant" for message in messages[last_user + 1:])
+        steps = self.scenarios.get(question, [])
+        step = steps[step_index] if step_index < len(steps) else {"content": "I do not have a script for that."}
+
+        prompt_tokens = len(json.dumps(messages)) // 4
+        time.sleep(self.latency_s + self.per_token_s * prompt_tokens)
+
+        message = {"role": "assistant", "content": step.get("content")}
+        finish_reason = "stop"
+        if step.get("tool_calls"):
+            finish_reason = "tool_calls"
+            message["tool_calls"] = [
+                {"id": f"call_{call_id}_{index}", "type": "function",
+                 "function": {"name": tool_call["name"], "arguments": json.dumps(tool_call.get("arguments", {}))}}
+                for index, tool_call in enumerate(step["tool_calls"])
+            ]
+        completion_tokens = len(json.dumps(message)) // 4
+        return {
+            "id": f"chatcmpl-{call_id}", "object": "chat.completion", "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if request.get("stream"):
+                    status, body = 400, {"error": {"message": "The fake server does not stream."}}
+                else:
+                    status, body = 200, server.respond(request)
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def load_scenarios(path):
+    """Reads a scenario file: a JSON list of {"question": ..., "steps": [...]}."""
+    with open(path, "r") as scenario_file:
+        return {scenario["question"]: scenario["steps"] for scenario in json.load(scenario_file)}
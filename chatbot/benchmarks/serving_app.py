@@ -0,0 +1,41 @@
+"""
+The chatbot with the stand-ins of bench_chat_agent.py, for bench_serving.py
+to start under the different servers. Its settings come as JSON in the
+BENCH_SERVING environment variable.
+
+Imported (`serving_app:app`, from the chatbot/ directory with
+`--pythonpath benchmarks`) it serves the app to gunicorn; run as a script it
+starts the single-process threaded server of `python app.py`.
+"""
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from openai import OpenAI
+from werkzeug.serving import make_server
+
+import app as chat_app
+import tools
+from bench_chat_agent import install_backend_fakes
+
+settings = SimpleNamespace(**json.loads(os.environ["BENCH_SERVING"]))
+install_backend_fakes(settings, {"round_trips": 0, "requests": 0})
+tools.FAISS_INDEX_PATH = settings.index_dir
+tools.get_embeddings_model = lambda: DeterministicFakeEmbedding(size=384)
+# Keep the fake query vectors out of the real embedding cache file
+tools.EMBEDDING_CACHE_CONFIG = dict(tools.EMBEDDING_CACHE_CONFIG, persist_path=None)
+chat_app.client = OpenAI(api_key="benchmark", base_url=settings.llm_url, max_retries=0)
+chat_app.initialize(preload=settings.preload)
+
+app = chat_app.app
+
+
+if __name__ == "__main__":
+    server = make_server("127.0.0.1", settings.port, app, threaded=True)
+    server.serve_forever()
@@ -0,0 +1,205 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+class _PooledConnection:
+    """Book-keeping wrapper around a raw backend connection."""
+
+    def __init__(self, raw, generation):
+        now = time.monotonic()
+        self.raw = raw
+        self.generation = generation
+        self.created_at = now
+        self.last_used = now
+        self.last_checked = now
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of reusable backend connections.
+
+    Connections are created lazily by `factory`, handed out one per request
+    through the `connection()` context manager and returned afterwards so the
+    next request reuses the warm session instead of paying the Thrift/SASL
+    handshake again. Idle connections are evicted after `idle_timeout`
+    seconds, and connections that have been idle for longer than
+    `health_check_interval` seconds are validated with `health_check` before
+    being handed out. A connection that fails its health check is closed and
+    replaced on the next checkout, and so is one whose request failed, unless
+    `keeps_connection(exception)` says the server reported the error (e.g. a
+    bad SQL statement) and the connection is still in sync.
+    """
+
+    def __init__(self, name, factory, max_size=4, idle_timeout=300, checkout_timeout=30,
+                 health_check=None, health_check_interval=30, closer=None, keeps_connection=None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.name = name
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self._factory = factory
+        self._health_check = health_check
+        self._closer = closer or (lambda raw: raw.close())
+        self._keeps_connection = keeps_connection or (lambda exception: False)
+        self._idle = deque()
+        self._size = 0
+        # Bumped by close_all, so connections checked out before it are closed on return
+        self._generation = 0
+        self._lock = threading.Condition()
+
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    @contextmanager
+    def connection(self):
+        """Checks out a connection for the duration of the `with` block."""
+        pooled = self._acquire()
+        try:
+            yield pooled.raw
+        except Exception as e:
+            # A Thrift stream interrupted mid-call still has an open socket but is out of
+            # sync: keep the connection only after an error the server itself reported.
+            if self._keeps_connection(e) and self._is_healthy(pooled):
+                self._release(pooled)
+            else:
+                self._discard(pooled)
+            raise
+        except BaseException:
+            self._discard(pooled)
+            raise
+        else:
+            self._release(pooled)
+
+    def close_all(self):
+        """Closes every idle connection. Checked-out connections are closed on return."""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._generation += 1
+            self._lock.notify_all()
+        for pooled in idle:
+            self._close(pooled)
+
+    def stats(self):
+        """Returns a snapshot of the pool counters."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "size": self._size,
+                "idle": len(self._idle),
+                "max_size": self.max_size,
+                "created": self.created,
+                "reused": self.reused,
+                "discarded": self.discarded,
+            }
+
+    # Internal helpers
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            pooled = None
+            create = False
+            with self._lock:
+                stale = self._evict_idle()
+                while pooled is None and not create:
+                    if self._idle:
+                        pooled = self._idle.pop()
+                    elif self._size < self.max_size:
+                        self._size += 1
+                        create = True
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolTimeoutError(
+                                f"Timed out waiting for a {self.name} connection "
+                                f"(pool size {self.max_size})."
+                            )
+                        self._lock.wait(remaining)
+            for old in stale:
+                self._close(old)
+
+            if create:
+                return self._create()
+
+            if self._needs_check(pooled) and not self._is_healthy(pooled):
+                logging.info(f"Discarding unhealthy {self.name} connection from the pool.")
+                self._discard(pooled)
+                continue
+
+            pooled.last_used = time.monotonic()
+            with self._lock:
+                self.reused += 1
+            return pooled
+
+    def _create(self):
+        with self._lock:
+            generation = self._generation
+        try:
+            raw = self._factory()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self.created += 1
+        return _PooledConnection(raw, generation)
+
+    def _release(self, pooled):
+        pooled.last_used = time.monotonic()
+        with self._lock:
+            if pooled.generation == self._generation:
+                self._idle.append(pooled)
+                self._lock.notify()
+                return
+        # Checked out before close_all
+        self._discard(pooled)
+
+    def _discard(self, pooled):
+        with self._lock:
+            self._size -= 1
+            self.discarded += 1
+            self._lock.notify()
+        self._close(pooled)
+
+    def _evict_idle(self):
+        """Removes idle connections past `idle_timeout`. Must hold the lock."""
+        if self.idle_timeout is None:
+            return []
+        cutoff = time.monotonic() - self.idle_timeout
+        stale = [pooled for pooled in self._idle if pooled.last_used < cutoff]
+        for pooled in stale:
+            self._idle.remove(pooled)
+            self._size -= 1
+            self.discarded += 1
+        return stale
+
+    def _needs_check(self, pooled):
+        return time.monotonic() - pooled.last_checked >= self.health_check_interval
+
+    def _is_healthy(self, pooled):
+        pooled.last_checked = time.monotonic()
+        if self._health_check is None:
+            return True
+        try:
+            return bool(self._health_check(pooled.raw))
+        except Exception:
+            return False
+
+    def _close(self, pooled):
+        try:
+            self._closer(pooled.raw)
+        except Exception as e:
+            logging.warning(f"Error closing {self.name} connection: {e}")
@@ -0,0 +1,160 @@
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text):
+    """
+    Cache key for a search query: lower-cased, whitespace collapsed and
+    trailing punctuation dropped. all-MiniLM-L6-v2 is uncased, so lower-casing
+    does not change the embedding.
+    """
+    return _WHITESPACE.sub(" ", text).strip().rstrip("?.!;, ").lower()
+
+
+class EmbeddingCache:
+    """
+    An LRU cache of query embeddings keyed on the normalized query text, in
+    front of a LangChain embeddings model.
+
+    Misses are not embedded one at a time: they are queued for a background
+    worker that waits up to `batch_window_ms` for other misses and embeds
+    them all with a single `embed_documents` call (one model forward pass).
+    Concurrent requests for the same text share one pending result. With a
+    `persist_path` the cache is loaded at start-up and written back with
+    `save()`, so a restart does not lose the warm set.
+    """
+
+    def __init__(self, embeddings, max_entries=2048, persist_path=None, model_name=None,
+                 batch_window_ms=5, max_batch_size=32):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.persist_path = persist_path
+        self.model_name = model_name
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_texts = 0
+
+        if persist_path:
+            self._load()
+
+    def embed_query(self, text):
+        """Returns the embedding of `text`, from the cache or from a batched forward pass."""
+        key = normalize_query(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+            self.misses += 1
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = Future()
+                self._queue.put(key)
+                self._ensure_worker()
+        return future.result()
+
+    def save(self):
+        """Writes the cached embeddings to `persist_path`."""
+        if not self.persist_path:
+            return
+        with self._lock:
+            keys = list(self._entries)
+            vectors = np.array([self._entries[key] for key in keys], dtype=np.float32)
+        tmp_path = self.persist_path + ".tmp.npz"
+        np.savez(tmp_path, keys=np.array(keys, dtype=str), vectors=vectors, model=np.array(self.model_name or ""))
+        os.replace(tmp_path, self.persist_path)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "batches": self.batches,
+                "avg_batch_size": round(self.batched_texts / self.batches, 2) if self.batches else 0.0,
+            }
+
+    # Internal helpers
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._embed_batch(batch)
+
+    def _embed_batch(self, keys):
+        try:
+            vectors = self.embeddings.embed_documents(keys)
+        except Exception as e:
+            with self._lock:
+                futures = [self._pending.pop(key) for key in keys]
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self.batches += 1
+            self.batched_texts += len(keys)
+            futures = []
+            for key, vector in zip(keys, vectors):
+                vector = list(vector)
+                self._entries[key] = vector
+                self._entries.move_to_end(key)
+                futures.append((self._pending.pop(key), vector))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        for future, vector in futures:
+            future.set_result(vector)
+
+    def _load(self):
+        if not os.path.exists(self.persist_path):
+            return
+        try:
+            with np.load(self.persist_path) as data:
+                if str(data["model"]) != (self.model_name or ""):
+                    print(f"Ignoring embedding cache at '{self.persist_path}': it was built with another model.")
+                    return
+                for key, vector in zip(data["keys"].tolist(), data["vectors"].tolist()):
+                    self._entries[key] = vector
+        except Exception as e:
+            print(f"Warning: could not load the embedding cache at '{self.persist_path}': {e}")
+            return
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        print(f"Loaded {len(self._entries)} cached query embeddings from '{self.persist_path}'.")
@@ -0,0 +1,215 @@
+import json
+import os
+import sys
+import threading
+
+from spatial_index import KDTree
+
+
+def quantize(latitude, longitude, precision=5):
+    """Cache key of a coordinate: both values rounded to `precision` decimals (5 decimals is ~1 m)."""
+    return f"{round(float(latitude), precision):.{precision}f},{round(float(longitude), precision):.{precision}f}"
+
+
+def load_gazetteer(path):
+    """
+    Reads a gazetteer file: a JSON list of Nominatim-style records with
+    `lat`, `lon` and usually `display_name` and `address`. A geocode cache
+    file is accepted too, so a cache warmed online can be shipped as the
+    gazetteer for offline deployments.
+    """
+    with open(path, "r") as gazetteer_file:
+        data = json.load(gazetteer_file)
+    if isinstance(data, dict):
+        data = data.get("entries", {}).values()
+    return [record for record in data if record and "lat" in record and "lon" in record]
+
+
+class GeocodeCache:
+    """
+    A persistent reverse-geocoding cache in front of Nominatim.
+
+    Car park coordinates never change, so answers are cached forever, keyed
+    on the coordinate rounded to `precision` decimals; the rounded
+    coordinate is also what is sent to Nominatim, so every point in a cell
+    gets the same answer. Answers from Nominatim (including "not found") are
+    written to `cache_path` as they arrive, or once at the end of `prewarm`.
+    A miss is looked up in the gazetteer first
+    (nearest record within `gazetteer_max_km`) and only then on the
+    network, one request at a time to respect Nominatim's rate limit. With
+    `offline` set the network is never used.
+    """
+
+    def __init__(self, cache_path=None, precision=5, offline=False, gazetteer_path=None, gazetteer_max_km=0.25,
+                 user_agent="project-birmingham-car-park-chatbot", timeout=10, min_delay_seconds=1.0):
+        self.cache_path = cache_path
+        self.precision = precision
+        self.offline = offline
+        self.gazetteer_max_km = gazetteer_max_km
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.min_delay_seconds = min_delay_seconds
+        self._entries = {}
+        self._gazetteer = []
+        self._gazetteer_index = None
+        self._reverse = None
+        self._lock = threading.Lock()
+        self._network_lock = threading.Lock()
+        self._save_lock = threading.Lock()
+
+        self.hits = 0
+        self.gazetteer_hits = 0
+        self.network_lookups = 0
+        self.errors = 0
+
+        if cache_path and os.path.exists(cache_path):
+            self._load()
+        if gazetteer_path and os.path.exists(gazetteer_path):
+            self._gazetteer = load_gazetteer(gazetteer_path)
+            self._gazetteer_index = KDTree({
+                index: (float(record["lat"]), float(record["lon"])) for index, record in enumerate(self._gazetteer)
+            })
+        elif gazetteer_path and offline:
+            print(f"Warning: gazetteer '{gazetteer_path}' not found; offline lookups will only use the cache. "
+                  f"Build it with `python geocode_cache.py --prewarm` on a machine with network access.")
+
+    def reverse(self, latitude, longitude, save=True):
+        """
+        Returns the Nominatim-style record for a coordinate, or None if nothing
+        is known there. With `save` unset, a new answer is kept in memory until
+        the next `save`.
+        """
+        key = quantize(latitude, longitude, self.precision)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return self._entries[key]
+
+        record = self._from_gazetteer(key)
+        if record is not None:
+            with self._lock:
+                self.gazetteer_hits += 1
+            # The gazetteer answers again after a restart, so there is nothing to save
+            return self._store(key, record, save=False)
+        if self.offline:
+            return None
+
+        # One network request at a time: this is Nominatim's usage policy, and
+        # concurrent misses for the same point wait for the first answer
+        with self._network_lock:
+            with self._lock:
+                if key in self._entries:
+                    self.hits += 1
+                    return self._entries[key]
+            try:
+                location = self._reverse_client()(key, timeout=self.timeout)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                raise
+            with self._lock:
+                self.network_lookups += 1
+            return self._store(key, location.raw if location else None, save=save)
+
+    def prewarm(self, coordinates):
+        """
+        Resolves every (latitude, longitude) in `coordinates`, then saves the
+        cache once; failures are counted and skipped.
+        """
+        resolved = 0
+        lookups = self.network_lookups
+        for latitude, longitude in coordinates:
+            try:
+                resolved += self.reverse(latitude, longitude, save=False) is not None
+            except Exception as e:
+                print(f"Warning: could not reverse geocode {latitude}, {longitude}: {e}")
+        if self.network_lookups != lookups:
+            self.save()
+        return resolved
+
+    def save(self):
+        """Writes the cache to `cache_path`."""
+        if not self.cache_path:
+            return
+        with self._save_lock:
+            with self._lock:
+                data = {"precision": self.precision, "entries": dict(self._entries)}
+            tmp_path = self.cache_path + ".tmp"
+            with open(tmp_path, "w") as cache_file:
+                json.dump(data, cache_file, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.cache_path)
+
+    def write_gazetteer(self, path):
+        """Writes the known records to `path` as a gazetteer for offline deployments; returns how many."""
+        with self._lock:
+            records = [self._entries[key] for key in sorted(self._entries) if self._entries[key]]
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as gazetteer_file:
+            json.dump(records, gazetteer_file, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+        return len(records)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "gazetteer_records": len(self._gazetteer),
+                "offline": self.offline,
+                "hits": self.hits,
+                "gazetteer_hits": self.gazetteer_hits,
+                "network_lookups": self.network_lookups,
+                "errors": self.errors,
+            }
+
+    # Internal helpers
+
+    def _reverse_client(self):
+        if self._reverse is None:
+            from geopy.extra.rate_limiter import RateLimiter
+            from geopy.geocoders import Nominatim
+
+            geolocator = Nominatim(user_agent=self.user_agent)
+            self._reverse = RateLimiter(geolocator.reverse, min_delay_seconds=self.min_delay_seconds,
+                                        max_retries=0, swallow_exceptions=False)
+        return self._reverse
+
+    def _from_gazetteer(self, key):
+        if self._gazetteer_index is None:
+            return None
+        latitude, longitude = (float(value) for value in key.split(","))
+        nearest = self._gazetteer_index.nearest(latitude, longitude, k=1, max_km=self.gazetteer_max_km)
+        return self._gazetteer[nearest[0][0]] if nearest else None
+
+    def _store(self, key, record, save=True):
+        with self._lock:
+            self._entries[key] = record
+        if save:
+            self.save()
+        return record
+
+    def _load(self):
+        try:
+            with open(self.cache_path, "r") as cache_file:
+                data = json.load(cache_file)
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable geocode cache '{self.cache_path}': {e}")
+            return
+        if data.get("precision") != self.precision:
+            print(f"Geocode cache '{self.cache_path}' uses another precision; starting empty.")
+            return
+        self._entries = data.get("entries", {})
+
+
+if __name__ == "__main__":
+    # `python geocode_cache.py` writes the gazetteer of the `geocoding` config from the warmed cache;
+    # `--prewarm` first geocodes every known car park, which needs network access to Nominatim
+    import tools
+
+    if "--prewarm" in sys.argv:
+        tools.geocode_cache.offline = False
+        tools.initialize_local_engine()
+        tools.prewarm_geocode_cache().join()
+    gazetteer_path = tools.GEOCODING_CONFIG.get("gazetteer_path") or os.path.join(tools.BASE_DIRECTORY,
+                                                                                  "gazetteer.json")
+    written = tools.geocode_cache.write_gazetteer(gazetteer_path)
+    print(f"Wrote {written} records to '{gazetteer_path}'.")
@@ -0,0 +1,48 @@
+"""
+Gunicorn settings for serving the chatbot with several worker processes:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is loaded once in the master (`preload_app`) and the workers are
+forked from it, sharing the embedding model, the memory-mapped FAISS index
+and the car park history. Workers, threads per worker and the bind address
+come from the `serving` section of config.json; command line flags still
+override them.
+
+Each worker is a separate process, so with more than one worker the
+conversation histories must be kept where every worker can read them: the
+server refuses to start if `sessions.backend` is "memory".
+"""
+import json
+import os
+
+BASE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(BASE_DIRECTORY, "config.json"), "r") as config_file:
+    config_data = json.load(config_file)
+SERVING_CONFIG = config_data.get("serving", {})
+SESSION_CONFIG = config_data.get("sessions", {})
+
+# wsgi:app is imported from the chatbot directory, wherever gunicorn is started from
+chdir = BASE_DIRECTORY
+bind = SERVING_CONFIG.get("bind", "0.0.0.0:3030")
+workers = SERVING_CONFIG.get("workers", 4)
+threads = SERVING_CONFIG.get("threads", 8)
+worker_class = "gthread"
+# Chat turns wait on several model and Hive round trips
+timeout = SERVING_CONFIG.get("timeout", 120)
+graceful_timeout = 30
+preload_app = True
+accesslog = "-"
+
+
+def on_starting(server):
+    if server.cfg.workers > 1 and SESSION_CONFIG.get("backend", "memory") == "memory":
+        # Raised before any worker starts; gunicorn exits with the message
+        raise RuntimeError(f"sessions.backend is 'memory' with {server.cfg.workers} workers, so a conversation "
+                           f"would lose its history whenever a request lands on another worker. Set "
+                           f"sessions.backend to 'sqlite' in config.json, or run a single worker (--workers 1).")
+
+
+def post_fork(server, worker):
+    from app import after_fork
+    after_fork()
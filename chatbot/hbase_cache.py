@@ -0,0 +1,255 @@
+import threading
+import time
+from datetime import datetime
+
+
+def decode_row(row):
+    return {key.decode("utf-8"): value.decode("utf-8") for key, value in row.items()}
+
+
+def decode_timestamped_row(row):
+    """(decoded row, write time in epoch seconds of its newest cell) of a row read with include_timestamp=True."""
+    decoded = {key.decode("utf-8"): value.decode("utf-8") for key, (value, _) in row.items()}
+    return decoded, max((timestamp for _, timestamp in row.values()), default=0) / 1000
+
+
+class HBaseRowCache:
+    """
+    A read-through cache of HBase rows for small, hot tables such as
+    `ayaachi_parking_availability_latest` (one row per car park).
+
+    A row is served from memory for `ttl` seconds after it was read, which
+    bounds staleness. On a miss the whole table is prefetched with one scan
+    (it holds a handful of rows, so a scan costs about as much as a single
+    `row()` call) unless it has more than `scan_limit` rows, in which case
+    only the missing rows are fetched with one multi-row `rows()` call.
+    Rows known to be absent are cached too. `invalidate` drops rows as new
+    records for them arrive on the ingestion stream. The stream is ahead of
+    HBase until the consumer's next batched put, so `invalidate` also takes
+    the version (the `version_column` value) each row must reach: an older
+    row read in the meantime is returned but not cached. A row written
+    without `version_column` must instead have been written (its HBase cell
+    timestamp) after the record arrived on the stream. A version not reached
+    within `pending_timeout` seconds is given up on, so a writer that never
+    reports it cannot keep a row out of the cache.
+    """
+
+    def __init__(self, pool, tables=(), ttl=5, scan_limit=5000, enabled=True, version_column=None,
+                 pending_timeout=60):
+        self.pool = pool
+        self.tables = set(tables)
+        self.ttl = ttl
+        self.scan_limit = scan_limit
+        self.enabled = enabled
+        self.version_column = version_column
+        self.pending_timeout = pending_timeout
+        self._rows = {}  # (table, row key) -> (decoded row or None, fetched at)
+        # (table, row key) -> (version seen on the stream and not yet read back, epoch seconds it was seen)
+        self._min_versions = {}
+        self._scanned = {}  # table -> False once a scan found more than scan_limit rows
+        self._scan_times = {}  # table -> time of the last complete scan with no invalidation since
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.scans = 0
+        self.multi_gets = 0
+        self.invalidations = 0
+        self.stale_reads = 0
+
+    def get_rows(self, table_name, row_keys):
+        """Returns {row key: decoded row, or None if absent} for `row_keys`."""
+        if not self.enabled or table_name not in self.tables:
+            return self._fetch(table_name, row_keys)[0]
+
+        now = time.monotonic()
+        result, missing = {}, []
+        with self._lock:
+            for row_key in row_keys:
+                entry = self._rows.get((table_name, row_key))
+                if entry is not None and now - entry[1] <= self.ttl:
+                    result[row_key] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.append(row_key)
+                    self.misses += 1
+        if missing:
+            result.update(self._load(table_name, missing))
+        return {row_key: result[row_key] for row_key in row_keys}
+
+    def all_rows(self, table_name):
+        """Returns {row key: decoded row} for a whole (small) table, from a scan at most `ttl` seconds old."""
+        with self._load_lock:
+            scanned_at = self._scan_times.get(table_name)
+            if not self.enabled or scanned_at is None or time.monotonic() - scanned_at > self.ttl:
+                fetched_at = time.monotonic()
+                rows, written = self._scan(table_name)
+                if rows is None:
+                    raise ValueError(f"Table '{table_name}' has more than {self.scan_limit} rows to scan.")
+                if self.enabled and table_name in self.tables and self._store(table_name, rows, fetched_at, written):
+                    self._scan_times[table_name] = fetched_at
+                return rows
+        with self._lock:
+            return {key: entry[0] for (table, key), entry in self._rows.items()
+                    if table == table_name and entry[0] is not None}
+
+    def invalidate(self, table_name=None, row_keys=None, versions=None):
+        """
+        Drops the given rows (all rows of `table_name`, or everything) from the
+        cache. `versions` ({row key: version}) are the versions the rows must
+        reach in HBase before they are cached again.
+        """
+        with self._lock:
+            if versions and self.version_column:
+                now = time.time()
+                for row_key, version in versions.items():
+                    key = (table_name, row_key)
+                    pending = self._min_versions.get(key)
+                    if pending is None or version >= pending[0]:
+                        self._min_versions[key] = (version, now)
+            if table_name is None:
+                self.invalidations += len(self._rows)
+                self._rows.clear()
+                self._scanned.clear()
+                self._scan_times.clear()
+                return
+            self._scan_times.pop(table_name, None)
+            if row_keys is None:
+                keys = [key for key in self._rows if key[0] == table_name]
+            else:
+                keys = [(table_name, row_key) for row_key in row_keys if (table_name, row_key) in self._rows]
+            for key in keys:
+                del self._rows[key]
+            self.invalidations += len(keys)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "rows": len(self._rows),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "scans": self.scans,
+                "multi_gets": self.multi_gets,
+                "invalidations": self.invalidations,
+                "stale_reads": self.stale_reads,
+            }
+
+    # Internal helpers
+
+    def _decode(self, rows):
+        """({row key: decoded row}, {row key: write time}) of (key, row) pairs read as `_read_options` asks."""
+        decoded, written = {}, {}
+        for key, row in rows:
+            key = key.decode("utf-8") if isinstance(key, bytes) else key
+            if self.version_column:
+                decoded[key], written[key] = decode_timestamped_row(row)
+            else:
+                decoded[key] = decode_row(row)
+        return decoded, written
+
+    def _read_options(self):
+        # Cell timestamps stand in for the version of rows written without version_column
+        return {"include_timestamp": True} if self.version_column else {}
+
+    def _fetch(self, table_name, row_keys):
+        with self.pool.connection() as connection:
+            table = connection.table(table_name)
+            if len(row_keys) == 1:
+                found, written = self._decode([(row_keys[0], table.row(row_keys[0], **self._read_options()))])
+            else:
+                found, written = self._decode(table.rows(row_keys, **self._read_options()))
+        return {row_key: found.get(row_key) or None for row_key in row_keys}, written
+
+    def _load(self, table_name, row_keys):
+        rows = None
+        if self._scanned.get(table_name, True):
+            # Concurrent misses wait for one scan instead of each scanning the table
+            with self._load_lock:
+                fresh = self._fresh(table_name, row_keys)
+                if len(fresh) == len(row_keys):
+                    return fresh
+                fetched_at = time.monotonic()
+                if self._scanned.get(table_name, True):
+                    rows, written = self._scan(table_name)
+                if rows is not None:
+                    # A complete scan also proves which keys are absent
+                    rows.update({row_key: None for row_key in row_keys if row_key not in rows})
+                    if self._store(table_name, rows, fetched_at, written):
+                        self._scan_times[table_name] = fetched_at
+        if rows is None:
+            fetched_at = time.monotonic()
+            rows, written = self._fetch(table_name, row_keys)
+            self.multi_gets += 1
+            self._store(table_name, rows, fetched_at, written)
+        return {row_key: rows.get(row_key) for row_key in row_keys}
+
+    def _fresh(self, table_name, row_keys):
+        now = time.monotonic()
+        with self._lock:
+            fresh = {}
+            for row_key in row_keys:
+                entry = self._rows.get((table_name, row_key))
+                if entry is not None and now - entry[1] <= self.ttl:
+                    fresh[row_key] = entry[0]
+            return fresh
+
+    def _store(self, table_name, rows, fetched_at, written):
+        """Caches the rows that are not older than the stream; returns False if any was."""
+        complete = True
+        now = time.time()
+        with self._lock:
+            for row_key, row in rows.items():
+                key = (table_name, row_key)
+                pending = self._min_versions.get(key)
+                if pending is not None:
+                    min_version, seen_at = pending
+                    version = (row or {}).get(self.version_column)
+                    if version is not None:
+                        current = version >= min_version
+                    else:
+                        current = row is not None and written.get(row_key, 0) >= seen_at
+                    if not current and now - seen_at <= self.pending_timeout:
+                        # The consumer has not written the record the stream announced yet
+                        self.stale_reads += 1
+                        complete = False
+                        continue
+                    del self._min_versions[key]
+                self._rows[key] = (row, fetched_at)
+        return complete
+
+    def _scan(self, table_name):
+        """
+        Reads the whole table as (rows, write times), or returns (None, None)
+        (and stops scanning it) if it exceeds scan_limit rows.
+        """
+        with self.pool.connection() as connection:
+            rows, written = self._decode(
+                connection.table(table_name).scan(limit=self.scan_limit + 1, **self._read_options()))
+        self.scans += 1
+        if len(rows) > self.scan_limit:
+            self._scanned[table_name] = False
+            return None, None
+        return rows, written
+
+
+def start_stream_invalidation(cache, table_name, topic, consumer_config):
+    """
+    Starts a daemon thread that follows the ingestion topic and invalidates
+    the cached row of every car park a new record arrives for, until HBase
+    holds that record. Requires kafka-python.
+    """
+    from record_stream import start_record_listener
+
+    def invalidate(records):
+        versions = {}
+        for record in records:
+            # Formatted like the `last_updated` column latest_consumer.py writes
+            version = datetime.strptime(f"{record['last_updated_date']} {record['last_updated_time']}",
+                                        "%d-%m-%Y %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
+            versions[record["system_code_number"]] = max(version, versions.get(record["system_code_number"], ""))
+        cache.invalidate(table_name, list(versions), versions)
+
+    return start_record_listener(topic, consumer_config, invalidate, "hbase-cache-invalidation")
@@ -1,26 +1,184 @@
 import os
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
-from langchain_classic.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+import sys
+import json
+import hashlib
+import shutil
+import threading
 
-# Define paths relative to the project root
-KNOWLEDGE_BASE_DIR = "knowledge_base"
-FAISS_INDEX_PATH = "faiss_index"
+# The LangChain, FAISS and sentence-transformers imports are deferred to the
+# functions that use them: they take most of the chatbot's startup time.
 
-def create_vector_db():
+# Define paths relative to the chatbot directory
+BASE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+KNOWLEDGE_BASE_DIR = os.path.join(BASE_DIRECTORY, "knowledge_base")
+FAISS_INDEX_PATH = os.path.join(BASE_DIRECTORY, "faiss_index")
+MANIFEST_FILE = "manifest.json"
+
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# One embedding model per process, shared by ingest and search
+_embeddings_model = None
+_embeddings_lock = threading.Lock()
+
+def get_embeddings_model():
+    """Returns the process-wide sentence transformer embedding model, loading it on first use."""
+    global _embeddings_model
+    with _embeddings_lock:
+        if _embeddings_model is None:
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+            print("Loading sentence transformer embedding model (this may download the model on first run)...")
+            _embeddings_model = HuggingFaceEmbeddings(
+                model_name=EMBEDDING_MODEL_NAME,
+                model_kwargs={'device': 'cpu'}
+            )
+    return _embeddings_model
+
+def _text_splitter():
+    from langchain_classic.text_splitter import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _chunk_id(source, text):
+    """Content-addressed chunk id: unchanged chunks keep their id (and their embedding)."""
+    return hashlib.sha256(f"{source}\0{text}".encode('utf-8')).hexdigest()
+
+def _knowledge_base_files(knowledge_base_dir):
+    files = {}
+    for root, _, names in os.walk(knowledge_base_dir):
+        for name in names:
+            if name.endswith(".txt"):
+                path = os.path.join(root, name)
+                files[os.path.relpath(path, knowledge_base_dir)] = path
+    return files
+
+def _index_settings():
+    return {"model": EMBEDDING_MODEL_NAME, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP}
+
+def _load_manifest(index_path):
+    manifest_path = os.path.join(index_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+def _save_manifest(index_path, manifest):
+    manifest_path = os.path.join(index_path, MANIFEST_FILE)
+    with open(manifest_path + ".tmp", 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def _save_index(db, index_path):
+    """
+    Saves the index into a scratch directory and renames the files into
+    place, so processes that memory-mapped the previous index file keep
+    reading it instead of seeing it truncated.
+    """
+    scratch_path = index_path.rstrip(os.sep) + ".tmp"
+    db.save_local(scratch_path)
+    os.makedirs(index_path, exist_ok=True)
+    for name in os.listdir(scratch_path):
+        os.replace(os.path.join(scratch_path, name), os.path.join(index_path, name))
+    shutil.rmtree(scratch_path, ignore_errors=True)
+
+def load_vector_db(index_path=FAISS_INDEX_PATH, embeddings=None, mmap=False):
+    """
+    Loads the saved index. With `mmap` the vectors are memory-mapped
+    read-only instead of copied onto the heap, so worker processes forked
+    after loading (and any other process on the host) share the same pages.
+    """
+    import faiss
+    from langchain_community.vectorstores import FAISS
+    embeddings = embeddings or get_embeddings_model()
+    io_flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    return FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True, io_flags=io_flags)
+
+def update_vector_db(knowledge_base_dir=KNOWLEDGE_BASE_DIR, index_path=FAISS_INDEX_PATH, embeddings=None):
+    """
+    Brings the FAISS index in line with the knowledge base and returns it.
+
+    A manifest next to the index records the content hash of every
+    knowledge base file and the ids of its chunks. Only added or changed
+    files are re-split, only chunks whose content changed are re-embedded,
+    and chunks of removed files are deleted, all in place. When nothing
+    changed the ready index is loaded without embedding anything. A missing
+    or incompatible manifest triggers a full rebuild.
+    """
+    from langchain_community.document_loaders import TextLoader
+    from langchain_community.vectorstores import FAISS
+    embeddings = embeddings or get_embeddings_model()
+
+    if not os.path.exists(knowledge_base_dir):
+        print(f"Error: Knowledge base directory not found at '{knowledge_base_dir}'.")
+        print("Please make sure the directory exists and contains your .txt files.")
+        return None
+
+    manifest = _load_manifest(index_path)
+    index_file = os.path.join(index_path, "index.faiss")
+    if manifest is None or manifest.get("settings") != _index_settings() or not os.path.exists(index_file):
+        return create_vector_db(knowledge_base_dir, index_path, embeddings)
+
+    files = _knowledge_base_files(knowledge_base_dir)
+    known = manifest["files"]
+    hashes = {name: _file_hash(path) for name, path in files.items()}
+    changed = [name for name in files if known.get(name, {}).get("sha256") != hashes[name]]
+    removed = [name for name in known if name not in files]
+
+    db = FAISS.load_local(index_path, embeddings, allow_dangerous_deserialization=True)
+    if not changed and not removed:
+        print(f"FAISS index at '{index_path}' is up to date ({len(db.index_to_docstore_id)} chunks).")
+        return db
+
+    splitter = _text_splitter()
+    stale_ids = []
+    new_texts, new_metadatas, new_ids = [], [], []
+    for name in removed:
+        stale_ids += known.pop(name)["chunk_ids"]
+    for name in changed:
+        documents = TextLoader(files[name]).load()
+        chunks = splitter.split_documents(documents)
+        chunk_ids = [_chunk_id(name, chunk.page_content) for chunk in chunks]
+        old_ids = set(known.get(name, {}).get("chunk_ids", []))
+        stale_ids += [chunk_id for chunk_id in old_ids if chunk_id not in chunk_ids]
+        for chunk, chunk_id in zip(chunks, chunk_ids):
+            if chunk_id not in old_ids and chunk_id not in new_ids:
+                new_texts.append(chunk.page_content)
+                new_metadatas.append(chunk.metadata)
+                new_ids.append(chunk_id)
+        # Recorded even with no chunks (an empty file), so it is not re-read on every run
+        known[name] = {"sha256": hashes[name], "chunk_ids": list(dict.fromkeys(chunk_ids))}
+
+    print(f"Updating FAISS index: {len(changed)} changed and {len(removed)} removed files, "
+          f"embedding {len(new_ids)} new chunks and deleting {len(stale_ids)} stale chunks...")
+    if stale_ids:
+        db.delete(stale_ids)
+    if new_ids:
+        db.add_texts(new_texts, metadatas=new_metadatas, ids=new_ids)
+
+    _save_index(db, index_path)
+    _save_manifest(index_path, manifest)
+    print(f"FAISS index updated at '{index_path}'.")
+    return db
+
+def create_vector_db(knowledge_base_dir=KNOWLEDGE_BASE_DIR, index_path=FAISS_INDEX_PATH, embeddings=None):
     """
     Creates a FAISS vector database from documents in the knowledge base directory.
     """
-    print(f"Loading documents from '{KNOWLEDGE_BASE_DIR}'...")
+    from langchain_community.document_loaders import DirectoryLoader, TextLoader
+    from langchain_community.vectorstores import FAISS
+    print(f"Loading documents from '{knowledge_base_dir}'...")
 
-    if not os.path.exists(KNOWLEDGE_BASE_DIR):
-        print(f"Error: Knowledge base directory not found at '{KNOWLEDGE_BASE_DIR}'.")
+    if not os.path.exists(knowledge_base_dir):
+        print(f"Error: Knowledge base directory not found at '{knowledge_base_dir}'.")
         print("Please make sure the directory exists and contains your .txt files.")
-        return
+        return None
 
     loader = DirectoryLoader(
-        KNOWLEDGE_BASE_DIR,
+        knowledge_base_dir,
         glob="**/*.txt",
         loader_cls=TextLoader,
         show_progress=True,
@@ -30,31 +188,46 @@ def create_vector_db():
 
     if not documents:
         print("No .txt documents found in the knowledge base. Exiting.")
-        return
+        return None
 
     print(f"Loaded {len(documents)} documents.")
 
     print("Splitting documents into chunks...")
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    texts = text_splitter.split_documents(documents)
+    texts = _text_splitter().split_documents(documents)
     print(f"Split into {len(texts)} chunks.")
 
-    print("Loading sentence transformer embedding model (this may download the model on first run)...")
-    embeddings = HuggingFaceEmbeddings(
-        model_name='all-MiniLM-L6-v2',
-        model_kwargs={'device': 'cpu'}
-    )
+    embeddings = embeddings or get_embeddings_model()
+
+    # Content-addressed ids let later runs update the index in place. Every file is
+    # recorded, even one with no chunks, so that later runs do not see it as changed.
+    files = {name: {"sha256": _file_hash(path), "chunk_ids": []}
+             for name, path in _knowledge_base_files(knowledge_base_dir).items()}
+    unique_texts, ids = [], []
+    for chunk in texts:
+        name = os.path.relpath(chunk.metadata["source"], knowledge_base_dir)
+        chunk_id = _chunk_id(name, chunk.page_content)
+        if chunk_id in files[name]["chunk_ids"]:
+            continue
+        files[name]["chunk_ids"].append(chunk_id)
+        unique_texts.append(chunk)
+        ids.append(chunk_id)
 
     print("Creating FAISS vector store and saving to disk...")
-    db = FAISS.from_documents(texts, embeddings)
+    db = FAISS.from_documents(unique_texts, embeddings, ids=ids)
 
-    db.save_local(FAISS_INDEX_PATH)
+    _save_index(db, index_path)
+    _save_manifest(index_path, {"settings": _index_settings(), "files": files})
 
     print("--------------------------------------------------")
-    print(f"Vector database created and saved at: '{FAISS_INDEX_PATH}'")
+    print(f"Vector database created and saved at: '{index_path}'")
     print("You can now use this index in your main application.")
     print("--------------------------------------------------")
+    return db
 
 
 if __name__ == "__main__":
-    create_vector_db()
\ No newline at end of file
+    # `python ingest.py` updates the index in place, `--rebuild` re-embeds everything
+    if "--rebuild" in sys.argv:
+        create_vector_db()
+    else:
+        update_vector_db()
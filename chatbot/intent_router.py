@@ -0,0 +1,195 @@
+"""
+Recognizes the templated questions of the query cookbook before they reach
+the agent loop:
+
+- the current status of one or a few named car parks ("How many spaces are
+  available at BHMBCCMKT01?"), answered from the HBase latest table;
+- rankings of car parks right now ("Which 5 car parks are the busiest?"),
+  answered from the HBase latest table.
+
+`IntentRouter.route` returns a Route, or None with the reason when it is not
+confident: an unknown car park code, a time of day, a date or a time range,
+a location, or words that could mean more than one question. Those go to the
+agent loop unchanged.
+"""
+import re
+from collections import namedtuple
+
+Route = namedtuple("Route", ["intent", "system_code_numbers", "fields", "ranking"])
+Ranking = namedtuple("Ranking", ["metric", "unit", "ascending", "top", "heading"])
+
+STATUS_FIELDS = ("available_occupancy", "capacity", "occupancy", "queue_length", "traffic_condition")
+
+# Anything about history or the future ("in 2 hours", "later"), a time of day or date, changes, places, definitions
+# or comparisons needs the agent.
+_AGENT_ONLY = re.compile(
+    r"\b(yesterday|today|tonight|morning|mornings|afternoon|afternoons|evening|evenings|weekend|weekends|"
+    r"weekday|weekdays|was|were|did|last|past|previous|ago|average|avg|mean|median|trend|trends|trending|over time|"
+    r"history|historical|change|changes|changed|changing|later|soon|next|upcoming|hour|hours|minute|minutes|mins|"
+    r"between|since|until|before|after|during|compare|compared|comparison|versus|vs|why|how is|how are|how do|"
+    r"calculated|calculate|defined|definition|mean by|near|nearest|nearby|closest|around|address|where|located|"
+    r"location|predict|forecast|expect|will|tomorrow|week|month|year|day of|hour of|hourly|daily|each|every|per|"
+    r"january|february|march|april|may|june|july|august|september|october|november|december|"
+    r"jan|feb|mar|apr|jun|jul|aug|sep|sept|oct|nov|dec|sql|table|schema)\b"
+    r"|\d{4}-\d{2}|\d{1,2}[/:]\d{2}|\b\d{1,2}\s?(am|pm)\b|\b(19|20)\d{2}\b")
+
+# Tokens shaped like car park codes (BHMBCCMKT01, Others-CCCPS8); unknown ones send the question to the agent.
+_CODE_LIKE = re.compile(r"(?<![\w-])[A-Za-z]+(?:-[A-Za-z]+)*\d+[A-Za-z]?(?![\w-])")
+
+_FIELD_PATTERNS = [
+    ("available_occupancy", re.compile(r"\b(available|availability|free|vacant|vacancy|vacancies|empty spaces|"
+                                       r"spaces? left|open spaces|room|space for)\b")),
+    ("capacity", re.compile(r"\b(capacity|total spaces|how big|how large|size)\b")),
+    ("occupancy", re.compile(r"\b(occupancy|occupied|how full|how busy|full|busy|parked)\b")),
+    ("queue_length", re.compile(r"\b(queue|queues|queuing|queueing|waiting|wait)\b")),
+    ("traffic_condition", re.compile(r"\btraffic\b")),
+]
+# The cookbook asks for "the traffic condition near" a car park, which is not a location question.
+_TRAFFIC_NEAR = re.compile(r"\btraffic( conditions?)?( like)? (near|nearby|around)\b")
+_STATUS_WORDS = re.compile(r"\b(status|situation|latest|current|currently|now|right now|at the moment)\b")
+
+_RANKINGS = [
+    (re.compile(r"\b(emptiest|quietest|least (busy|occupied|full|crowded)|lowest occupancy)\b"),
+     Ranking("occupancy", "spaces occupied", True, None, "The {count} least occupied {car_parks}")),
+    (re.compile(r"\b(most|highest|largest) (free |available )?(space|spaces|availability|vacancies)\b"),
+     Ranking("available_occupancy", "spaces available", False, None,
+             "The {count} {car_parks} with the most available spaces")),
+    (re.compile(r"\b(longest|biggest|largest) queues?\b|\bmost queu(e|ing)\b"),
+     Ranking("queue_length", "vehicles queuing", False, None, "The {count} {car_parks} with the longest queues")),
+    (re.compile(r"\b(busiest|fullest|most (busy|occupied|full|crowded)|highest occupancy)\b"),
+     Ranking("occupancy", "spaces occupied", False, None, "The {count} busiest {car_parks}")),
+]
+_CAR_PARKS = re.compile(r"\b(car ?parks?|parking lots?|lots?|garages?)\b")
+_TOP = re.compile(r"\b(?:top )?(\d{1,2})\b")
+_SINGULAR = re.compile(r"\b(which|what) (car ?park|parking lot|lot|garage) (is|has)\b")
+
+
+class IntentRouter:
+    """
+    Routes a question to a fast-path intent. `car_parks` returns the known
+    car park codes; the matcher is rebuilt when they change.
+    """
+
+    def __init__(self, car_parks, max_car_parks=5, max_question_chars=200, default_top=5, max_top=20):
+        self.car_parks = car_parks
+        self.max_car_parks = max_car_parks
+        self.max_question_chars = max_question_chars
+        self.default_top = default_top
+        self.max_top = max_top
+        self._names = None
+        self._pattern = None
+        self._canonical = {}
+
+    def extract_car_parks(self, question):
+        """Returns (known car park codes in order of mention, code-like tokens that are not car parks)."""
+        names = tuple(self.car_parks())
+        if names != self._names:
+            escaped = sorted((re.escape(name) for name in names), key=len, reverse=True)
+            self._pattern = re.compile(r"(?<![\w-])(" + "|".join(escaped) + r")(?![\w-])", re.IGNORECASE) \
+                if escaped else None
+            self._canonical = {name.lower(): name for name in names}
+            self._names = names
+        found = []
+        remainder = question
+        if self._pattern is not None:
+            for match in self._pattern.finditer(question):
+                name = self._canonical[match.group(1).lower()]
+                if name not in found:
+                    found.append(name)
+            remainder = self._pattern.sub(" ", question)
+        unknown = [token for token in _CODE_LIKE.findall(remainder) if any(c.isupper() for c in token)]
+        return found, unknown
+
+    def route(self, question):
+        """Returns (Route, None) for a confident match, or (None, reason) to use the agent loop."""
+        question = (question or "").strip()
+        if not question:
+            return None, "empty"
+        if len(question) > self.max_question_chars:
+            return None, "too_long"
+        car_parks, unknown = self.extract_car_parks(question)
+        if unknown:
+            return None, "unknown_car_park"
+        # Match the wording with the car park names removed ("Shopping" is a car park, not a verb).
+        text = question.lower()
+        for name in car_parks:
+            text = re.sub(r"(?<![\w-])" + re.escape(name.lower()) + r"(?![\w-])", " ", text)
+        text = _TRAFFIC_NEAR.sub("traffic", text)
+        if _AGENT_ONLY.search(text):
+            return None, "needs_agent"
+
+        rankings = [ranking for pattern, ranking in _RANKINGS if pattern.search(text)]
+        if car_parks:
+            if rankings:
+                return None, "ambiguous"
+            if len(car_parks) > self.max_car_parks:
+                return None, "too_many_car_parks"
+            fields = [field for field, pattern in _FIELD_PATTERNS if pattern.search(text)]
+            if not fields:
+                if not _STATUS_WORDS.search(text):
+                    return None, "no_intent"
+                fields = list(STATUS_FIELDS)
+            return Route("car_park_status", car_parks, fields, None), None
+
+        if len(rankings) != 1 or not _CAR_PARKS.search(text):
+            return None, "ambiguous" if rankings else "no_intent"
+        numbers = _TOP.findall(text)
+        if len(numbers) > 1:
+            return None, "ambiguous"
+        if numbers:
+            top = int(numbers[0])
+        else:
+            top = 1 if _SINGULAR.search(text) else self.default_top
+        if not 1 <= top <= self.max_top:
+            return None, "ambiguous"
+        return Route("car_park_ranking", [], [], rankings[0]._replace(top=top)), None
+
+
+def _format_number(value):
+    return f"{value:.1f}".rstrip("0").rstrip(".") if isinstance(value, float) else str(value)
+
+
+def render_status(route, statuses):
+    """A plain-language answer for a car_park_status route from {car park: status}."""
+    sentences = []
+    for lot in route.system_code_numbers:
+        status = statuses.get(lot)
+        if status is None:
+            sentences.append(f"I have no current data for {lot}.")
+            continue
+        capacity = status["capacity"]
+        clauses = []
+        for field in route.fields:
+            if field == "available_occupancy":
+                clauses.append(f"{status['available_occupancy']} of {capacity} spaces available")
+            elif field == "capacity":
+                clauses.append(f"a capacity of {capacity} spaces")
+            elif field == "occupancy":
+                share = f" ({status['occupancy'] / capacity:.0%} full)" if capacity else ""
+                clauses.append(f"{status['occupancy']} spaces occupied{share}")
+            elif field == "queue_length":
+                clauses.append(f"a queue of {status['queue_length']} vehicles")
+            elif field == "traffic_condition" and status.get("traffic_condition"):
+                clauses.append(f"{status['traffic_condition']} traffic nearby")
+        if not clauses:
+            sentences.append(f"I have no traffic data for {lot}.")
+            continue
+        listed = clauses[0] if len(clauses) == 1 else ", ".join(clauses[:-1]) + " and " + clauses[-1]
+        source = "live data" if status["source"] == "hbase" else "latest historical record"
+        sentences.append(f"{lot} has {listed}, as of {status['as_of']} ({source}).")
+    return " ".join(sentences)
+
+
+def render_ranking(route, rows):
+    """A plain-language answer for a car_park_ranking route from rank_car_parks rows."""
+    ranking = route.ranking
+    if not rows:
+        return "I have no current data to rank the car parks."
+    if len(rows) == 1:
+        heading = ranking.heading.format(count="", car_parks="car park").replace("  ", " ") + " right now"
+    else:
+        heading = ranking.heading.format(count=len(rows), car_parks="car parks") + " right now"
+    lines = [f"{heading}:"]
+    for position, (lot, value, as_of) in enumerate(rows, start=1):
+        lines.append(f"{position}. {lot}: {_format_number(value)} {ranking.unit} (as of {as_of})")
+    return "\n".join(lines)
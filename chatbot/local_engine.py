@@ -0,0 +1,416 @@
+import calendar
+import csv
+import glob
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Column order of data/dataset.csv and of the raw batch files written by CarParkHiveIngestion
+RAW_COLUMNS = [
+    "id", "system_code_number", "capacity", "latitude", "longitude", "occupancy", "vehicle_type",
+    "traffic_condition_nearby", "queue_length", "is_special_day", "last_updated_date", "last_updated_time",
+]
+
+# Columns of ayaachi_parking_avail_data and their in-memory types
+COLUMN_TYPES = {
+    "id": np.int64,
+    "system_code_number": np.uint16,
+    "capacity": np.int32,
+    "occupancy": np.int32,
+    "available_occupancy": np.int32,
+    "vehicle_type": np.uint8,
+    "traffic_condition_nearby": np.uint8,
+    "queue_length": np.int32,
+    "is_special_day": np.int8,
+    "record_timestamp": np.int64,
+    "latitude": np.float64,
+    "longitude": np.float64,
+}
+DICTIONARY_COLUMNS = ("system_code_number", "vehicle_type", "traffic_condition_nearby")
+NUMERIC_COLUMNS = tuple(name for name in COLUMN_TYPES if name not in DICTIONARY_COLUMNS and name != "record_timestamp")
+GROUPABLE_COLUMNS = DICTIONARY_COLUMNS + ("capacity", "is_special_day")
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+TIME_BUCKETS = {"5min": 300, "15min": 900, "hour": 3600, "day": 86400}
+CALENDAR_BUCKETS = ("hour_of_day", "day_of_week")
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+AGGREGATES = ("count", "sum", "avg", "min", "max")
+_METRIC_PATTERN = re.compile(r"^\s*(\w+)\s*\(\s*([\w*]*)\s*\)\s*$")
+
+
+def parse_timestamp(value):
+    """Parses 'YYYY-MM-DD[ HH:MM:SS]' into epoch seconds (timestamps are kept as naive UTC)."""
+    value = value.strip()
+    fmt = TIMESTAMP_FORMAT if " " in value else "%Y-%m-%d"
+    return calendar.timegm(datetime.strptime(value, fmt).timetuple())
+
+
+def format_timestamp(seconds):
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(int(seconds)))
+
+
+class Dictionary:
+    """Maps the distinct values of a string column to small integer codes."""
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def code(self, value):
+        """Returns the code of `value`, or None if the value was never seen."""
+        return self._codes.get(value)
+
+    def encode(self, values, dtype):
+        uniques, inverse = np.unique(np.asarray(values), return_inverse=True)
+        mapping = np.array([self._add(str(value)) for value in uniques], dtype=dtype)
+        return mapping[inverse.reshape(-1)]
+
+    def decode(self, code):
+        return self.values[int(code)]
+
+    def _add(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+
+def read_raw_rows(path):
+    """Reads a raw car park CSV file (with or without the dataset header) as lists of strings."""
+    with open(path, newline="", encoding="utf-8") as csv_file:
+        rows = [row for row in csv.reader(csv_file) if len(row) == len(RAW_COLUMNS)]
+    if rows and not rows[0][0].strip().isdigit():
+        rows = rows[1:]
+    return rows
+
+
+def parse_raw_rows(rows):
+    """
+    Converts raw CSV rows into typed column arrays with the columns of
+    `ayaachi_parking_avail_data` (dictionary columns are still strings).
+    """
+    raw = dict(zip(RAW_COLUMNS, (np.array(column) for column in zip(*rows))))
+
+    # Dates and times repeat heavily, so parse each distinct value once
+    dates, date_index = np.unique(raw["last_updated_date"], return_inverse=True)
+    times, time_index = np.unique(raw["last_updated_time"], return_inverse=True)
+    day_starts = np.array(
+        [calendar.timegm(datetime.strptime(date_str, "%d-%m-%Y").timetuple()) for date_str in dates],
+        dtype=np.int64,
+    )
+    seconds_of_day = np.array(
+        [sum(int(part) * scale for part, scale in zip(time_str.split(":"), (3600, 60, 1))) for time_str in times],
+        dtype=np.int64,
+    )
+    timestamps = day_starts[date_index.reshape(-1)] + seconds_of_day[time_index.reshape(-1)]
+
+    columns = {
+        "id": raw["id"].astype(np.int64),
+        "system_code_number": raw["system_code_number"],
+        "capacity": raw["capacity"].astype(np.int32),
+        "occupancy": raw["occupancy"].astype(np.int32),
+        "vehicle_type": raw["vehicle_type"],
+        "traffic_condition_nearby": raw["traffic_condition_nearby"],
+        "queue_length": raw["queue_length"].astype(np.int32),
+        "is_special_day": raw["is_special_day"].astype(np.int8),
+        "record_timestamp": timestamps,
+        "latitude": raw["latitude"].astype(np.float64),
+        "longitude": raw["longitude"].astype(np.float64),
+    }
+    columns["available_occupancy"] = columns["capacity"] - columns["occupancy"] - columns["queue_length"]
+    return columns
+
+
+class LocalEngine:
+    """
+    An in-process, column-oriented copy of the car park history.
+
+    The history (`data/dataset.csv` plus any raw batch files in `batch_dir`)
+    is held as typed NumPy arrays, with the string columns dictionary-encoded
+    and the date/time strings parsed into epoch seconds once at load time.
+    `query` answers filter / group-by / aggregate / time-bucket questions over
+    the columns of `ayaachi_parking_avail_data` with vectorized operations, and
+    `refresh` appends only the batch files that appeared since the last call.
+    Callables in `listeners` receive every newly loaded block of parsed
+    columns, so derived structures can be maintained incrementally.
+    """
+
+    def __init__(self, dataset_path, batch_dir=None, batch_glob="*.csv"):
+        self.dataset_path = dataset_path
+        self.batch_dir = batch_dir
+        self.batch_glob = batch_glob
+        self.dictionaries = {name: Dictionary() for name in DICTIONARY_COLUMNS}
+        self.columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMN_TYPES.items()}
+        self.last_refresh = None
+        self.listeners = []
+        self._loaded_files = {}
+        self._lock = threading.Lock()
+
+    @property
+    def num_rows(self):
+        return len(self.columns["id"])
+
+    def refresh(self):
+        """Loads the dataset and any batch files added since the last call. Returns the number of rows added."""
+        with self._lock:
+            paths = [self.dataset_path]
+            if self.batch_dir:
+                paths += sorted(glob.glob(os.path.join(self.batch_dir, self.batch_glob)))
+
+            chunks = []
+            for path in paths:
+                if not os.path.exists(path):
+                    continue
+                stat = os.stat(path)
+                signature = (stat.st_size, stat.st_mtime)
+                if self._loaded_files.get(path) == signature:
+                    continue
+                if path in self._loaded_files:
+                    # Raw files are written once; a changed file would be double counted.
+                    print(f"Warning: '{path}' changed after it was loaded. Skipping it.")
+                    self._loaded_files[path] = signature
+                    continue
+                rows = read_raw_rows(path)
+                if rows:
+                    parsed = parse_raw_rows(rows)
+                    for listener in self.listeners:
+                        listener(parsed)
+                    chunks.append(self._encode(parsed))
+                self._loaded_files[path] = signature
+
+            added = sum(len(chunk["id"]) for chunk in chunks)
+            if chunks:
+                # Swap in new arrays so concurrent queries keep a consistent snapshot
+                self.columns = {
+                    name: np.concatenate([self.columns[name]] + [chunk[name] for chunk in chunks])
+                    for name in COLUMN_TYPES
+                }
+            self.last_refresh = time.monotonic()
+            return added
+
+    def query(self, metrics, group_by=None, filters=None, time_bucket=None, start=None, end=None,
+              order_by=None, descending=True, limit=None):
+        """
+        Runs an aggregate query and returns (column_names, rows).
+
+        :param metrics: Aggregates such as "count(*)", "avg(occupancy)", "max(queue_length)".
+        :param group_by: Columns to group by, e.g. ["system_code_number"].
+        :param filters: Predicates as {"column", "op", "value"}; op is one of =, !=, >, >=, <, <=, in.
+        :param time_bucket: Group by record_timestamp bucket: 5min, 15min, hour, day, hour_of_day or day_of_week.
+        :param start: Inclusive lower bound on record_timestamp ('YYYY-MM-DD[ HH:MM:SS]').
+        :param end: Exclusive upper bound on record_timestamp.
+        :param order_by: Output column to sort by. Defaults to the group columns.
+        """
+        columns = self.columns
+        group_by = list(group_by or [])
+        parsed_metrics = [self._parse_metric(metric) for metric in metrics]
+        if not parsed_metrics:
+            raise ValueError("At least one metric is required, e.g. 'count(*)'.")
+
+        mask = np.ones(len(columns["id"]), dtype=bool)
+        for condition in filters or []:
+            mask &= self._predicate(columns, condition["column"], condition.get("op", "="), condition["value"])
+        if start:
+            mask &= columns["record_timestamp"] >= parse_timestamp(start)
+        if end:
+            mask &= columns["record_timestamp"] < parse_timestamp(end)
+        selected = {name: values[mask] for name, values in columns.items()}
+
+        keys = []
+        for name in group_by:
+            if name not in GROUPABLE_COLUMNS:
+                raise ValueError(f"Cannot group by '{name}'. Groupable columns: {', '.join(GROUPABLE_COLUMNS)}.")
+            keys.append(selected[name].astype(np.int64))
+        key_names = list(group_by)
+        if time_bucket:
+            keys.append(self._bucket(selected["record_timestamp"], time_bucket))
+            key_names.append(time_bucket if time_bucket in CALENDAR_BUCKETS else "time_bucket")
+
+        group_values, inverse = self._group(keys, len(selected["id"]))
+        group_count = len(group_values[0]) if keys else (1 if len(selected["id"]) else 0)
+
+        counts = np.bincount(inverse, minlength=group_count)
+        order = None
+        metric_values = []
+        for aggregate, column, _ in parsed_metrics:
+            if aggregate in ("min", "max") and order is None:
+                order = np.argsort(inverse, kind="stable")
+            metric_values.append(self._aggregate(aggregate, selected.get(column), inverse, counts, order))
+
+        names = key_names + [label for _, _, label in parsed_metrics]
+        key_sources = group_by + ([time_bucket] if time_bucket else [])
+        rows = []
+        for group in range(group_count):
+            row = [self._decode_key(name, values[group], time_bucket) for name, values in zip(key_sources, group_values)]
+            row += [self._to_python(values[group]) for values in metric_values]
+            rows.append(row)
+
+        if order_by:
+            if order_by not in names:
+                raise ValueError(f"Cannot order by '{order_by}'. Output columns: {', '.join(names)}.")
+            position = names.index(order_by)
+            rows.sort(key=lambda row: (row[position] is None, row[position]), reverse=descending)
+        if limit:
+            rows = rows[:int(limit)]
+        return names, rows
+
+    def latest(self):
+        """Returns {system_code_number: record} with the most recent record of each car park."""
+        columns = self.columns
+        if not len(columns["id"]):
+            return {}
+        lots = columns["system_code_number"]
+        order = np.lexsort((columns["id"], columns["record_timestamp"], lots))
+        sorted_lots = lots[order]
+        last_rows = order[np.flatnonzero(np.append(sorted_lots[1:] != sorted_lots[:-1], True))]
+
+        records = {}
+        for row in last_rows.tolist():
+            record = {}
+            for name in COLUMN_TYPES:
+                value = columns[name][row]
+                if name in DICTIONARY_COLUMNS:
+                    record[name] = self.dictionaries[name].decode(value)
+                elif name == "record_timestamp":
+                    record[name] = format_timestamp(value)
+                else:
+                    record[name] = value.item()
+            records[record["system_code_number"]] = record
+        return records
+
+    # Internal helpers
+
+    def _encode(self, columns):
+        encoded = dict(columns)
+        for name in DICTIONARY_COLUMNS:
+            encoded[name] = self.dictionaries[name].encode(columns[name], COLUMN_TYPES[name])
+        return encoded
+
+    @staticmethod
+    def _parse_metric(metric):
+        match = _METRIC_PATTERN.match(metric)
+        if metric.strip().lower() == "count":
+            return "count", None, "count(*)"
+        if not match:
+            raise ValueError(f"Invalid metric '{metric}'. Use e.g. 'count(*)' or 'avg(occupancy)'.")
+        aggregate, column = match.group(1).lower(), match.group(2).lower()
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate '{aggregate}'. Supported: {', '.join(AGGREGATES)}.")
+        if aggregate == "count":
+            return "count", None, "count(*)"
+        if column not in NUMERIC_COLUMNS:
+            raise ValueError(f"Cannot aggregate '{column}'. Numeric columns: {', '.join(NUMERIC_COLUMNS)}.")
+        return aggregate, column, f"{aggregate}({column})"
+
+    def _predicate(self, columns, column, op, value):
+        if column not in columns:
+            raise ValueError(f"Unknown column '{column}'.")
+        values = columns[column]
+        op = op.lower()
+        targets = value if isinstance(value, list) else [value]
+        if column in DICTIONARY_COLUMNS:
+            dictionary = self.dictionaries[column]
+            codes = [dictionary.code(str(target)) for target in targets]
+            targets = [code for code in codes if code is not None]
+            if op in ("=", "in"):
+                return np.isin(values, targets)
+            if op == "!=":
+                return ~np.isin(values, targets)
+            raise ValueError(f"Operator '{op}' is not supported on '{column}'. Use =, != or in.")
+        if column == "record_timestamp":
+            targets = [parse_timestamp(target) if isinstance(target, str) else target for target in targets]
+        if op == "in":
+            return np.isin(values, targets)
+        target = targets[0]
+        if op in ("=", "=="):
+            return values == target
+        if op in ("!=", "<>"):
+            return values != target
+        if op == ">":
+            return values > target
+        if op == ">=":
+            return values >= target
+        if op == "<":
+            return values < target
+        if op == "<=":
+            return values <= target
+        raise ValueError(f"Unknown operator '{op}'.")
+
+    @staticmethod
+    def _bucket(timestamps, time_bucket):
+        if time_bucket in TIME_BUCKETS:
+            width = TIME_BUCKETS[time_bucket]
+            return timestamps - timestamps % width
+        if time_bucket == "hour_of_day":
+            return (timestamps % 86400) // 3600
+        if time_bucket == "day_of_week":
+            # 1970-01-01 was a Thursday; shift so that Monday is 0
+            return (timestamps // 86400 + 3) % 7
+        raise ValueError(f"Unknown time bucket '{time_bucket}'. Supported: {', '.join(list(TIME_BUCKETS) + list(CALENDAR_BUCKETS))}.")
+
+    @staticmethod
+    def _group(keys, row_count):
+        """
+        Assigns every row a dense group number. Returns the key values of each
+        group (one array per key) and the group number of every row.
+        """
+        if not keys:
+            return [], np.zeros(row_count, dtype=np.int64)
+        # Combine the factorized keys into one mixed-radix integer so a single
+        # 1-D np.unique does the grouping.
+        factors = [np.unique(key, return_inverse=True) for key in keys]
+        composite = np.zeros(row_count, dtype=np.int64)
+        for uniques, key_index in factors:
+            composite = composite * len(uniques) + key_index.reshape(-1)
+        groups, inverse = np.unique(composite, return_inverse=True)
+
+        group_values = []
+        remainder = groups
+        for uniques, _ in reversed(factors):
+            remainder, position = np.divmod(remainder, len(uniques))
+            group_values.append(uniques[position])
+        return group_values[::-1], inverse.reshape(-1)
+
+    @staticmethod
+    def _aggregate(aggregate, values, inverse, counts, order):
+        group_count = len(counts)
+        if aggregate == "count":
+            return counts
+        if aggregate in ("sum", "avg"):
+            sums = np.bincount(inverse, weights=values, minlength=group_count)
+            if aggregate == "sum":
+                return sums
+            return sums / counts
+        if group_count == 0:
+            return np.empty(0)
+        # Rows sorted by group, reduced over each group's contiguous slice
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        reduce = np.minimum.reduceat if aggregate == "min" else np.maximum.reduceat
+        return reduce(values[order], starts)
+
+    def _decode_key(self, name, value, time_bucket):
+        if name in DICTIONARY_COLUMNS:
+            return self.dictionaries[name].decode(value)
+        if name == time_bucket:
+            if name == "day_of_week":
+                return DAY_NAMES[int(value)]
+            if name == "hour_of_day":
+                return int(value)
+            return format_timestamp(value)
+        return int(value)
+
+    @staticmethod
+    def _to_python(value):
+        value = value.item()
+        if isinstance(value, float):
+            if value in (float("inf"), float("-inf")) or value != value:
+                return None
+            return int(value) if value.is_integer() else round(value, 2)
+        return value
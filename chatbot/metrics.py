@@ -0,0 +1,220 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                    cumulative += count
+                    labels = _format_labels(self.label_names, key, [("le", bound)])
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, label_names=()):
+        metric = Counter(name, documentation, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, documentation, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CHAT_REQUEST_SECONDS = REGISTRY.histogram(
+    "chatbot_chat_request_seconds", "Time to answer one chat request.", ["endpoint", "status"])
+AGENT_ITERATIONS = REGISTRY.histogram(
+    "chatbot_agent_iterations", "Model calls needed to answer one chat request.", buckets=COUNT_BUCKETS)
+LLM_CALL_SECONDS = REGISTRY.histogram(
+    "chatbot_llm_call_seconds", "Duration of one chat completion call (to the last streamed chunk).",
+    ["model", "finish_reason"])
+LLM_TOKENS = REGISTRY.counter("chatbot_llm_tokens_total", "Tokens used by chat completion calls.", ["model", "kind"])
+TOOL_CALL_SECONDS = REGISTRY.histogram("chatbot_tool_call_seconds", "Duration of one tool call.", ["tool", "status"])
+TOOL_RESULT_BYTES = REGISTRY.histogram(
+    "chatbot_tool_result_bytes", "Size of the tool output returned to the model.", ["tool"], buckets=SIZE_BUCKETS)
+SPAN_SECONDS = REGISTRY.histogram(
+    "chatbot_span_seconds", "Duration of backend calls (Hive, HBase, FAISS, geocoding) and serialization.",
+    ["span"])
+ROUTER_DECISIONS = REGISTRY.counter(
+    "chatbot_router_decisions_total",
+    "Chat requests by path: answered by the fast path (with its intent) or by the agent loop (with the reason).",
+    ["path", "intent"])
+QUERY_GUARD_DECISIONS = REGISTRY.counter(
+    "chatbot_query_guard_decisions_total",
+    "query_hive statements accepted, rewritten (LIMIT added) or rejected by the query guard, with the reason.",
+    ["decision", "reason"])
+
+
+class Trace:
+    """The spans of one chat request, kept for its optional timing breakdown."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self.iterations = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.path = None
+        self.intent = None
+        self._lock = threading.Lock()
+
+    def add(self, name, started, seconds, **attributes):
+        span = {"name": name, "start_ms": round((started - self.started) * 1000, 2),
+                "duration_ms": round(seconds * 1000, 2)}
+        span.update(attributes)
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start_ms"])
+        totals = {}
+        for span in spans:
+            kind = span["name"].split(":", 1)[0]
+            totals[kind] = round(totals.get(kind, 0) + span["duration_ms"], 2)
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "path": self.path,
+            "intent": self.intent,
+            "iterations": self.iterations,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "totals_ms": totals,
+            "spans": spans,
+        }
+
+
+@contextmanager
+def use_trace(trace):
+    """Makes `trace` the current trace, so spans opened below (e.g. inside tools) are added to it."""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Times a block into `chatbot_span_seconds` and the current trace, if any."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        SPAN_SECONDS.observe(seconds, span=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(name, started, seconds, **attributes)
+
+
+def record_llm_call(trace, model, started, finish_reason, usage):
+    """Records one chat completion call; `usage` may be None when the API did not report it."""
+    seconds = time.perf_counter() - started
+    LLM_CALL_SECONDS.observe(seconds, model=model, finish_reason=finish_reason or "")
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+    trace.iterations += 1
+    trace.prompt_tokens += prompt_tokens
+    trace.completion_tokens += completion_tokens
+    trace.add(f"llm:{trace.iterations}", started, seconds, finish_reason=finish_reason,
+              prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+def record_tool_call(trace, tool, started, result):
+    """Records one tool call. Tools report failures as strings, so those are counted as errors."""
+    seconds = time.perf_counter() - started
+    status = "error" if str(result).lstrip().lower().startswith(("error", "an error")) else "ok"
+    size = len(str(result).encode("utf-8"))
+    TOOL_CALL_SECONDS.observe(seconds, tool=tool, status=status)
+    TOOL_RESULT_BYTES.observe(size, tool=tool)
+    trace.add(f"tool:{tool}", started, seconds, status=status, result_bytes=size)
+
+
+def record_route(trace, path, intent):
+    """Records whether a request took the fast path ("fast", with its intent) or the agent loop ("agent", with why)."""
+    ROUTER_DECISIONS.inc(path=path, intent=intent)
+    trace.path = path
+    trace.intent = intent
@@ -3,7 +3,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const userInput = document.getElementById('user-input');
     const sendBtn = document.getElementById('send-btn');
 
-    let messages = []; // Array to store the entire conversation history
+    let sessionId = null; // The conversation history is kept on the server
 
     const appendMessage = (text, sender) => {
         const messageElement = document.createElement('div');
@@ -28,7 +28,6 @@ document.addEventListener('DOMContentLoaded', () => {
 
         appendMessage(userText, 'user-message');
         userInput.value = '';
-        messages.push({ role: 'user', content: userText });
 
         // --- Create and show typing indicator ---
         const typingIndicator = document.createElement('div');
@@ -38,29 +37,83 @@ document.addEventListener('DOMContentLoaded', () => {
         chatBox.scrollTop = chatBox.scrollHeight;
         toggleInput(false);
 
+        let botMessage = null;
+        let toolStatus = null;
+        const removeTypingIndicator = () => {
+            if (chatBox.contains(typingIndicator)) {
+                chatBox.removeChild(typingIndicator);
+            }
+        };
+
+        // Handles one server-sent event from /api/chat/stream
+        const handleEvent = (event, data) => {
+            if (event === 'session') {
+                sessionId = data.session_id;
+            } else if (event === 'tool_start') {
+                if (!toolStatus) {
+                    toolStatus = appendMessage('', 'bot-message');
+                    toolStatus.classList.add('tool-status');
+                    if (chatBox.contains(typingIndicator)) {
+                        chatBox.insertBefore(toolStatus, typingIndicator);
+                    }
+                }
+                toolStatus.innerText += `${toolStatus.innerText ? '\n' : ''}Running ${data.name}...`;
+            } else if (event === 'tool_end') {
+                toolStatus.innerText = toolStatus.innerText.replace(`Running ${data.name}...`, `Finished ${data.name}`);
+            } else if (event === 'token') {
+                removeTypingIndicator();
+                if (!botMessage) {
+                    botMessage = appendMessage('', 'bot-message');
+                }
+                botMessage.innerText += data.content;
+                chatBox.scrollTop = chatBox.scrollHeight;
+            } else if (event === 'done') {
+                removeTypingIndicator();
+                if (!botMessage && data.reply.content) {
+                    appendMessage(data.reply.content, 'bot-message');
+                }
+            } else if (event === 'error') {
+                removeTypingIndicator();
+                appendMessage(`Error: ${data.error}`, 'bot-message');
+            }
+        };
+
         try {
-            const response = await fetch('/api/chat', {
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ messages: messages }),
+                body: JSON.stringify({ session_id: sessionId, message: userText }),
             });
 
-            const data = await response.json();
+            // Parse the SSE stream: events are separated by a blank line
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
 
-            // --- Remove typing indicator ---
-            chatBox.removeChild(typingIndicator);
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
 
-            if (data.error) {
-                appendMessage(`Error: ${data.error}`, 'bot-message');
-            } else {
-                const assistantMessage = data.reply;
-                messages.push(assistantMessage);
-                if (assistantMessage.content) {
-                    appendMessage(assistantMessage.content, 'bot-message');
+                    let event = 'message';
+                    let data = '';
+                    for (const line of rawEvent.split('\n')) {
+                        if (line.startsWith('event: ')) {
+                            event = line.slice(7);
+                        } else if (line.startsWith('data: ')) {
+                            data += line.slice(6);
+                        }
+                    }
+                    handleEvent(event, JSON.parse(data));
                 }
             }
+            removeTypingIndicator();
 
         } catch (error) {
             // --- Remove typing indicator on error ---
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import OrderedDict
+
+from sql_utils import normalize_sql, referenced_tables
+
+
+class QueryCache:
+    """
+    An LRU cache of query results keyed on the normalized SQL text.
+
+    Entries are bounded by the total size of the cached results in bytes and
+    expire after the TTL of the freshest table they read from, so results
+    over batch-loaded tables live as long as a batch interval while results
+    over streaming tables expire within seconds. A TTL of 0 disables caching
+    for that table.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, default_ttl=300, table_ttls=None, enabled=True):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.table_ttls = {name.lower(): ttl for name, ttl in (table_ttls or {}).items()}
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def ttl_for(self, sql):
+        """Returns the TTL in seconds for a statement based on the tables it reads."""
+        tables = referenced_tables(sql)
+        if not tables:
+            return self.default_ttl
+        return min(self.table_ttls.get(table, self.default_ttl) for table in tables)
+
+    def get(self, sql):
+        """Returns the cached result for `sql`, or None on a miss."""
+        if not self.enabled:
+            return None
+        key = normalize_sql(sql)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, sql, value):
+        """Caches `value` for `sql` unless its tables are not cacheable or it is too large."""
+        if not self.enabled:
+            return
+        ttl = self.ttl_for(sql)
+        key = normalize_sql(sql)
+        size = len(key.encode("utf-8")) + len(value.encode("utf-8"))
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + ttl)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Returns the hit/miss counters and current size of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
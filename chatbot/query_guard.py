@@ -0,0 +1,438 @@
+"""
+Checks the SQL the model sends to query_hive before it reaches the shared
+HiveServer2.
+
+`QueryGuard.check` accepts only a single read-only SELECT (or WITH ...
+SELECT) statement and estimates how much data it would read. It returns a
+Decision whose action is:
+
+- "rejected" for any other statement, when the estimate is over
+  `max_scan_mb`, or when it reads every column of a history table or sorts
+  one (Hive sorts the whole table even with a LIMIT) without a time filter,
+  whatever the estimate; the message tells the model how to fix the query:
+  the time filter to add (as a statement it can run as is), the columns to
+  drop, or the faster tool to use;
+- "rewritten" when a default LIMIT was added (never to a query returning a
+  single aggregate row);
+- "accepted" otherwise.
+
+The estimate is rows x selectivity x bytes per row for every table read. ORC
+tables are read column by column, so only the columns the query mentions
+count (all of them for `SELECT *`), and a range on the time column or the
+date partition, or an equality on a key column such as system_code_number,
+narrows the rows read. Text tables are always read in full. Predicates are
+taken as ANDed and independent: it is a guard against runaway scans, not a
+query planner.
+"""
+import logging
+import threading
+import time
+from collections import Counter, namedtuple
+
+from local_engine import format_timestamp, parse_timestamp
+from result_format import push_down_limit
+from sql_utils import normalize_sql, tokenize_sql_spans
+
+logger = logging.getLogger(__name__)
+
+Decision = namedtuple("Decision", ["action", "sql", "reason", "scan_mb", "message"])
+Estimate = namedtuple("Estimate", ["table", "table_rows", "rows", "scan_mb", "time_filtered", "key_filtered",
+                                   "all_columns"])
+
+# Anything that writes, changes the session or runs a script
+WRITE_KEYWORDS = {
+    "insert", "update", "delete", "merge", "upsert", "drop", "create", "alter", "truncate", "load", "grant", "revoke",
+    "msck", "set", "reset", "export", "import", "overwrite", "into", "transform", "reduce", "use", "analyze",
+    "lock", "unlock", "dfs", "reload", "kill", "abort", "compact",
+}
+# Clauses that end the WHERE clause of a query
+CLAUSE_KEYWORDS = {"group", "having", "order", "sort", "cluster", "distribute", "limit", "window", "union"}
+# Words that can follow a table name where an alias would be
+_NOT_ALIASES = CLAUSE_KEYWORDS | {"where", "join", "left", "right", "inner", "full", "outer", "cross", "semi", "on",
+                                  "lateral", "tablesample"}
+# Bytes per value of each Hive type read from ORC; strings are dictionary encoded
+TYPE_BYTES = {"boolean": 1, "tinyint": 1, "smallint": 2, "int": 4, "float": 4, "date": 4, "bigint": 8, "double": 8,
+              "timestamp": 8, "string": 8}
+DEFAULT_ROW_BYTES = 100
+COMPARISONS = {"=", "==", "<", "<=", ">", ">="}
+# Share of the rows kept by a time predicate whose bounds cannot be read (e.g. `hour(record_timestamp) = 8`)
+UNKNOWN_TIME_SELECTIVITY = 0.25
+DAY = 86400
+
+
+def _is_column(token, column):
+    kind, text = token[0], token[1]
+    return kind in ("word", "quoted_ident") and text.strip("`").lower().split(".")[-1] == column
+
+
+def _timestamp_literal(tokens, index):
+    """(epoch seconds, date only) of the timestamp literal at tokens[index], seen through CAST(...) and the like."""
+    while index < len(tokens) and tokens[index][1].lower() in ("cast", "(", "timestamp", "date", "to_date"):
+        index += 1
+    if index >= len(tokens) or tokens[index][0] != "string":
+        return None
+    value = tokens[index][1][1:-1].split(".")[0]
+    try:
+        return parse_timestamp(value), len(value) == 10
+    except ValueError:
+        return None
+
+
+def time_bounds(tokens, column):
+    """
+    Returns (compared, lower, upper): whether `column` is compared to
+    anything, and the [lower, upper) epoch seconds range implied by its
+    comparisons with timestamp literals (None where unbounded).
+    """
+    compared, lower, upper = False, None, None
+
+    def bound(op, literal):
+        nonlocal lower, upper
+        if literal is None:
+            return
+        value, date_only = literal
+        after = value + (DAY if date_only else 1)
+        if op in (">", ">=", "=", "=="):
+            lower = value if lower is None else max(lower, value)
+        if op == "<":
+            upper = value if upper is None else min(upper, value)
+        elif op in ("<=", "=", "=="):
+            upper = after if upper is None else min(upper, after)
+
+    flipped = {"<": ">", "<=": ">=", ">": "<", ">=": "<="}
+    for index, token in enumerate(tokens):
+        if not _is_column(token, column):
+            continue
+        # `to_date(record_timestamp) = ...`, `CAST(record_timestamp AS DATE) >= ...`
+        after = index + 1
+        while after < len(tokens) and tokens[after][1].lower() in (")", "as", "date", "timestamp", "string"):
+            after += 1
+        op = tokens[after][1].lower() if after < len(tokens) else None
+        if op in COMPARISONS:
+            compared = True
+            bound(op, _timestamp_literal(tokens, after + 1))
+        elif op == "between":
+            compared = True
+            low = _timestamp_literal(tokens, after + 1)
+            high_index = next((i for i in range(after + 2, len(tokens)) if tokens[i][1].lower() == "and"), None)
+            high = _timestamp_literal(tokens, high_index + 1) if high_index is not None else None
+            bound(">=", low)
+            bound("<=", high)
+        elif op in ("in", "<>", "!=", "like", "rlike", "is"):
+            compared = True
+        elif index >= 2 and tokens[index - 1][1] in COMPARISONS and tokens[index - 2][0] == "string":
+            compared = True
+            op = tokens[index - 1][1]
+            bound(flipped.get(op, op), _timestamp_literal(tokens, index - 2))
+    return compared, lower, upper
+
+
+def key_values(tokens, column):
+    """The number of values `column` is restricted to with `=` or `IN (...)`, or None."""
+    counts = []
+    for index, token in enumerate(tokens[:-1]):
+        if not _is_column(token, column):
+            continue
+        op = tokens[index + 1][1].lower()
+        if op in ("=", "==") and index + 2 < len(tokens) and tokens[index + 2][0] == "string":
+            counts.append(1)
+        elif op == "in" and index + 2 < len(tokens) and tokens[index + 2][1] == "(":
+            end = index + 3
+            while end < len(tokens) and tokens[end][1] != ")":
+                end += 1
+            items = tokens[index + 3:end]
+            if items and all(kind in ("string", "number") or text == "," for kind, text, *_ in items):
+                counts.append(len(items[0::2]))
+    return min(counts) if counts else None
+
+
+def outer_table(tokens):
+    """(table name, alias or None) of the first table in the FROM clause of the outermost query, or (None, None)."""
+    depth = 0
+    for index, token in enumerate(tokens):
+        kind, text = token[0], token[1]
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+        elif depth == 0 and kind == "word" and text.lower() == "from":
+            if index + 1 >= len(tokens) or tokens[index + 1][0] not in ("word", "quoted_ident"):
+                return None, None
+            table = tokens[index + 1][1].strip("`").lower().split(".")[-1]
+            following = tokens[index + 2:index + 4]
+            if following and following[0][1].lower() == "as":
+                following = following[1:]
+            if following and following[0][0] == "word" and following[0][1].lower() not in _NOT_ALIASES:
+                return table, following[0][1]
+            return table, None
+    return None, None
+
+
+def add_predicate(sql, predicate):
+    """
+    Adds `predicate` to the WHERE clause of the outermost query, creating the
+    clause if needed. Returns None for a UNION, where one WHERE would not cover
+    every branch.
+    """
+    body = sql.strip().rstrip(";").rstrip()
+    tokens = tokenize_sql_spans(body)
+    depth = 0
+    seen_from = False
+    where = cut = None
+    for index, (kind, text, _, _) in enumerate(tokens):
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+        elif depth == 0 and kind == "word":
+            word = text.lower()
+            if word == "union":
+                return None
+            if word == "from":
+                seen_from = True
+            elif word == "where" and seen_from:
+                where = index
+            elif word in CLAUSE_KEYWORDS and seen_from and cut is None:
+                cut = index
+    end = tokens[cut][2] if cut is not None else len(body)
+    if where is not None:
+        start = tokens[where][3]
+        return f"{body[:start]} {predicate} AND ({body[start:end].strip()}) {body[end:]}".strip()
+    return f"{body[:end].rstrip()} WHERE {predicate} {body[end:]}".strip()
+
+
+def _rows_read(estimate):
+    if estimate.rows >= estimate.table_rows:
+        return f"all {estimate.table_rows:,.0f} rows of {estimate.table}"
+    return f"about {estimate.rows:,.0f} of the {estimate.table_rows:,.0f} rows of {estimate.table}"
+
+
+class QueryGuard:
+    """
+    Validates, estimates and rewrites SQL for query_hive.
+
+    `tables` maps table names to their statistics: `rows`, `format` ("orc"
+    or "text"), `row_bytes` (for tables without a schema), `time_column`,
+    `partition_column` (a 'YYYY-MM-DD' date partition) and `key_columns`
+    ({column: distinct values}). The time range of a table runs from
+    `first_timestamp` to `last_timestamp`, or to the current time for a
+    table with `streaming: true` (fed by the ingestion stream). A table with
+    `history: true` holds the car park history: `history_stats` (returning
+    (rows, first, last) epoch seconds of the local copy) fills in what is not
+    configured, and `rows` is then a floor, since the local copy holds only
+    part of the Hive table. `schema` returns the SchemaCatalog tables, for
+    the column types.
+    """
+
+    def __init__(self, tables=None, schema=None, history_stats=None, max_scan_mb=256, default_limit=None,
+                 suggested_days=7, clock=time.time):
+        self.tables = {name.lower(): stats for name, stats in (tables or {}).items()}
+        self.schema = schema
+        self.history_stats = history_stats
+        self.max_scan_mb = max_scan_mb
+        self.default_limit = default_limit
+        self.suggested_days = suggested_days
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.decisions = Counter()
+
+    def check(self, sql):
+        """Returns the Decision for `sql` and logs it."""
+        decision = self.decide(sql)
+        with self._lock:
+            self.decisions[decision.action] += 1
+        statement = normalize_sql(sql)[:500]
+        if decision.action == "rejected":
+            logger.warning("Query guard rejected (%s, %.1f MB): %s", decision.reason, decision.scan_mb, statement)
+        else:
+            logger.info("Query guard %s (%s, %.1f MB): %s", decision.action, decision.reason, decision.scan_mb,
+                        statement)
+        return decision
+
+    def stats(self):
+        with self._lock:
+            return {"accepted": self.decisions["accepted"], "rewritten": self.decisions["rewritten"],
+                    "rejected": self.decisions["rejected"], "max_scan_mb": self.max_scan_mb}
+
+    def estimate(self, sql):
+        """Returns an Estimate for every table the statement reads that has statistics."""
+        tokens = tokenize_sql_spans(sql)
+        all_columns = any(
+            (text == "*" and index and tokens[index - 1][1].lower() in ("select", ",", "distinct", "all"))
+            or (kind == "word" and text.endswith(".*"))
+            for index, (kind, text, _, _) in enumerate(tokens)
+        )
+        has_or = any(kind == "word" and text.lower() == "or" for kind, text, _, _ in tokens)
+        tables = []
+        for index, (kind, text, _, _) in enumerate(tokens[:-1]):
+            if kind == "word" and text.lower() in ("from", "join") and tokens[index + 1][0] in ("word", "quoted_ident"):
+                table = tokens[index + 1][1].strip("`").lower().split(".")[-1]
+                if table in self.tables and table not in tables:
+                    tables.append(table)
+        return [self._estimate_table(table, tokens, all_columns, has_or) for table in tables]
+
+    def decide(self, sql):
+        """Returns the Decision for `sql` without logging or counting it."""
+        tokens = tokenize_sql_spans(sql)
+        while tokens and tokens[-1][1] == ";":
+            tokens.pop()
+        if not tokens:
+            return Decision("rejected", sql, "empty", 0.0, "Error: the query is empty.")
+        if any(text == ";" for _, text, _, _ in tokens):
+            return Decision("rejected", sql, "multiple_statements", 0.0,
+                            "Error: query rejected: run one statement at a time, without ';' between statements.")
+        if tokens[0][1].lower() not in ("select", "with"):
+            return Decision("rejected", sql, "not_select", 0.0,
+                            f"Error: query rejected: only read-only SELECT queries can be run, not "
+                            f"{tokens[0][1].upper()}. Use get_relevant_tables to look up table schemas.")
+        for kind, text, _, _ in tokens:
+            if kind == "word" and text.lower() in WRITE_KEYWORDS:
+                return Decision("rejected", sql, "not_read_only", 0.0,
+                                f"Error: query rejected: {text.upper()} is not allowed; only read-only SELECT "
+                                f"queries can be run.")
+
+        estimates = self.estimate(sql)
+        scan_mb = sum(estimate.scan_mb for estimate in estimates)
+        if self.max_scan_mb and scan_mb > self.max_scan_mb:
+            largest = max(estimates, key=lambda estimate: estimate.scan_mb)
+            headline = (f"it would read about {scan_mb:,.0f} MB ({_rows_read(largest)}), over the "
+                        f"{self.max_scan_mb:,.0f} MB budget for one query")
+            return Decision("rejected", sql, "over_budget", scan_mb, self._rejection(sql, largest, headline))
+
+        sorts = any(kind == "word" and text.lower() in ("order", "sort") and following[1].lower() == "by"
+                    for (kind, text, _, _), following in zip(tokens, tokens[1:]))
+        for estimate in estimates:
+            stats = self.tables[estimate.table]
+            if stats.get("history") and stats.get("time_column") and not estimate.time_filtered \
+                    and (estimate.all_columns or sorts):
+                action = "sorts" if sorts else "reads every column of"
+                headline = f"it {action} {_rows_read(estimate)} with no filter on {stats['time_column']}"
+                if sorts:
+                    headline += "; Hive sorts every row it reads even with a LIMIT"
+                return Decision("rejected", sql, "unfiltered_history", scan_mb,
+                                self._rejection(sql, estimate, headline))
+
+        if self.default_limit:
+            limited = push_down_limit(sql, self.default_limit)
+            if limited != sql:
+                return Decision("rewritten", limited, "limit_added", scan_mb, None)
+        return Decision("accepted", sql, "within_budget", scan_mb, None)
+
+    def _table_stats(self, table):
+        """(rows, first, last) of a table; first and last are None when its time range is not known."""
+        stats = self.tables[table]
+        rows = stats.get("rows", 0)
+        first = parse_timestamp(stats["first_timestamp"]) if stats.get("first_timestamp") else None
+        last = parse_timestamp(stats["last_timestamp"]) if stats.get("last_timestamp") else None
+        if stats.get("history") and self.history_stats is not None:
+            try:
+                local_rows, local_first, local_last = self.history_stats()
+                rows = max(rows, local_rows)
+                first = local_first if first is None else first
+                last = local_last if last is None else last
+            except Exception as e:
+                logger.warning("Query guard could not read the history statistics: %s", e)
+        if stats.get("streaming") and first is not None:
+            # Records keep arriving: the table spans up to now, whatever the local copy holds
+            last = max(last or first, int(self.clock()))
+        if first is None or last is None:
+            return rows, None, None
+        return rows, first, last
+
+    def _column_bytes(self, table):
+        """{column: bytes per value} of a table from the schema, or None when it has no schema."""
+        tables = self.schema() if self.schema is not None else {}
+        if table not in tables:
+            return None
+        return {column.name.lower(): TYPE_BYTES.get(column.type.lower().split("(")[0], 8)
+                for column in tables[table].columns}
+
+    def _estimate_table(self, table, tokens, all_columns, has_or):
+        stats = self.tables[table]
+        rows, first, last = self._table_stats(table)
+
+        column_bytes = self._column_bytes(table)
+        if stats.get("format", "orc") == "text" or column_bytes is None:
+            row_bytes = stats.get("row_bytes", DEFAULT_ROW_BYTES)
+        elif all_columns:
+            row_bytes = sum(column_bytes.values())
+        else:
+            row_bytes = sum(size for column, size in column_bytes.items()
+                            if any(_is_column(token, column) for token in tokens))
+
+        selectivity = 1.0
+        time_filtered = key_filtered = False
+        if stats.get("format", "orc") != "text":
+            compared, lower, upper = False, None, None
+            for column in (stats.get("time_column"), stats.get("partition_column")):
+                if column:
+                    column_compared, column_lower, column_upper = time_bounds(tokens, column)
+                    compared = compared or column_compared
+                    lower = column_lower if lower is None else max(lower, column_lower or lower)
+                    upper = column_upper if upper is None else min(upper, column_upper or upper)
+            time_filtered = compared
+            if compared and first is not None and (lower is not None or upper is not None):
+                start, end = max(lower or first, first), min(upper or last + 1, last + 1)
+                selectivity *= max(end - start, 0) / max(last + 1 - first, 1)
+            elif compared:
+                selectivity *= UNKNOWN_TIME_SELECTIVITY
+            for column, distinct in stats.get("key_columns", {}).items():
+                values = key_values(tokens, column)
+                if values is not None:
+                    key_filtered = True
+                    if not has_or:
+                        selectivity *= min(1.0, values / max(distinct, 1))
+
+        rows_read = rows * selectivity
+        # A query naming no column (COUNT(*)) is counted as a byte per row
+        return Estimate(table, rows, rows_read, rows_read * max(row_bytes, 1) / 2 ** 20, time_filtered, key_filtered,
+                        all_columns)
+
+    def _suggest_time_filter(self, sql, estimate):
+        """A rewrite of `sql` reading only the most recent days of data that fits the budget, or None."""
+        stats = self.tables[estimate.table]
+        table, alias = outer_table(tokenize_sql_spans(sql))
+        _, _, last = self._table_stats(estimate.table)
+        if table != estimate.table or not stats.get("time_column") or last is None:
+            return None, None
+        prefix = f"{alias}." if alias else ""
+        for days in sorted({self.suggested_days, 1}, reverse=True):
+            # Whole days, up to the end of the day of the latest record
+            start = (last // DAY + 1 - days) * DAY
+            predicate = f"{prefix}{stats['time_column']} >= '{format_timestamp(start)}'"
+            if stats.get("partition_column"):
+                predicate = f"{prefix}{stats['partition_column']} >= '{format_timestamp(start)[:10]}' AND {predicate}"
+            suggestion = add_predicate(sql, predicate)
+            if suggestion is None:
+                return None, None
+            if sum(estimate.scan_mb for estimate in self.estimate(suggestion)) <= self.max_scan_mb:
+                return suggestion, days
+        return None, None
+
+    def _rejection(self, sql, largest, headline):
+        stats = self.tables[largest.table]
+        lines = [f"Error: query rejected: {headline}. To fix it:"]
+        # On a partitioned table, only a filter on the partition column skips files
+        time_columns = " and ".join(column for column in (stats.get("partition_column"), stats.get("time_column"))
+                                    if column)
+        if stats.get("format", "orc") == "text":
+            lines.append(f"- {largest.table} is stored as text and always read in full; query the ORC tables "
+                         f"from get_relevant_tables instead")
+        elif not largest.time_filtered and stats.get("time_column"):
+            suggestion, days = self._suggest_time_filter(sql, largest)
+            if suggestion:
+                period = "day" if days == 1 else f"{days} days"
+                lines.append(f"- filter on {time_columns}, e.g. for the most recent {period} of data run:\n"
+                             f"  {suggestion}")
+            else:
+                lines.append(f"- filter on {time_columns} to the period the question is about")
+        elif largest.time_filtered:
+            lines.append(f"- narrow the range on {time_columns}")
+        if largest.all_columns:
+            lines.append("- select only the columns you need instead of *")
+        key_columns = list(stats.get("key_columns", {}))
+        if key_columns and not largest.key_filtered:
+            lines.append(f"- filter on {' or '.join(key_columns)} if the question is about specific car parks")
+        lines.append("- for counts, sums, averages, extremes and trends, use query_local_data or "
+                     "query_occupancy_rollups, which answer from memory without a Hive job")
+        return "\n".join(lines)
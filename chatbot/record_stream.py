@@ -0,0 +1,55 @@
+"""
+Follows the `ayaachi_car_park` ingestion topic for the chatbot's background
+listeners (HBase cache invalidation, rollup updates).
+
+Messages are decoded with `record_codec.py` of the ingestion pipeline, so the
+topic may hold JSON payloads, binary frames or both. Requires kafka-python.
+"""
+import logging
+import os
+import sys
+import threading
+
+# record_codec.py of the ingestion pipeline decodes both the JSON and the binary Kafka payloads
+RECORD_CODEC_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                      "ingestion", "kafka_ingestion")
+
+
+def _record_codec():
+    if RECORD_CODEC_DIRECTORY not in sys.path:
+        sys.path.append(RECORD_CODEC_DIRECTORY)
+    import record_codec
+    return record_codec
+
+
+def start_record_listener(topic, consumer_config, on_records, name):
+    """
+    Starts a daemon thread calling `on_records(records)` with the records of
+    every message on `topic`, as dicts with the JSON payload's fields
+    (binary records are converted). A message that cannot be decoded is
+    skipped, with a warning the first time.
+    """
+    from kafka import KafkaConsumer
+    record_codec = _record_codec()
+
+    def follow():
+        consumer = KafkaConsumer(topic, auto_offset_reset="latest", enable_auto_commit=False, **consumer_config)
+        warned = False
+        for message in consumer:
+            try:
+                records = [record if "last_updated_date" in record else record_codec.to_json_record(record)
+                           for record in record_codec.decode_message(message.value)]
+            except (ValueError, KeyError, TypeError) as e:
+                if not warned:
+                    logging.warning(f"{name}: cannot decode a message on '{topic}' ({e}); "
+                                    f"undecodable messages are skipped.")
+                    warned = True
+                continue
+            try:
+                on_records(records)
+            except Exception as e:
+                logging.warning(f"{name}: error handling records from '{topic}': {e}")
+
+    thread = threading.Thread(target=follow, name=name, daemon=True)
+    thread.start()
+    return thread
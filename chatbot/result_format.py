@@ -0,0 +1,148 @@
+import csv
+import io
+import numbers
+
+from sql_utils import tokenize_sql
+
+# Hive aggregate functions: without GROUP BY, a query selecting only these returns one row
+AGGREGATE_FUNCTIONS = {
+    "count", "sum", "avg", "min", "max", "stddev", "stddev_pop", "stddev_samp", "variance", "var_pop", "var_samp",
+    "covar_pop", "covar_samp", "corr", "percentile", "percentile_approx", "histogram_numeric", "collect_set",
+    "collect_list",
+}
+
+def push_down_limit(sql, limit):
+    """
+    Appends `LIMIT <limit>` to a single SELECT statement that has no
+    top-level LIMIT, so Hive stops producing rows we would discard anyway.
+    Any other statement, and a query returning one aggregate row (an
+    aggregate without GROUP BY, such as `SELECT COUNT(*) ...`), is returned
+    unchanged.
+    """
+    tokens = tokenize_sql(sql)
+    while tokens and tokens[-1][1] == ";":
+        tokens.pop()
+    if not tokens or tokens[0][1].lower() not in ("select", "with"):
+        return sql
+    depth = 0
+    in_select = aggregate = many_rows = False
+    for index, (kind, text) in enumerate(tokens):
+        if text == "(":
+            depth += 1
+        elif text == ")":
+            depth -= 1
+        elif text == ";":
+            return sql
+        elif depth == 0 and kind == "word":
+            word = text.lower()
+            if word == "limit":
+                return sql
+            if word == "select":
+                in_select = True
+            elif word == "from":
+                in_select = False
+            elif word in ("group", "union", "over"):
+                many_rows = True
+            elif in_select and word in AGGREGATE_FUNCTIONS and index + 1 < len(tokens) and tokens[index + 1][1] == "(":
+                aggregate = True
+    if aggregate and not many_rows:
+        return sql
+    return f"{sql.strip().rstrip(';').rstrip()} LIMIT {int(limit)}"
+
+
+class _ColumnStats:
+    """Running min/max/mean of a numeric column."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        if isinstance(value, bool) or not isinstance(value, numbers.Number):
+            return
+        self.count += 1
+        self.total += value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def render(self, name):
+        mean = self.total / self.count
+        return f"{name}: min {self.minimum}, max {self.maximum}, mean {mean:.2f}"
+
+
+def column_names(description):
+    """Column names from a DB-API cursor description, without the `table.` prefix Hive adds."""
+    return [column[0].split(".")[-1] for column in description or []]
+
+
+def format_result(cursor, max_rows=200, max_bytes=16000, fetch_size=500):
+    """
+    Streams the rows of an executed cursor into a compact CSV block.
+
+    Rows are pulled with `fetchmany` in batches, so memory stays flat however
+    large the result is; see `format_rows` for the output format.
+    """
+    fetch_size = max(1, min(fetch_size, max_rows + 1))
+
+    def rows():
+        while True:
+            batch = cursor.fetchmany(fetch_size)
+            if not batch:
+                return
+            yield from batch
+
+    return format_rows(column_names(cursor.description), rows(), max_rows=max_rows, max_bytes=max_bytes)
+
+
+def format_rows(names, rows, max_rows=200, max_bytes=16000):
+    """
+    Renders rows as a compact CSV block for the model.
+
+    Consumption of `rows` stops as soon as `max_rows` rows or `max_bytes`
+    bytes of UTF-8 encoded CSV have been produced. The output has a header
+    line, the rows, a truncation marker when rows were dropped and summary
+    statistics for the numeric columns of the returned rows.
+    """
+    stats = [_ColumnStats() for _ in names]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+
+    def render(row):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        return buffer.getvalue()
+
+    header = render(names)
+    parts = [header]
+    size = len(header.encode("utf-8"))
+    returned = 0
+    truncated = False
+    for row in rows:
+        if returned >= max_rows:
+            truncated = True
+            break
+        line = render(row)
+        # Bytes, not characters: car park names and addresses are not all ASCII
+        size += len(line.encode("utf-8"))
+        if size > max_bytes:
+            truncated = True
+            break
+        parts.append(line)
+        returned += 1
+        for column_stats, value in zip(stats, row):
+            column_stats.add(value)
+
+    lines = ["".join(parts).rstrip("\n")]
+    if truncated:
+        lines.append(
+            f"[truncated: showing the first {returned} rows; the result has more. "
+            f"Add filters, aggregation or a LIMIT to see the rest]"
+        )
+    summary = [f"rows: {returned}{'+' if truncated else ''}"]
+    if returned > 1:
+        summary += [s.render(name) for name, s in zip(names, stats) if s.count]
+    lines.append(" | ".join(summary))
+    return "\n".join(lines)
@@ -0,0 +1,255 @@
+import threading
+
+import numpy as np
+
+from local_engine import RAW_COLUMNS, format_timestamp, parse_raw_rows, parse_timestamp
+
+GRANULARITIES = {"5min": 300, "hour": 3600, "day": 86400}
+METRICS = ("occupancy", "available_occupancy", "queue_length")
+STATS = ("avg", "min", "max", "count")
+
+# Layout of the per-bucket aggregate list: count, then sum/min/max for each metric
+_COUNT = 0
+_SUM, _MIN, _MAX = 0, 1, 2
+
+
+def _offset(metric):
+    return 1 + 3 * METRICS.index(metric)
+
+
+class _Summary:
+    """Combines bucket aggregates across several buckets."""
+
+    def __init__(self):
+        self.count = 0
+        self.sums = [0] * len(METRICS)
+        self.minimums = [None] * len(METRICS)
+        self.maximums = [None] * len(METRICS)
+
+    def add(self, aggregate):
+        self.count += aggregate[_COUNT]
+        for index, metric in enumerate(METRICS):
+            offset = _offset(metric)
+            self.sums[index] += aggregate[offset + _SUM]
+            low, high = aggregate[offset + _MIN], aggregate[offset + _MAX]
+            self.minimums[index] = low if self.minimums[index] is None else min(self.minimums[index], low)
+            self.maximums[index] = high if self.maximums[index] is None else max(self.maximums[index], high)
+
+    def value(self, metric, stat):
+        index = METRICS.index(metric)
+        if stat == "count":
+            return self.count
+        if stat == "avg":
+            return round(self.sums[index] / self.count, 2) if self.count else None
+        return self.minimums[index] if stat == "min" else self.maximums[index]
+
+
+class RollupIndex:
+    """
+    Pre-aggregated occupancy, availability and queue length statistics per
+    car park per 5-minute, hourly and daily bucket.
+
+    Each bucket keeps the count of records and the sum/min/max of every
+    metric, so averages and extremes over any range of buckets can be
+    combined exactly without going back to the raw rows. The index is built
+    from the CSV (or ORC) history and updated incrementally with `add_columns`
+    (batch files loaded by the local engine) and `add_records` (records from
+    the ingestion stream, see `start_stream_updates`).
+
+    A record is counted once: records seen before, by (id,
+    system_code_number, record_timestamp) like compact_raw_data.py, are
+    skipped, so ORC exports overlapping the CSV history and stream records
+    that later reach a batch file are not double counted. The keys seen are
+    kept in memory, one tuple per record.
+    """
+
+    def __init__(self, granularities=tuple(GRANULARITIES)):
+        for granularity in granularities:
+            if granularity not in GRANULARITIES:
+                raise ValueError(f"Unknown granularity '{granularity}'. Supported: {', '.join(GRANULARITIES)}.")
+        self.granularities = tuple(granularities)
+        # granularity -> system_code_number -> bucket start -> aggregate list
+        self._buckets = {granularity: {} for granularity in self.granularities}
+        self._lock = threading.Lock()
+        self._seen = set()
+        self.records = 0
+        self.duplicates = 0
+
+    def add_columns(self, columns):
+        """
+        Folds a block of parsed records into the rollups. `columns` holds
+        arrays for system_code_number (strings), record_timestamp and the
+        metrics, as produced by `local_engine.parse_raw_rows`, and `id`.
+        """
+        lots = np.asarray(columns["system_code_number"])
+        if len(lots) == 0:
+            return
+        timestamps = np.asarray(columns["record_timestamp"], dtype=np.int64)
+        ids = np.asarray(columns["id"], dtype=np.int64)
+
+        with self._lock:
+            new = np.ones(len(lots), dtype=bool)
+            for index, key in enumerate(zip(ids.tolist(), lots.tolist(), timestamps.tolist())):
+                if key in self._seen:
+                    new[index] = False
+                else:
+                    self._seen.add(key)
+            self.duplicates += int(len(lots) - new.sum())
+            if not new.any():
+                return
+            lots, timestamps = lots[new], timestamps[new]
+            values = [np.asarray(columns[metric], dtype=np.int64)[new] for metric in METRICS]
+            lot_names, lot_index = np.unique(lots, return_inverse=True)
+            lot_index = lot_index.reshape(-1)
+
+            for granularity in self.granularities:
+                width = GRANULARITIES[granularity]
+                buckets = timestamps - timestamps % width
+
+                # Sort by (lot, bucket) and reduce over each contiguous run
+                order = np.lexsort((buckets, lot_index))
+                sorted_lots, sorted_buckets = lot_index[order], buckets[order]
+                boundary = np.ones(len(order), dtype=bool)
+                boundary[1:] = (sorted_lots[1:] != sorted_lots[:-1]) | (sorted_buckets[1:] != sorted_buckets[:-1])
+                starts = np.flatnonzero(boundary)
+                counts = np.diff(np.append(starts, len(order)))
+
+                reduced = [counts]
+                for metric_values in values:
+                    sorted_values = metric_values[order]
+                    reduced += [
+                        np.add.reduceat(sorted_values, starts),
+                        np.minimum.reduceat(sorted_values, starts),
+                        np.maximum.reduceat(sorted_values, starts),
+                    ]
+
+                lots_by_group = lot_names[sorted_lots[starts]]
+                buckets_by_group = sorted_buckets[starts]
+                per_lot = self._buckets[granularity]
+                for group, (lot, bucket) in enumerate(zip(lots_by_group.tolist(), buckets_by_group.tolist())):
+                    aggregate = [int(column[group]) for column in reduced]
+                    existing = per_lot.setdefault(lot, {}).get(bucket)
+                    if existing is None:
+                        per_lot[lot][bucket] = aggregate
+                    else:
+                        self._merge(existing, aggregate)
+            self.records += len(lots)
+
+    def add_records(self, records):
+        """Folds raw records (dicts with the Kafka `ayaachi_car_park` fields) into the rollups."""
+        rows = [[str(record[column]) for column in RAW_COLUMNS] for record in records]
+        if rows:
+            self.add_columns(parse_raw_rows(rows))
+
+    def trend(self, system_code_number, metric="occupancy", stat="avg", granularity="hour",
+              start=None, end=None, limit=None):
+        """Returns (bucket_start, value, records) for each bucket of one car park, oldest first."""
+        self._validate(metric, stat, granularity)
+        low, high = self._range(start, end)
+        with self._lock:
+            buckets = self._buckets[granularity].get(system_code_number, {})
+            selected = sorted((bucket, aggregate) for bucket, aggregate in buckets.items() if low <= bucket < high)
+        if limit:
+            selected = selected[-int(limit):]
+        result = []
+        for bucket, aggregate in selected:
+            summary = _Summary()
+            summary.add(aggregate)
+            result.append((format_timestamp(bucket), summary.value(metric, stat), aggregate[_COUNT]))
+        return result
+
+    def rank(self, metric="occupancy", stat="avg", granularity="day", start=None, end=None,
+             latest=False, top=5, ascending=False):
+        """
+        Ranks car parks by `stat` of `metric`, either over all buckets between
+        `start` and `end` or, with `latest=True`, over each car park's most
+        recent bucket. Returns (system_code_number, value, period) tuples.
+        """
+        self._validate(metric, stat, granularity)
+        low, high = self._range(start, end)
+        ranking = []
+        with self._lock:
+            for lot, buckets in self._buckets[granularity].items():
+                in_range = [bucket for bucket in buckets if low <= bucket < high]
+                if not in_range:
+                    continue
+                summary = _Summary()
+                if latest:
+                    newest = max(in_range)
+                    summary.add(buckets[newest])
+                    period = format_timestamp(newest)
+                else:
+                    for bucket in in_range:
+                        summary.add(buckets[bucket])
+                    period = f"{format_timestamp(min(in_range))} to {format_timestamp(max(in_range))}"
+                ranking.append((lot, summary.value(metric, stat), period))
+        ranking.sort(key=lambda item: item[1], reverse=not ascending)
+        return ranking[:int(top)] if top else ranking
+
+    def stats(self):
+        with self._lock:
+            return {
+                "records": self.records,
+                "duplicates": self.duplicates,
+                "buckets": {
+                    granularity: sum(len(buckets) for buckets in per_lot.values())
+                    for granularity, per_lot in self._buckets.items()
+                },
+            }
+
+    # Internal helpers
+
+    def _validate(self, metric, stat, granularity):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}'. Supported: {', '.join(METRICS)}.")
+        if stat not in STATS:
+            raise ValueError(f"Unknown stat '{stat}'. Supported: {', '.join(STATS)}.")
+        if granularity not in self.granularities:
+            raise ValueError(f"Unknown granularity '{granularity}'. Supported: {', '.join(self.granularities)}.")
+
+    @staticmethod
+    def _range(start, end):
+        low = parse_timestamp(start) if start else float("-inf")
+        high = parse_timestamp(end) if end else float("inf")
+        return low, high
+
+    @staticmethod
+    def _merge(existing, aggregate):
+        existing[_COUNT] += aggregate[_COUNT]
+        for metric in METRICS:
+            offset = _offset(metric)
+            existing[offset + _SUM] += aggregate[offset + _SUM]
+            existing[offset + _MIN] = min(existing[offset + _MIN], aggregate[offset + _MIN])
+            existing[offset + _MAX] = max(existing[offset + _MAX], aggregate[offset + _MAX])
+
+
+def load_orc_columns(path):
+    """
+    Reads an ORC export of `ayaachi_parking_avail_data` into the column layout
+    used by `RollupIndex.add_columns`. Requires pyarrow.
+    """
+    try:
+        from pyarrow import orc
+    except ImportError:
+        raise ImportError("Reading ORC files requires pyarrow. Install it with `pip install pyarrow`.")
+
+    table = orc.read_table(path, columns=["id", "system_code_number", "record_timestamp"] + list(METRICS))
+    timestamps = table.column("record_timestamp").cast("timestamp[s]").cast("int64")
+    columns = {
+        "id": table.column("id").to_numpy(),
+        "system_code_number": np.asarray(table.column("system_code_number").to_pylist()),
+        "record_timestamp": timestamps.to_numpy(),
+    }
+    for metric in METRICS:
+        columns[metric] = table.column(metric).to_numpy()
+    return columns
+
+
+def start_stream_updates(get_rollups, topic, consumer_config):
+    """
+    Starts a daemon thread that folds every record arriving on the ingestion
+    topic into the rollups returned by `get_rollups()`. Requires kafka-python.
+    """
+    from record_stream import start_record_listener
+    return start_record_listener(topic, consumer_config, lambda records: get_rollups().add_records(records),
+                                 "rollup-stream-updates")
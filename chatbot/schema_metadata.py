@@ -0,0 +1,221 @@
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+Column = namedtuple("Column", ["name", "type", "description"])
+Table = namedtuple("Table", ["name", "description", "columns"])
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "any", "are", "at", "by", "can", "car", "data", "do", "does", "during", "each", "for",
+    "from", "give", "has", "have", "how", "i", "in", "is", "it", "me", "many", "much", "of", "on", "or", "park",
+    "parks", "parking", "please", "show", "tell", "than", "that", "the", "there", "this", "to", "was", "were",
+    "what", "when", "where", "which", "who", "with",
+}
+
+
+def _words(text):
+    words = set()
+    for word in _WORD.findall(text.lower()):
+        if word in _STOPWORDS or len(word) < 3:
+            continue
+        words.add(word)
+        # Crude stemming so "days" matches "day" and "currently" matches "current"
+        for suffix in ("ly", "s"):
+            if word.endswith(suffix) and len(word) > len(suffix) + 3:
+                words.add(word[:-len(suffix)])
+    return words
+
+
+def parse_schema_xml(path):
+    """Parses `hive_schema.xml` into a dict of table name -> Table, in file order."""
+    root = ET.parse(path).getroot()
+    tables = {}
+    for table in root.iter("table"):
+        columns = [
+            Column(column.findtext("name", "").strip(), column.findtext("type", "").strip(),
+                   " ".join(column.findtext("description", "").split()))
+            for column in table.iter("column")
+        ]
+        name = table.get("name")
+        tables[name] = Table(name, " ".join(table.get("description", "").split()), columns)
+    return tables
+
+
+class SchemaCatalog:
+    """
+    The Hive table metadata, parsed once from the schema XML and kept in memory.
+
+    The file is stat()ed at most every `check_interval` seconds and re-parsed
+    only when its mtime or size changed, so reads on the hot path do not touch
+    the disk. With a `describe` callable (table name -> [(column, type)]), the
+    live column list from Hive is merged in every `live_refresh_interval`
+    seconds on a background thread: live names and types win, the XML supplies
+    the descriptions.
+    """
+
+    def __init__(self, path, check_interval=5, describe=None, live_refresh_interval=3600):
+        self.path = path
+        self.check_interval = check_interval
+        self.describe = describe
+        self.live_refresh_interval = live_refresh_interval
+        self._tables = {}
+        self._view = {}
+        self._vocabulary = {}
+        self._rendered = {}
+        self._signature = None
+        self._last_check = float("-inf")
+        self._live = {}
+        self._live_refreshed = float("-inf")
+        self._live_thread = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def tables(self):
+        """Returns the current dict of table name -> Table, with live columns merged in."""
+        self._check_file()
+        self._maybe_refresh_live()
+        return self._view
+
+    def relevant_tables(self, question):
+        """
+        Returns the names of the tables whose name, description or columns
+        share distinguishing words with `question`, best match first. Words
+        found in every table (e.g. "occupancy") do not count. Falls back to
+        all tables when nothing matches.
+        """
+        tables = self.tables()
+        vocabulary = self._vocabulary
+        question_words = _words(question)
+        scores = {}
+        for name in tables:
+            header_words, column_words = vocabulary.get(name, (set(), set()))
+            scores[name] = 3 * len(question_words & header_words) + len(question_words & column_words)
+        matches = [name for name in sorted(tables, key=lambda name: -scores[name]) if scores[name] > 0]
+        return matches or list(tables)
+
+    def render(self, question=None, table_names=None, descriptions=True):
+        """
+        Renders a compact, token-efficient schema: one header line per table
+        and one `name TYPE: description` line per column. Only `table_names`
+        (or the tables relevant to `question`) are expanded; the rest are
+        listed by name and description so the model knows they exist.
+        """
+        tables = self.tables()
+        if table_names:
+            unknown = [name for name in table_names if name not in tables]
+            if unknown:
+                return f"Error: Unknown table(s): {', '.join(unknown)}. Available tables: {', '.join(tables)}."
+            selected = list(table_names)
+        elif question:
+            selected = self.relevant_tables(question)
+        else:
+            selected = list(tables)
+
+        key = (tuple(selected), descriptions)
+        rendered = self._rendered.get(key)
+        if rendered is not None:
+            return rendered
+
+        lines = []
+        for name in selected:
+            table = tables[name]
+            lines.append(f"TABLE {name}: {table.description}")
+            for column in table.columns:
+                if descriptions and column.description:
+                    lines.append(f"  {column.name} {column.type}: {column.description}")
+                else:
+                    lines.append(f"  {column.name} {column.type}")
+        others = [name for name in tables if name not in selected]
+        if others:
+            lines.append("Other tables (call again with table_names to expand):")
+            lines += [f"  {name}: {tables[name].description}" for name in others]
+        rendered = "\n".join(lines)
+        with self._lock:
+            if tables is self._view:
+                self._rendered[key] = rendered
+        return rendered
+
+    def stats(self):
+        with self._lock:
+            return {"tables": len(self._tables), "reloads": self.reloads, "live_tables": len(self._live)}
+
+    # Internal helpers
+
+    def _check_file(self):
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval and self._signature is not None:
+            return
+        with self._lock:
+            self._last_check = now
+            try:
+                stat = os.stat(self.path)
+            except OSError as e:
+                if self._signature is None:
+                    raise FileNotFoundError(f"Metadata file not found at {self.path}") from e
+                return
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature == self._signature:
+                return
+            try:
+                tables = parse_schema_xml(self.path)
+            except ET.ParseError as e:
+                if self._signature is None:
+                    raise
+                # Keep serving the last good version while the file is being edited
+                print(f"Warning: could not parse '{self.path}', keeping the previous schema: {e}")
+                return
+            self._tables = tables
+            self._signature = signature
+            self.reloads += 1
+            self._rebuild()
+
+    def _rebuild(self):
+        """Recomputes the merged view, the matching vocabulary and drops rendered schemas. Holds the lock."""
+        view = {name: self._merged(table) for name, table in self._tables.items()}
+        words = {}
+        for name, table in view.items():
+            header_words = _words(name.replace("_", " ") + " " + table.description)
+            column_words = set()
+            for column in table.columns:
+                column_words |= _words(column.name.replace("_", " ") + " " + column.description)
+            words[name] = (header_words, column_words)
+        shared = set.intersection(*(header | columns for header, columns in words.values())) if words else set()
+        self._vocabulary = {name: (header - shared, columns - shared) for name, (header, columns) in words.items()}
+        self._rendered = {}
+        self._view = view
+
+    def _merged(self, table):
+        live = self._live.get(table.name)
+        if not live:
+            return table
+        described = {column.name: column.description for column in table.columns}
+        columns = [Column(name, column_type.upper(), described.get(name, "")) for name, column_type in live]
+        return Table(table.name, table.description, columns)
+
+    def _maybe_refresh_live(self):
+        if self.describe is None or time.monotonic() - self._live_refreshed < self.live_refresh_interval:
+            return
+        with self._lock:
+            if self._live_thread is not None and self._live_thread.is_alive():
+                return
+            self._live_refreshed = time.monotonic()
+            self._live_thread = threading.Thread(target=self._refresh_live, name="schema-describe", daemon=True)
+            self._live_thread.start()
+
+    def _refresh_live(self):
+        with self._lock:
+            names = list(self._tables)
+        for name in names:
+            try:
+                columns = self.describe(name)
+            except Exception as e:
+                print(f"Warning: could not describe Hive table '{name}', using the XML schema: {e}")
+                continue
+            if columns:
+                with self._lock:
+                    self._live[name] = columns
+                    self._rebuild()
@@ -0,0 +1,190 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+SUMMARY_PREFIX = "Summary of the earlier conversation (older turns were removed to save context):"
+TRUNCATION_MARKER = "\n...[truncated {omitted} characters]"
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def message_to_dict(message):
+    """Converts an OpenAI SDK message object into a plain, JSON-serialisable dict."""
+    if isinstance(message, dict):
+        return message
+    return message.to_dict()
+
+
+def estimate_tokens(messages):
+    """Rough token estimate (~4 characters per token) of a list of messages."""
+    return len(json.dumps(messages)) // 4
+
+
+def cap_tool_output(message, max_chars):
+    """Truncates the content of a tool message to `max_chars` characters."""
+    content = message.get("content") or ""
+    if message.get("role") != "tool" or len(content) <= max_chars:
+        return message
+    capped = dict(message)
+    capped["content"] = content[:max_chars] + TRUNCATION_MARKER.format(omitted=len(content) - max_chars)
+    return capped
+
+
+def _split_turns(messages):
+    """Splits a history into turns. Each turn starts with a user message."""
+    turns = []
+    for message in messages:
+        if message.get("role") == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def _summarize_turn(turn, max_chars=200):
+    """One-line extractive summary of a turn: the question and the final answer."""
+    question = next((m.get("content") or "" for m in turn if m.get("role") == "user"), "")
+    answer = next((m.get("content") or "" for m in reversed(turn)
+                   if m.get("role") == "assistant" and m.get("content")), "")
+    return f"- Q: {question[:max_chars]} | A: {answer[:max_chars]}"
+
+
+def compact_history(messages, token_budget=6000, max_tool_output_chars=4000, max_summary_chars=2000):
+    """
+    Fits a conversation into `token_budget`.
+
+    Tool outputs are capped at `max_tool_output_chars`. While the history is
+    over budget the oldest turn is evicted (a turn is a user message together
+    with the assistant and tool messages that answered it, so tool call / tool
+    result pairs are never split) and replaced by a one-line summary in a
+    system message that directly follows the system prompt. The most recent
+    turn is always kept.
+    """
+    messages = [cap_tool_output(message_to_dict(m), max_tool_output_chars) for m in messages]
+
+    head = []
+    if messages and messages[0].get("role") == "system":
+        head.append(messages.pop(0))
+    summary_lines = []
+    if messages and messages[0].get("role") == "system" and (messages[0].get("content") or "").startswith(SUMMARY_PREFIX):
+        summary_lines = messages.pop(0)["content"].splitlines()[1:]
+
+    turns = _split_turns(messages)
+
+    def assemble():
+        result = list(head)
+        if summary_lines:
+            result.append({"role": "system", "content": "\n".join([SUMMARY_PREFIX] + summary_lines)})
+        for turn in turns:
+            result.extend(turn)
+        return result
+
+    compacted = assemble()
+    while len(turns) > 1 and estimate_tokens(compacted) > token_budget:
+        summary_lines.append(_summarize_turn(turns.pop(0)))
+        # Keep the summary itself bounded, dropping the oldest lines first
+        while summary_lines and sum(len(line) + 1 for line in summary_lines) > max_summary_chars:
+            summary_lines.pop(0)
+        compacted = assemble()
+    return compacted
+
+
+class MemorySessionStore:
+    """In-process LRU store of conversation histories."""
+
+    def __init__(self, max_sessions=1000):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            messages = self._sessions.get(session_id)
+            if messages is None:
+                return None
+            self._sessions.move_to_end(session_id)
+            return list(messages)
+
+    def save(self, session_id, messages):
+        with self._lock:
+            self._sessions[session_id] = list(messages)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteSessionStore:
+    """
+    On-disk store of conversation histories, so sessions survive restarts and
+    can be shared by several worker processes. Keeps the `max_sessions` most
+    recently used sessions.
+    """
+
+    def __init__(self, path, max_sessions=1000):
+        self.max_sessions = max_sessions
+        self.path = path
+        self._lock = threading.Lock()
+        self._pid = None
+        self._conn = None
+        self._connect()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " messages TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+
+    def _connect(self):
+        # A connection must not be used across fork, so a forked worker opens its own
+        if self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, session_id):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT messages FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, session_id, messages):
+        payload = json.dumps([message_to_dict(m) for m in messages])
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, messages, updated_at) VALUES (?, ?, ?)",
+                (session_id, payload, time.time()),
+            )
+            conn.execute(
+                "DELETE FROM sessions WHERE session_id NOT IN "
+                "(SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT ?)",
+                (self.max_sessions,),
+            )
+
+    def delete(self, session_id):
+        with self._lock:
+            self._connect().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+
+def create_session_store(config, base_dir="."):
+    """Builds the session store selected by the `sessions` section of config.json."""
+    backend = config.get("backend", "memory")
+    max_sessions = config.get("max_sessions", 1000)
+    if backend == "sqlite":
+        path = os.path.join(base_dir, config.get("sqlite_path", "sessions.db"))
+        return SQLiteSessionStore(path, max_sessions=max_sessions)
+    if backend == "memory":
+        return MemorySessionStore(max_sessions=max_sessions)
+    raise ValueError(f"Unknown session store backend: {backend}")
@@ -0,0 +1,94 @@
+import heapq
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km; works element-wise on NumPy arrays."""
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+def _unit_vectors(latitudes, longitudes):
+    lat, lon = np.radians(latitudes), np.radians(longitudes)
+    return np.column_stack((np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)))
+
+
+def _chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def _km_to_chord(km):
+    return 2 * math.sin(min(math.pi / 2, km / (2 * EARTH_RADIUS_KM)))
+
+
+class KDTree:
+    """
+    A KD-tree over car park coordinates for k-nearest-neighbour lookups.
+
+    Points are stored as 3-D unit vectors, where straight-line (chord)
+    distance orders points exactly like great-circle distance, so the tree
+    stays correct anywhere on the globe, not just within one city.
+    """
+
+    def __init__(self, locations, leaf_size=8):
+        """`locations` maps a name to its (latitude, longitude)."""
+        self.names = list(locations)
+        coordinates = np.array([locations[name] for name in self.names], dtype=np.float64).reshape(-1, 2)
+        self.latitudes, self.longitudes = coordinates[:, 0], coordinates[:, 1]
+        self.points = _unit_vectors(self.latitudes, self.longitudes)
+        self.leaf_size = leaf_size
+        self.root = self._build(np.arange(len(self.names))) if self.names else None
+
+    def __len__(self):
+        return len(self.names)
+
+    def nearest(self, latitude, longitude, k=5, max_km=None, accept=None):
+        """
+        Returns up to `k` (name, distance_km) pairs, nearest first. `max_km`
+        bounds the search radius; `accept(name)` can reject candidates (e.g.
+        full car parks), in which case the search continues past them.
+        """
+        if self.root is None or k <= 0:
+            return []
+        query = _unit_vectors(np.array([latitude]), np.array([longitude]))[0]
+        bound = _km_to_chord(max_km) ** 2 if max_km is not None else float("inf")
+        heap = []  # max-heap on squared chord distance: (-distance, index)
+
+        def worst():
+            return -heap[0][0] if len(heap) == k else bound
+
+        def search(node):
+            if node[0] == "leaf":
+                distances = ((self.points[node[1]] - query) ** 2).sum(axis=1)
+                for index, distance in zip(node[1].tolist(), distances.tolist()):
+                    if distance <= worst() and (accept is None or accept(self.names[index])):
+                        if len(heap) == k:
+                            heapq.heapreplace(heap, (-distance, index))
+                        else:
+                            heapq.heappush(heap, (-distance, index))
+                return
+            _, axis, split, left, right = node
+            offset = query[axis] - split
+            near, far = (left, right) if offset <= 0 else (right, left)
+            search(near)
+            if offset * offset <= worst():
+                search(far)
+
+        search(self.root)
+        found = sorted((-distance, index) for distance, index in heap)
+        return [(self.names[index], round(_chord_to_km(math.sqrt(distance)), 3)) for distance, index in found]
+
+    def _build(self, indices):
+        if len(indices) <= self.leaf_size:
+            return ("leaf", indices)
+        points = self.points[indices]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        order = indices[np.argsort(points[:, axis], kind="stable")]
+        middle = len(order) // 2
+        split = float(self.points[order[middle], axis])
+        return ("node", axis, split, self._build(order[:middle]), self._build(order[middle:]))
@@ -0,0 +1,92 @@
+import re
+
+# Order matters: comments and quoted strings must win over bare words/punctuation.
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+    |(?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+    |(?P<quoted_ident>`[^`]*`)
+    |(?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    |(?P<word>[A-Za-z_][A-Za-z0-9_$]*(?:\.[A-Za-z_*][A-Za-z0-9_$]*)*)
+    |(?P<op><=|>=|<>|!=|==|\|\||[-+*/%=<>(),;.])
+    |(?P<space>\s+)
+    |(?P<other>.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+LITERAL_KINDS = ("string", "number")
+
+
+def tokenize_sql_spans(sql):
+    """Like tokenize_sql, with the start and end offset of each token in `sql`: (kind, text, start, end)."""
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(sql):
+        kind = match.lastgroup
+        if kind in ("space", "comment"):
+            continue
+        tokens.append((kind, match.group(), match.start(), match.end()))
+    return tokens
+
+
+def tokenize_sql(sql):
+    """Splits a SQL statement into (kind, text) tokens, dropping whitespace and comments."""
+    return [(kind, text) for kind, text, _, _ in tokenize_sql_spans(sql)]
+
+
+def _sort_in_lists(tokens):
+    """Sorts literal lists in `IN (...)` so that equivalent predicates compare equal."""
+    result = []
+    i = 0
+    while i < len(tokens):
+        result.append(tokens[i])
+        if tokens[i] == ("word", "in") and i + 1 < len(tokens) and tokens[i + 1][1] == "(":
+            end = i + 2
+            while end < len(tokens) and tokens[end][1] != ")":
+                end += 1
+            items = tokens[i + 2:end]
+            literals = items[0::2]
+            separators = items[1::2]
+            if (end < len(tokens) and literals
+                    and all(kind in LITERAL_KINDS for kind, _ in literals)
+                    and all(text == "," for _, text in separators)):
+                ordered = sorted(set(literals), key=lambda token: token[1])
+                result.append(tokens[i + 1])
+                for index, literal in enumerate(ordered):
+                    if index:
+                        result.append(("op", ","))
+                    result.append(literal)
+                result.append(tokens[end])
+                i = end + 1
+                continue
+        i += 1
+    return result
+
+
+def normalize_sql(sql):
+    """
+    Returns a canonical form of a SQL statement for use as a cache key.
+
+    Whitespace and comments are collapsed, keywords and identifiers are
+    lower-cased (string literals are left untouched), trailing semicolons are
+    dropped and the literals of `IN (...)` lists are sorted.
+    """
+    tokens = [
+        (kind, text.lower()) if kind in ("word", "quoted_ident") else (kind, text)
+        for kind, text in tokenize_sql(sql)
+    ]
+    while tokens and tokens[-1][1] == ";":
+        tokens.pop()
+    return " ".join(text for _, text in _sort_in_lists(tokens))
+
+
+def referenced_tables(sql):
+    """Returns the lower-cased names of the tables a statement reads from (database prefix removed)."""
+    tables = set()
+    tokens = tokenize_sql(sql)
+    for index, (kind, text) in enumerate(tokens[:-1]):
+        if kind == "word" and text.lower() in ("from", "join"):
+            next_kind, next_text = tokens[index + 1]
+            if next_kind in ("word", "quoted_ident"):
+                tables.add(next_text.strip("`").split(".")[-1].lower())
+    return tables
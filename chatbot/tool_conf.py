@@ -1,100 +1,190 @@
-from tools import (
-    query_hive, 
-    query_hbase, 
-    get_location_from_longitude_latitude, 
-    search_knowledge_base,
-    get_relevant_tables
+"""
+The tools offered to the model. Each registration is the metadata the model
+sees (name, description, JSON schema parameters); TOOL_LIST and
+AVAILABLE_FUNCTIONS are generated from them. The implementations live in
+tools.py, which is imported on the first tool call.
+"""
+from tool_registry import ToolRegistry
+
+registry = ToolRegistry(default_module="tools")
+
+registry.register(
+    name="get_relevant_tables",
+    description="Call this first to get the schemas of the Hive tables before writing a SQL query. It provides table names, column names, data types, and descriptions in a compact form. Pass the user's question to expand only the relevant tables; the other tables are listed by name and can be expanded with `table_names`.",
+    parameters={
+        "type": "object",
+        "properties": {
+            "question": {
+                "type": "string",
+                "description": "The user's question, used to select the relevant tables.",
+            },
+            "table_names": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Explicit table names to expand, e.g. ['ayaachi_parking_avail_data'].",
+            },
+        },
+        "required": [],
+    },
 )
 
-TOOL_LIST = [
-    {
-        "type": "function",
-        "function": {
-            "name": "get_relevant_tables",
-            "description": "Call this first to get the schemas of all available Hive tables before writing a SQL query. It provides table names, column names, data types, and descriptions.",
-            "parameters": {
-                "type": "object",
-                "properties": {},
-                "required": [],
+registry.register(
+    name="query_hive",
+    description="Executes a read-only SQL query on a Hive table, based on a schema you have already fetched. Returns CSV with a header row, followed by summary statistics. Large results are truncated, so prefer aggregations and filters over fetching raw rows. Only a single SELECT statement is accepted; a LIMIT is added if missing, and queries that would read too much data (e.g. the history table without a filter on record_timestamp) are rejected with a suggested rewrite.",
+    parameters={
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "The SQL query to execute.",
             },
         },
+        "required": ["query"],
     },
-    {
-        "type": "function",
-        "function": {
-            "name": "query_hive",
-            "description": "Executes a read-only SQL query on a Hive table, based on a schema you have already fetched.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "The SQL query to execute.",
-                    },
-                },
-                "required": ["query"],
+)
+
+registry.register(
+    name="search_knowledge_base",
+    description="Searches text documents for general information about the system or its purpose.",
+    parameters={
+        "type": "object",
+        "properties": {
+            "query": {
+                "type": "string",
+                "description": "The user's question or search term.",
             },
         },
+        "required": ["query"],
     },
-    {
-        "type": "function",
-        "function": {
-            "name": "search_knowledge_base",
-            "description": "Searches text documents for general information about the system or its purpose.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "query": {
-                        "type": "string",
-                        "description": "The user's question or search term.",
-                    },
-                },
-                "required": ["query"],
+)
+
+registry.register(
+    name="query_hbase",
+    description="Fetches real-time data for one or more car parks from HBase using their row keys. Use `row_keys` to look up several car parks in one call.",
+    parameters={
+        "type": "object",
+        "properties": {
+            "table_name": {
+                "type": "string",
+                "description": "The name of the HBase table, e.g., 'ayaachi_parking_availability_latest'",
+            },
+            "row_key": {
+                "type": "string",
+                "description": "The row key (system_code_number) to fetch.",
+            },
+            "row_keys": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Several row keys (system_code_numbers) to fetch at once.",
             },
         },
+        "required": ["table_name"],
     },
-    {
-        "type": "function",
-        "function": {
-            "name": "query_hbase",
-            "description": "Fetches real-time data for a specific car park from HBase using its row key.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "table_name": {
-                        "type": "string",
-                        "description": "The name of the HBase table, e.g., 'ayaachi_parking_availability_latest'",
-                    },
-                    "row_key": {
-                        "type": "string",
-                        "description": "The row key (system_code_number) to fetch.",
+)
+
+registry.register(
+    name="get_location_from_longitude_latitude",
+    description="Gets a physical address from longitude and latitude coordinates.",
+    parameters={
+        "type": "object",
+        "properties": {
+            "longitude": {"type": "number"},
+            "latitude": {"type": "number"},
+        },
+        "required": ["longitude", "latitude"],
+    },
+)
+
+registry.register(
+    name="query_local_data",
+    description="Answers aggregate questions over the historical car park data (the same columns as ayaachi_parking_avail_data) from an in-memory copy, in milliseconds. Use it instead of the Hive workflow for counts, sums, averages, minimums and maximums, optionally filtered, grouped by car park and bucketed by time. Use query_hive for anything it cannot express.",
+    parameters={
+        "type": "object",
+        "properties": {
+            "metrics": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "Aggregates to compute, e.g. ['avg(occupancy)', 'max(queue_length)', 'count(*)']. Supported functions: count, sum, avg, min, max.",
+            },
+            "group_by": {
+                "type": "array",
+                "items": {
+                    "type": "string",
+                    "enum": ["system_code_number", "vehicle_type", "traffic_condition_nearby", "capacity", "is_special_day"],
+                },
+                "description": "Columns to group by.",
+            },
+            "filters": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "column": {"type": "string"},
+                        "op": {"type": "string", "enum": ["=", "!=", ">", ">=", "<", "<=", "in"]},
+                        "value": {"description": "A string or number, or a list of them for 'in'."},
                     },
+                    "required": ["column", "op", "value"],
                 },
-                "required": ["table_name", "row_key"],
+                "description": "Row filters, e.g. [{'column': 'system_code_number', 'op': '=', 'value': 'BHMBCCMKT01'}].",
+            },
+            "time_bucket": {
+                "type": "string",
+                "enum": ["5min", "15min", "hour", "day", "hour_of_day", "day_of_week"],
+                "description": "Groups by record_timestamp: fixed buckets (5min, 15min, hour, day) for trends, or hour_of_day / day_of_week for typical patterns.",
             },
+            "start": {"type": "string", "description": "Inclusive start of record_timestamp, 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'."},
+            "end": {"type": "string", "description": "Exclusive end of record_timestamp, same format as start."},
+            "order_by": {"type": "string", "description": "Output column to sort by, e.g. 'avg(occupancy)'."},
+            "descending": {"type": "boolean", "description": "Sort descending (default true)."},
+            "limit": {"type": "integer", "description": "Maximum number of rows to return (default 50)."},
         },
+        "required": ["metrics"],
     },
-    {
-        "type": "function",
-        "function": {
-            "name": "get_location_from_longitude_latitude",
-            "description": "Gets a physical address from longitude and latitude coordinates.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "longitude": {"type": "number"},
-                    "latitude": {"type": "number"},
-                },
-                "required": ["longitude", "latitude"],
+)
+
+registry.register(
+    name="query_occupancy_rollups",
+    description="Answers trend and ranking questions (hourly/daily trends of a car park, busiest or emptiest car parks) from pre-aggregated per car park statistics of occupancy, available_occupancy and queue_length per 5-minute, hourly and daily bucket. Much faster than a Hive query.",
+    parameters={
+        "type": "object",
+        "properties": {
+            "mode": {
+                "type": "string",
+                "enum": ["trend", "ranking"],
+                "description": "'trend' returns one value per time bucket for one car park; 'ranking' ranks car parks.",
             },
+            "metric": {"type": "string", "enum": ["occupancy", "available_occupancy", "queue_length"]},
+            "stat": {"type": "string", "enum": ["avg", "min", "max", "count"]},
+            "granularity": {"type": "string", "enum": ["5min", "hour", "day"]},
+            "system_code_number": {"type": "string", "description": "The car park for a trend."},
+            "start": {"type": "string", "description": "Inclusive start, 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'."},
+            "end": {"type": "string", "description": "Exclusive end, same format as start."},
+            "latest": {"type": "boolean", "description": "For rankings, rank on each car park's most recent bucket only (e.g. 'busiest right now')."},
+            "top": {"type": "integer", "description": "Number of car parks in a ranking (default 5)."},
+            "ascending": {"type": "boolean", "description": "Rank from lowest to highest (default false)."},
+            "limit": {"type": "integer", "description": "Maximum number of most recent buckets in a trend (default 48)."},
         },
+        "required": ["mode"],
     },
-]
+)
+
+registry.register(
+    name="find_nearest_car_parks",
+    description="Finds the car parks nearest to a location (latitude/longitude) or to another car park, with their current availability, in one call. Use it for 'which car parks near X have space' questions instead of looking up car parks one by one.",
+    parameters={
+        "type": "object",
+        "properties": {
+            "latitude": {"type": "number", "description": "Latitude of the location to search around."},
+            "longitude": {"type": "number", "description": "Longitude of the location to search around."},
+            "system_code_number": {"type": "string", "description": "Search around this car park instead of a coordinate."},
+            "k": {"type": "integer", "description": "Number of car parks to return (default 5)."},
+            "min_available": {"type": "integer", "description": "Only return car parks with at least this many available spaces."},
+            "max_distance_km": {"type": "number", "description": "Only return car parks within this distance."},
+        },
+        "required": [],
+    },
+)
+
+TOOL_LIST = registry.tool_list()
 
-AVAILABLE_FUNCTIONS = {
-    "query_hive": query_hive,
-    "query_hbase": query_hbase,
-    "get_location_from_longitude_latitude": get_location_from_longitude_latitude,
-    "search_knowledge_base": search_knowledge_base,
-    "get_relevant_tables": get_relevant_tables,
-}
\ No newline at end of file
+AVAILABLE_FUNCTIONS = registry.functions()
@@ -0,0 +1,59 @@
+"""
+Declarative registry of the tools the model can call.
+
+A tool is registered with its description, its JSON schema parameters and
+the `module:function` implementing it. The OpenAI `tools` list and the
+name -> callable map are generated from the registrations, and the module
+behind a tool is only imported the first time the tool is called, so
+importing the registry does not pull in the Hive, HBase or embedding stacks.
+"""
+import importlib
+from collections import namedtuple
+
+Tool = namedtuple("Tool", ["name", "description", "parameters", "target"])
+
+
+class LazyFunction:
+    """Calls `module:function`, importing the module on the first call."""
+
+    def __init__(self, target):
+        self.target = target
+        self.module_name, _, self.function_name = target.partition(":")
+
+    def resolve(self):
+        # Looked up on every call, so a function replaced on its module is picked up
+        return getattr(importlib.import_module(self.module_name), self.function_name)
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"LazyFunction({self.target!r})"
+
+
+class ToolRegistry:
+    def __init__(self, default_module="tools"):
+        self.default_module = default_module
+        self._tools = {}
+
+    def register(self, name, description, parameters=None, target=None):
+        """Registers a tool; `target` defaults to the function of the same name in the default module."""
+        if name in self._tools:
+            raise ValueError(f"Tool '{name}' is already registered.")
+        parameters = parameters or {"type": "object", "properties": {}, "required": []}
+        self._tools[name] = Tool(name, description, parameters, target or f"{self.default_module}:{name}")
+        return self._tools[name]
+
+    @property
+    def tools(self):
+        return list(self._tools.values())
+
+    def tool_list(self):
+        """The `tools` argument of the chat completions API."""
+        return [{"type": "function",
+                 "function": {"name": tool.name, "description": tool.description, "parameters": tool.parameters}}
+                for tool in self._tools.values()]
+
+    def functions(self):
+        """{tool name: callable}, importing each implementation on first use."""
+        return {tool.name: LazyFunction(tool.target) for tool in self._tools.values()}
@@ -1,15 +1,28 @@
-import happybase
-from pyhive import hive
-from geopy.geocoders import Nominatim
 import json
+import atexit
+import threading
+import time
+
+from connection_pool import ConnectionPool
+from embedding_cache import EmbeddingCache
+from geocode_cache import GeocodeCache
+from hbase_cache import HBaseRowCache, start_stream_invalidation
+from local_engine import LocalEngine
+from metrics import QUERY_GUARD_DECISIONS, span
+from rollups import RollupIndex, load_orc_columns, start_stream_updates
+from schema_metadata import SchemaCatalog
+from spatial_index import KDTree
+from query_cache import QueryCache
+from query_guard import QueryGuard
+from result_format import format_result, format_rows
 
 # Imports for RAG
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+from ingest import EMBEDDING_MODEL_NAME, get_embeddings_model, load_vector_db, update_vector_db
 import os
 
-CURRENT_DIRECTORY = os.getcwd()
-CONFIG_PATH = os.path.join(CURRENT_DIRECTORY, "config.json")
+# Paths in config.json are relative to this directory, wherever the server is started from
+BASE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(BASE_DIRECTORY, "config.json")
 
 ## Get configurations
 def get_configs(conf_path):
@@ -27,28 +40,69 @@ HIVE_DATABASE = config_data.get("hive").get("database")
 HBASE_HOST_NAME = config_data.get("hbase").get("host_name")
 HBASE_PORT = config_data.get("hbase").get("port")
 
-FAISS_INDEX_PATH = os.path.join(CURRENT_DIRECTORY, "faiss_index")
-HIVE_SCHEMA_METADATA_PATH = os.path.join(CURRENT_DIRECTORY, "database_metadata/hive_schema.xml")
+HIVE_POOL_CONFIG = config_data.get("hive").get("pool", {})
+HIVE_RESULT_CONFIG = config_data.get("hive").get("result", {})
+HIVE_MAX_ROWS = HIVE_RESULT_CONFIG.get("max_rows", 200)
+HIVE_MAX_BYTES = HIVE_RESULT_CONFIG.get("max_bytes", 16000)
+HIVE_FETCH_SIZE = HIVE_RESULT_CONFIG.get("fetch_size", 500)
+HBASE_POOL_CONFIG = config_data.get("hbase").get("pool", {})
+HBASE_CACHE_CONFIG = dict(config_data.get("hbase").get("cache", {}))
+HBASE_STREAM_INVALIDATION = HBASE_CACHE_CONFIG.pop("stream_invalidation", {})
+QUERY_CACHE_CONFIG = config_data.get("query_cache", {})
+QUERY_GUARD_CONFIG = config_data.get("query_guard", {})
+
+LOCAL_ENGINE_CONFIG = config_data.get("local_engine", {})
+LOCAL_DATASET_PATH = os.path.join(BASE_DIRECTORY, LOCAL_ENGINE_CONFIG.get("dataset_path", "../data/dataset.csv"))
+LOCAL_BATCH_DIR = LOCAL_ENGINE_CONFIG.get("batch_dir")
+LOCAL_REFRESH_INTERVAL = LOCAL_ENGINE_CONFIG.get("refresh_interval", 60)
+
+ROLLUP_CONFIG = config_data.get("rollups", {})
+SPATIAL_CONFIG = config_data.get("spatial", {})
+HBASE_LATEST_TABLE = SPATIAL_CONFIG.get("availability_table", "ayaachi_parking_availability_latest")
+
+EMBEDDING_CACHE_CONFIG = dict(config_data.get("embedding_cache", {}))
+if EMBEDDING_CACHE_CONFIG.get("persist_path"):
+    EMBEDDING_CACHE_CONFIG["persist_path"] = os.path.join(BASE_DIRECTORY, EMBEDDING_CACHE_CONFIG["persist_path"])
+
+FAISS_INDEX_PATH = os.path.join(BASE_DIRECTORY, "faiss_index")
+KNOWLEDGE_BASE_PATH = os.path.join(BASE_DIRECTORY, "knowledge_base")
+GEOCODING_CONFIG = dict(config_data.get("geocoding", {}))
+GEOCODING_PREWARM = GEOCODING_CONFIG.pop("prewarm", False)
+for path_key in ("cache_path", "gazetteer_path"):
+    if GEOCODING_CONFIG.get(path_key):
+        GEOCODING_CONFIG[path_key] = os.path.join(BASE_DIRECTORY, GEOCODING_CONFIG[path_key])
+
+HIVE_SCHEMA_METADATA_PATH = os.path.join(BASE_DIRECTORY, "database_metadata/hive_schema.xml")
+SCHEMA_METADATA_CONFIG = config_data.get("schema_metadata", {})
 
 
 # RAG tools
 
 embeddings_model = None
 vector_db = None
+query_embedding_cache = None
 
-def initialize_rag():
-    """Initializes the RAG components."""
-    global embeddings_model, vector_db
-    if os.path.exists(FAISS_INDEX_PATH):
-        print("Initializing RAG components...")
-        embeddings_model = HuggingFaceEmbeddings(
-            model_name='all-MiniLM-L6-v2',
-            model_kwargs={'device': 'cpu'}
-        )
-        vector_db = FAISS.load_local(FAISS_INDEX_PATH, embeddings_model, allow_dangerous_deserialization=True)
+def initialize_rag(mmap_index=False):
+    """
+    Initializes the RAG components. The FAISS index is brought up to date
+    with the knowledge base (re-embedding only changed chunks) and used
+    directly, with the same embedding model serving ingest and search.
+    With `mmap_index` it is then reopened memory-mapped and read-only, for
+    sharing with forked workers. Query embeddings go through a cache that
+    batches concurrent misses.
+    """
+    global embeddings_model, vector_db, query_embedding_cache
+    print("Initializing RAG components...")
+    embeddings_model = get_embeddings_model()
+    vector_db = update_vector_db(KNOWLEDGE_BASE_PATH, FAISS_INDEX_PATH, embeddings_model)
+    if vector_db is not None and mmap_index:
+        vector_db = load_vector_db(FAISS_INDEX_PATH, embeddings_model, mmap=True)
+    query_embedding_cache = EmbeddingCache(embeddings_model, model_name=EMBEDDING_MODEL_NAME, **EMBEDDING_CACHE_CONFIG)
+    atexit.register(query_embedding_cache.save)
+    if vector_db is not None:
         print("RAG components initialized successfully.")
     else:
-        print(f"Warning: FAISS index not found at '{FAISS_INDEX_PATH}'. search_knowledge_base will not work.")
+        print(f"Warning: FAISS index not available at '{FAISS_INDEX_PATH}'. search_knowledge_base will not work.")
 
 def search_knowledge_base(query: str) -> str:
     """Searches the knowledge base of text documents for relevant information."""
@@ -56,7 +110,10 @@ def search_knowledge_base(query: str) -> str:
     if vector_db is None:
         return "Error: Knowledge base not available. FAISS index not loaded."
     try:
-        results = vector_db.similarity_search(query, k=3)
+        with span("embedding"):
+            query_vector = query_embedding_cache.embed_query(query)
+        with span("faiss"):
+            results = vector_db.similarity_search_by_vector(query_vector, k=3)
         if not results:
             return "No relevant information found in the knowledge base."
         context = "--- Relevant Information from Knowledge Base ---"
@@ -67,67 +124,402 @@ def search_knowledge_base(query: str) -> str:
     except Exception as e:
         return f"An error occurred during knowledge base search: {e}"
 
-def read_xml_as_text(file_path):
-    """Reads an XML file and returns its content as a string."""
+def embedding_cache_stats():
+    """Returns the query embedding cache counters, or None before RAG is initialized."""
+    return query_embedding_cache.stats() if query_embedding_cache is not None else None
+
+# Parsed once, re-read only when the file changes
+schema_catalog = SchemaCatalog(
+    HIVE_SCHEMA_METADATA_PATH,
+    check_interval=SCHEMA_METADATA_CONFIG.get("check_interval", 5),
+    live_refresh_interval=SCHEMA_METADATA_CONFIG.get("live_refresh_interval", 3600),
+)
+
+def get_relevant_tables(question: str = None, table_names: list = None) -> str:
+    """
+    Returns a compact schema (tables, columns, types, descriptions) of the Hive tables.
+    With `question`, only the tables relevant to it are expanded; `table_names` expands the given tables.
+    This should be the first step before writing any SQL query.
+    """
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    except FileNotFoundError:
-        return f"Error: Metadata file not found at {file_path}"
+        return schema_catalog.render(question=question, table_names=table_names)
+    except FileNotFoundError as e:
+        return f"Error: {e}"
     except Exception as e:
         return f"An error occurred while reading the metadata file: {e}"
 
-def get_relevant_tables() -> str:
+
+# Connection pools
+
+# The Thrift clients are imported on the first connection, not when the tools are loaded
+
+def _open_hive_connection():
+    from pyhive import hive
+    return hive.Connection(host=HIVE_HOST_NAME, port=HIVE_PORT, username=HIVE_USER, database=HIVE_DATABASE)
+
+def _hive_connection_is_open(conn):
+    return conn._transport.isOpen()
+
+def _hive_error_is_from_server(e):
+    # pyhive raises OperationalError(response) when HiveServer2 answers with an error status
+    from pyhive import exc
+    return isinstance(e, exc.DatabaseError) and bool(e.args) and hasattr(e.args[0], "status")
+
+def _open_hbase_connection():
+    import happybase
+    return happybase.Connection(host=HBASE_HOST_NAME, port=HBASE_PORT)
+
+def _hbase_connection_is_open(connection):
+    return connection.transport.is_open()
+
+def _hbase_error_is_from_server(e):
+    # IOError and IllegalArgument of the HBase Thrift IDL are replies from the server (not the builtin IOError)
+    return type(e).__name__ in ("IOError", "IllegalArgument") and type(e).__module__ != "builtins"
+
+hive_pool = ConnectionPool("hive", _open_hive_connection, health_check=_hive_connection_is_open,
+                           keeps_connection=_hive_error_is_from_server, **HIVE_POOL_CONFIG)
+hbase_pool = ConnectionPool("hbase", _open_hbase_connection, health_check=_hbase_connection_is_open,
+                            keeps_connection=_hbase_error_is_from_server, **HBASE_POOL_CONFIG)
+
+atexit.register(hive_pool.close_all)
+atexit.register(hbase_pool.close_all)
+
+# Latest-availability rows are served from memory for a few seconds
+hbase_row_cache = HBaseRowCache(hbase_pool, **HBASE_CACHE_CONFIG)
+
+def start_stream_listeners():
     """
-    Returns a string containing the schema (tables, columns, descriptions) for all available Hive tables.
-    This should be the first step before writing any SQL query.
+    Starts following the ingestion stream to invalidate cached HBase rows and
+    to update the occupancy rollups, each if enabled. Threads do not survive
+    a fork, so each server process calls this.
     """
-    return read_xml_as_text(HIVE_SCHEMA_METADATA_PATH)
+    if HBASE_STREAM_INVALIDATION.get("enabled"):
+        for cached_table in hbase_row_cache.tables:
+            start_stream_invalidation(hbase_row_cache, cached_table,
+                                      HBASE_STREAM_INVALIDATION.get("topic", "ayaachi_car_park"),
+                                      HBASE_STREAM_INVALIDATION.get("consumer", {}))
+    rollup_stream = ROLLUP_CONFIG.get("stream", {})
+    if rollup_stream.get("enabled"):
+        start_stream_updates(get_occupancy_rollups, rollup_stream.get("topic", "ayaachi_car_park"),
+                             rollup_stream.get("consumer", {}))
+
+# Cache of query_hive results, keyed on the normalized SQL
+hive_result_cache = QueryCache(**QUERY_CACHE_CONFIG)
+
+def _history_stats():
+    """(rows, first, last record_timestamp) of the car park history, for the query guard's estimates."""
+    timestamps = get_local_engine().columns["record_timestamp"]
+    if not len(timestamps):
+        raise ValueError("the car park history is empty")
+    return len(timestamps), int(timestamps.min()), int(timestamps.max())
+
+# Rejects anything but a single SELECT and scans over budget; adds the LIMIT (one row past the
+# result limit, so truncation can be reported)
+query_guard = QueryGuard(schema=schema_catalog.tables, history_stats=_history_stats,
+                         default_limit=HIVE_MAX_ROWS + 1, **QUERY_GUARD_CONFIG)
 
 
 # Database and Geocoding Tools
 
 def query_hive(query: str) -> str:
-    if "delete" in query.lower() or "insert" in query.lower():
-        print(f"Stopping from running delete or insert query.")
-        return "You cannot run DELETE or INSERT queries. You are only allowed to run SELECT queries."
-
-    host_name = HIVE_HOST_NAME
-    port = HIVE_PORT
-    user = HIVE_USER
-    database = HIVE_DATABASE
+    decision = query_guard.check(query)
+    QUERY_GUARD_DECISIONS.inc(decision=decision.action, reason=decision.reason)
+    if decision.action == "rejected":
+        return decision.message
+
+    cached_result = hive_result_cache.get(query)
+    if cached_result is not None:
+        return cached_result
+
     try:
-        conn = hive.Connection(host=host_name, port=port, username=user, database=database)
-        cursor = conn.cursor()
-        cursor.execute(query)
-        result = cursor.fetchall()
-        return str(result)
+        with hive_pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                with span("hive:execute"):
+                    cursor.execute(decision.sql)
+                with span("hive:fetch"):
+                    result = format_result(
+                        cursor, max_rows=HIVE_MAX_ROWS, max_bytes=HIVE_MAX_BYTES, fetch_size=HIVE_FETCH_SIZE
+                    )
+            finally:
+                cursor.close()
     except Exception as e:
         return f"Error executing Hive query: {e}"
-    finally:
-        if 'conn' in locals() and conn: conn.close()
 
+    hive_result_cache.put(query, result)
+    return result
 
-def query_hbase(table_name: str, row_key: str) -> str:
-    host_name = HBASE_HOST_NAME
-    port = HBASE_PORT
+
+def query_hbase(table_name: str, row_key: str = None, row_keys: list = None) -> str:
+    """
+    Looks up one row (`row_key`) or several rows (`row_keys`) in HBase. Rows of
+    the cached tables are served from memory for at most `hbase.cache.ttl` seconds.
+    """
+    keys = list(row_keys or []) + ([row_key] if row_key and row_key not in (row_keys or []) else [])
+    if not keys:
+        return "Error: provide row_key or row_keys."
     try:
-        connection = happybase.Connection(host=host_name, port=port)
-        table = connection.table(table_name)
-        row = table.row(row_key)
-        decoded_row = {k.decode('utf-8'): v.decode('utf-8') for k, v in row.items()}
-        return str(decoded_row)
+        with span("hbase"):
+            rows = hbase_row_cache.get_rows(table_name, keys)
+        if len(keys) == 1 and not row_keys:
+            return str(rows[keys[0]] or {})
+        return str({key: row or {} for key, row in rows.items()})
     except Exception as e:
         return f"Error executing HBase query: {e}"
-    finally:
-        if 'connection' in locals() and connection.transport.is_open(): connection.close()
+
+geocode_cache = GeocodeCache(**GEOCODING_CONFIG)
 
 def get_location_from_longitude_latitude(longitude: float, latitude: float) -> str:
-    geolocator = Nominatim(user_agent="project-birmingham-car-park-chatbot")
-    location = geolocator.reverse((latitude, longitude))
-    return str(location.raw) if location else "Location not found."
+    try:
+        with span("geocode"):
+            location = geocode_cache.reverse(latitude, longitude)
+    except Exception as e:
+        return f"Error reverse geocoding {latitude}, {longitude}: {e}"
+    return str(location) if location else "Location not found."
 
-#### NOT USED ######
+def prewarm_geocode_cache():
+    """Reverse geocodes every known car park in a background thread, so lookups never wait on Nominatim."""
+    def prewarm():
+        index = get_car_park_locations()
+        coordinates = zip(index.latitudes.tolist(), index.longitudes.tolist())
+        resolved = geocode_cache.prewarm(coordinates)
+        print(f"Geocode cache prewarmed: {resolved} of {len(index)} car parks resolved.")
+
+    thread = threading.Thread(target=prewarm, name="geocode-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+# Local analytics tools
+
+local_engine = None
+occupancy_rollups = None
+local_engine_lock = threading.Lock()
+
+def initialize_local_engine():
+    """
+    Loads the car park history into the in-process analytics engine and
+    builds the occupancy rollups from it. Batch files picked up by later
+    refreshes are folded into the rollups as they are loaded.
+    """
+    global local_engine, occupancy_rollups
+    with local_engine_lock:
+        if local_engine is None:
+            print("Loading car park history into the local analytics engine...")
+            batch_dir = os.path.join(BASE_DIRECTORY, LOCAL_BATCH_DIR) if LOCAL_BATCH_DIR else None
+            engine = LocalEngine(LOCAL_DATASET_PATH, batch_dir=batch_dir)
+            rollups = RollupIndex(ROLLUP_CONFIG.get("granularities", ["5min", "hour", "day"]))
+            for orc_path in ROLLUP_CONFIG.get("orc_paths", []):
+                rollups.add_columns(load_orc_columns(os.path.join(BASE_DIRECTORY, orc_path)))
+            engine.listeners.append(rollups.add_columns)
+            engine.refresh()
+            local_engine, occupancy_rollups = engine, rollups
+            print(f"Local analytics engine loaded {engine.num_rows} rows. Rollups: {rollups.stats()['buckets']}")
+    return local_engine
+
+def get_local_engine():
+    """Returns the local analytics engine, picking up new batch files every refresh_interval seconds."""
+    engine = local_engine or initialize_local_engine()
+    if time.monotonic() - engine.last_refresh >= LOCAL_REFRESH_INTERVAL:
+        engine.refresh()
+    return engine
+
+def query_local_data(metrics: list, group_by: list = None, filters: list = None, time_bucket: str = None,
+                     start: str = None, end: str = None, order_by: str = None, descending: bool = True,
+                     limit: int = 50) -> str:
+    """
+    Answers aggregate questions over the car park history from the in-process
+    analytics engine instead of running a Hive job.
+    """
+    try:
+        names, rows = get_local_engine().query(
+            metrics, group_by=group_by, filters=filters, time_bucket=time_bucket,
+            start=start, end=end, order_by=order_by, descending=descending, limit=limit,
+        )
+        return format_rows(names, rows, max_rows=HIVE_MAX_ROWS, max_bytes=HIVE_MAX_BYTES)
+    except Exception as e:
+        return f"Error running local analytics query: {e}"
+
+def query_occupancy_rollups(mode: str, metric: str = "occupancy", stat: str = "avg", granularity: str = "hour",
+                            system_code_number: str = None, start: str = None, end: str = None,
+                            latest: bool = False, top: int = 5, ascending: bool = False, limit: int = 48) -> str:
+    """
+    Answers trend and ranking questions from the pre-aggregated per car park
+    rollups instead of rescanning raw rows.
+    """
+    try:
+        get_local_engine()
+        if mode == "trend":
+            if not system_code_number:
+                return "Error: system_code_number is required for a trend."
+            rows = occupancy_rollups.trend(system_code_number, metric=metric, stat=stat, granularity=granularity,
+                                           start=start, end=end, limit=limit)
+            names = ["bucket_start", f"{stat}({metric})", "records"]
+        elif mode == "ranking":
+            rows = occupancy_rollups.rank(metric=metric, stat=stat, granularity=granularity, start=start, end=end,
+                                          latest=latest, top=top, ascending=ascending)
+            names = ["system_code_number", f"{stat}({metric})", "period"]
+        else:
+            return f"Error: unknown mode '{mode}'. Use 'trend' or 'ranking'."
+        return format_rows(names, rows, max_rows=HIVE_MAX_ROWS, max_bytes=HIVE_MAX_BYTES)
+    except Exception as e:
+        return f"Error querying occupancy rollups: {e}"
+
+def get_occupancy_rollups():
+    """Returns the occupancy rollups, loading the local analytics engine first if needed."""
+    get_local_engine()
+    return occupancy_rollups
+
+# Nearest car parks
+
+car_park_locations = None
+car_park_history = {}
+car_park_locations_built = float("-inf")
+car_park_locations_lock = threading.Lock()
+
+def _latest_hbase_rows():
+    """Returns the rows of the HBase latest table (served by the row cache), or {} if HBase is unreachable."""
+    try:
+        return hbase_row_cache.all_rows(HBASE_LATEST_TABLE)
+    except Exception:
+        return {}
+
+def get_car_park_locations():
+    """
+    Returns the spatial index of car park coordinates, rebuilt every
+    spatial.refresh_interval seconds from the latest record of each car park
+    in the history and the rows of the HBase latest table.
+    """
+    global car_park_locations, car_park_history, car_park_locations_built
+    with car_park_locations_lock:
+        if time.monotonic() - car_park_locations_built >= SPATIAL_CONFIG.get("refresh_interval", 300):
+            history = get_local_engine().latest()
+            locations = {lot: (record["latitude"], record["longitude"]) for lot, record in history.items()}
+            for lot, row in _latest_hbase_rows().items():
+                try:
+                    locations[lot] = (float(row["data:latitude"]), float(row["data:longitude"]))
+                except (KeyError, ValueError):
+                    continue
+            car_park_locations, car_park_history = KDTree(locations), history
+            car_park_locations_built = time.monotonic()
+    return car_park_locations
+
+def _car_park_status(lot, live):
+    """Current availability of a car park from HBase, falling back to its latest historical record."""
+    row = live.get(lot)
+    if row and "data:available_occupancy" in row:
+        return {
+            "available_occupancy": int(row["data:available_occupancy"]),
+            "capacity": int(row.get("data:capacity", 0)),
+            "occupancy": int(row.get("data:occupancy", 0)),
+            "queue_length": int(row.get("data:queue_length", 0)),
+            "traffic_condition": row.get("data:traffic_condition", ""),
+            "as_of": row.get("data:last_updated", ""),
+            "source": "hbase",
+        }
+    record = car_park_history.get(lot)
+    if record:
+        return {name: record[name] for name in ("available_occupancy", "capacity", "occupancy", "queue_length")} | {
+            "traffic_condition": record["traffic_condition_nearby"], "as_of": record["record_timestamp"],
+            "source": "history"}
+    return None
+
+def get_car_park_statuses(system_code_numbers):
+    """
+    Returns {system_code_number: current availability, or None if unknown} for
+    a few car parks, with one (cached) HBase lookup for all of them.
+    """
+    get_car_park_locations()
+    try:
+        with span("hbase"):
+            live = {lot: row for lot, row in hbase_row_cache.get_rows(HBASE_LATEST_TABLE, system_code_numbers).items()
+                    if row}
+    except Exception:
+        live = {}
+    return {lot: _car_park_status(lot, live) for lot in system_code_numbers}
+
+def rank_car_parks(metric, top=5, ascending=False):
+    """
+    Returns [(system_code_number, value of `metric`, as of)] for the `top`
+    car parks ranked by `metric` in the HBase latest table. Raises
+    ValueError when HBase has no current rows: the history would answer
+    with data that is not current.
+    """
+    with span("hbase"):
+        live = hbase_row_cache.all_rows(HBASE_LATEST_TABLE)
+    values = []
+    for lot, row in live.items():
+        try:
+            values.append((lot, int(row[f"data:{metric}"]), row.get("data:last_updated", "")))
+        except (KeyError, ValueError):
+            continue
+    if not values:
+        raise ValueError(f"no current {metric} in {HBASE_LATEST_TABLE}")
+    values.sort(key=lambda value: (value[1] if ascending else -value[1], value[0]))
+    return values[:top]
+
+def find_nearest_car_parks(latitude: float = None, longitude: float = None, system_code_number: str = None,
+                           k: int = 5, min_available: int = None, max_distance_km: float = None) -> str:
+    """
+    Returns the k car parks nearest to a point (or to another car park) with
+    their current availability, in one call.
+    """
+    try:
+        index = get_car_park_locations()
+        if system_code_number:
+            if system_code_number not in index.names:
+                return f"Error: unknown car park '{system_code_number}'."
+            position = index.names.index(system_code_number)
+            latitude, longitude = float(index.latitudes[position]), float(index.longitudes[position])
+        elif latitude is None or longitude is None:
+            return "Error: provide latitude and longitude, or a system_code_number to search around."
+
+        live = _latest_hbase_rows()
+        statuses = {}
+
+        def accept(lot):
+            if lot == system_code_number:
+                return False
+            statuses[lot] = _car_park_status(lot, live)
+            if min_available is None:
+                return True
+            return statuses[lot] is not None and statuses[lot]["available_occupancy"] >= min_available
+
+        nearest = index.nearest(float(latitude), float(longitude), k=int(k), max_km=max_distance_km, accept=accept)
+        names = ["system_code_number", "distance_km", "available_occupancy", "capacity", "occupancy",
+                 "queue_length", "as_of", "source"]
+        rows = []
+        for lot, distance in nearest:
+            status = statuses.get(lot) or {}
+            rows.append([lot, distance] + [status.get(name) for name in names[2:]])
+        if not rows:
+            return "No car parks found matching the criteria."
+        return format_rows(names, rows, max_rows=HIVE_MAX_ROWS, max_bytes=HIVE_MAX_BYTES)
+    except Exception as e:
+        return f"Error finding nearest car parks: {e}"
+
+def describe_hive_table(table_name: str) -> list:
+    """Returns the (column name, type) pairs of a Hive table from `DESCRIBE FORMATTED`."""
+    with hive_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"DESCRIBE FORMATTED {table_name}")
+            schema_rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+    columns = []
+    col_list_start_index = next((i for i, row in enumerate(schema_rows) if row[0].strip() == '# col_name'), -1)
+    if col_list_start_index != -1:
+        col_list_start_index += 1
+        col_list_end_index = next((i for i, row in enumerate(schema_rows[col_list_start_index:]) if row[0].strip().startswith('#')), len(schema_rows))
+        for row in schema_rows[col_list_start_index:col_list_start_index + col_list_end_index]:
+            col_name, col_type = row[0].strip(), row[1].strip()
+            if col_name:
+                columns.append((col_name, col_type))
+    return columns
+
+if SCHEMA_METADATA_CONFIG.get("merge_live_schema", False):
+    schema_catalog.describe = describe_hive_table
 
 def get_hive_schema(table_name: str) -> str:
     """
@@ -135,30 +527,13 @@ def get_hive_schema(table_name: str) -> str:
     This should be the first step before constructing a query.
     :param table_name: The name of the Hive table to describe (e.g., 'ayaachi_parking_avail_data').
     """
-    host_name = HIVE_HOST_NAME
-    port = HIVE_PORT
-    user = HIVE_USER
-    database = HIVE_DATABASE
-
     try:
-        conn = hive.Connection(host=host_name, port=port, username=user, database=database)
-        cursor = conn.cursor()
-        cursor.execute(f"DESCRIBE FORMATTED {table_name}")
-        schema_rows = cursor.fetchall()
-
-        col_list_start_index = next((i for i, row in enumerate(schema_rows) if row[0].strip() == '# col_name'), -1)
-        if col_list_start_index != -1:
-            col_list_start_index += 1
-            col_list_end_index = next((i for i, row in enumerate(schema_rows[col_list_start_index:]) if row[0].strip().startswith('#')), len(schema_rows))
-
-            formatted_schema = "Table Schema:\n"
-            for row in schema_rows[col_list_start_index:col_list_start_index + col_list_end_index]:
-                col_name, col_type = row[0].strip(), row[1].strip()
-                if col_name:
-                    formatted_schema += f"- {col_name} ({col_type})\n"
-            return formatted_schema
-        return "Could not parse schema."
+        columns = describe_hive_table(table_name)
+        if not columns:
+            return "Could not parse schema."
+        formatted_schema = "Table Schema:\n"
+        for col_name, col_type in columns:
+            formatted_schema += f"- {col_name} ({col_type})\n"
+        return formatted_schema
     except Exception as e:
         return f"Error executing Hive query to get schema: {e}"
-    finally:
-        if 'conn' in locals() and conn: conn.close()
\ No newline at end of file
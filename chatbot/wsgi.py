@@ -0,0 +1,7 @@
+"""
+WSGI entry point for the pre-fork server (see gunicorn.conf.py). Importing
+it loads the shared state, once, in the master process.
+"""
+from app import app, initialize
+
+initialize(preload=True)
@@ -0,0 +1,363 @@
+"""
+Compacts the raw CSV batch files that `CarParkHiveIngestion` drops into
+/ayaachi/data/ into date-partitioned ORC (or Parquet) files with typed
+columns, for the `ayaachi_parking_avail_data_compacted` table.
+
+The raw table `ayaachi_parking_data` is unpartitioned text, so every batch
+ETL run and every time-filtered query rereads all of it and reparses the
+date strings. The compacted layout is
+
+    <output>/record_date=YYYY-MM-DD/part-<run>.orc
+
+with `record_timestamp` already a TIMESTAMP and `available_occupancy`
+computed, sorted by car park and time. A query filtering on `record_date`
+only reads the matching partitions.
+
+Runs are incremental and idempotent: `<output>/_manifest.json` records every
+compacted source file (by name and size), so a rerun only reads new files.
+Each partition touched by a run is rewritten once, as a single file merging
+its existing rows with the new ones (rows repeated by an at-least-once
+replay are dropped by id, car park and timestamp). Files younger than
+`--min-age` seconds are left for the next run, as the streaming job may
+still be writing them. The run ends by writing `<output>/_ddl.hql`: the
+partitioned table and an ADD PARTITION statement per partition.
+
+The input and output are local directories, standing in for HDFS (e.g. a
+copy made with `hdfs dfs -get`, or an NFS/FUSE mount). Writing needs pyarrow;
+`--dry-run` only reads and plans.
+
+Usage:
+    python compact_raw_data.py --input /ayaachi/data --output /ayaachi/compacted
+    python compact_raw_data.py --input ../../data --glob dataset.csv --output compacted --dry-run
+"""
+import argparse
+import calendar
+import csv
+import functools
+import glob
+import json
+import os
+import time
+from datetime import datetime
+
+RAW_COLUMNS = [
+    "id", "system_code_number", "capacity", "latitude", "longitude", "occupancy", "vehicle_type",
+    "traffic_condition_nearby", "queue_length", "is_special_day", "last_updated_date", "last_updated_time",
+]
+# Columns of the compacted files (those of ayaachi_parking_avail_data) and their Hive types
+COLUMNS = [
+    ("id", "INT"),
+    ("system_code_number", "STRING"),
+    ("capacity", "INT"),
+    ("occupancy", "INT"),
+    ("available_occupancy", "INT"),
+    ("vehicle_type", "STRING"),
+    ("traffic_condition_nearby", "STRING"),
+    ("queue_length", "INT"),
+    ("is_special_day", "TINYINT"),
+    ("record_timestamp", "TIMESTAMP"),
+    ("latitude", "DOUBLE"),
+    ("longitude", "DOUBLE"),
+]
+PARTITION_COLUMN = "record_date"
+DUPLICATE_KEY = ("id", "system_code_number", "record_timestamp")
+
+TABLE_NAME = "ayaachi_parking_avail_data_compacted"
+TABLE_LOCATION = "/ayaachi/compacted/"
+MANIFEST_NAME = "_manifest.json"
+DDL_NAME = "_ddl.hql"
+LOCK_NAME = "_compaction.lock"
+MIN_AGE_SECONDS = 60
+
+
+@functools.lru_cache(maxsize=4096)
+def _day_start(date_str):
+    return calendar.timegm(datetime.strptime(date_str, "%d-%m-%Y").timetuple())
+
+
+def parse_row(row):
+    """
+    Converts one raw CSV row into a typed record (timestamps in epoch seconds,
+    read as UTC like the rest of the pipeline) and its partition date.
+    """
+    values = dict(zip(RAW_COLUMNS, row))
+    hours, minutes, seconds = values["last_updated_time"].split(":")
+    day_start = _day_start(values["last_updated_date"])
+    capacity, occupancy, queue_length = int(values["capacity"]), int(values["occupancy"]), int(values["queue_length"])
+    record = {
+        "id": int(values["id"]),
+        "system_code_number": values["system_code_number"],
+        "capacity": capacity,
+        "occupancy": occupancy,
+        "available_occupancy": capacity - occupancy - queue_length,
+        "vehicle_type": values["vehicle_type"],
+        "traffic_condition_nearby": values["traffic_condition_nearby"],
+        "queue_length": queue_length,
+        "is_special_day": int(values["is_special_day"]),
+        "record_timestamp": day_start + int(hours) * 3600 + int(minutes) * 60 + int(seconds),
+        "latitude": float(values["latitude"]),
+        "longitude": float(values["longitude"]),
+    }
+    return record, time.strftime("%Y-%m-%d", time.gmtime(day_start))
+
+
+def read_source(path):
+    """
+    Reads a raw batch file (with or without the dataset header) into
+    {partition date: [records]}. Returns that and the number of rejected rows.
+    """
+    partitions, rejected = {}, 0
+    with open(path, newline="", encoding="utf-8") as csv_file:
+        for line_number, row in enumerate(csv.reader(csv_file)):
+            if line_number == 0 and row and not row[0].strip().isdigit():
+                continue
+            try:
+                if len(row) != len(RAW_COLUMNS):
+                    raise ValueError(f"{len(row)} fields")
+                record, date = parse_row(row)
+            except (ValueError, KeyError):
+                rejected += 1
+                continue
+            partitions.setdefault(date, []).append(record)
+    return partitions, rejected
+
+
+class Manifest:
+    """The compacted source files and the current file of each partition, saved atomically as JSON."""
+
+    def __init__(self, path):
+        self.path = path
+        self.sources = {}  # source file name -> {"size", "rows", "rejected", "partitions", "compacted_at"}
+        self.partitions = {}  # date -> {"file", "rows"}
+        if os.path.exists(path):
+            with open(path, "r") as manifest_file:
+                data = json.load(manifest_file)
+            self.sources = data.get("sources", {})
+            self.partitions = data.get("partitions", {})
+            self.format = data.get("format")
+        else:
+            self.format = None
+
+    def save(self):
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as manifest_file:
+            json.dump({"format": self.format, "sources": self.sources, "partitions": self.partitions},
+                      manifest_file, indent=1, sort_keys=True)
+        os.replace(temporary_path, self.path)
+
+
+def plan(input_dir, pattern, manifest, min_age, now=None):
+    """
+    Returns (new source file names, names skipped as too young or still
+    empty, names whose size changed since they were compacted).
+    """
+    now = time.time() if now is None else now
+    new, young, changed = [], [], []
+    for path in sorted(glob.glob(os.path.join(input_dir, pattern))):
+        name = os.path.basename(path)
+        stat = os.stat(path)
+        compacted = manifest.sources.get(name)
+        if compacted is not None:
+            if compacted["size"] != stat.st_size:
+                changed.append(name)
+        elif now - stat.st_mtime < min_age or stat.st_size == 0:
+            young.append(name)
+        else:
+            new.append(name)
+    return new, young, changed
+
+
+class ColumnarFormat:
+    """Reads and writes one partition file with pyarrow (imported on first use)."""
+
+    def __init__(self, name):
+        try:
+            import pyarrow
+            if name == "orc":
+                from pyarrow import orc as module
+            else:
+                import pyarrow.parquet as module
+        except ImportError:
+            raise ImportError("Writing ORC or Parquet files requires pyarrow. Install it with `pip install pyarrow`.")
+        self.name = name
+        self.extension = "." + name
+        self.pa = pyarrow
+        self.module = module
+        types = {"INT": pyarrow.int32(), "STRING": pyarrow.string(), "TINYINT": pyarrow.int8(),
+                 "TIMESTAMP": pyarrow.timestamp("s"), "DOUBLE": pyarrow.float64()}
+        self.schema = pyarrow.schema([(column, types[hive_type]) for column, hive_type in COLUMNS])
+
+    def from_records(self, records):
+        return self.pa.table({column: [record[column] for record in records] for column, _ in COLUMNS},
+                             schema=self.schema)
+
+    def read(self, path):
+        return self.module.read_table(path).cast(self.schema)
+
+    def write(self, table, path):
+        if self.name == "orc":
+            self.module.write_table(table, path, compression="zlib")
+        else:
+            # Hive reads Parquet timestamps written as INT96
+            self.module.write_table(table, path, compression="snappy", use_deprecated_int96_timestamps=True)
+
+    def merge(self, tables):
+        """Concatenates tables, drops repeated records and sorts by car park and time."""
+        table = self.pa.concat_tables(tables)
+        keys = zip(*(table.column(column).to_pylist() for column in DUPLICATE_KEY))
+        seen, keep = set(), []
+        for index, key in enumerate(keys):
+            if key not in seen:
+                seen.add(key)
+                keep.append(index)
+        if len(keep) < table.num_rows:
+            table = table.take(self.pa.array(keep, type=self.pa.int64()))
+        return table.sort_by([("system_code_number", "ascending"), ("record_timestamp", "ascending")])
+
+
+def partition_dir(output_dir, date):
+    return os.path.join(output_dir, f"{PARTITION_COLUMN}={date}")
+
+
+def build_ddl(table_name, location, file_format, dates):
+    """The partitioned table and one ADD PARTITION statement per partition (safe to rerun)."""
+    location = location.rstrip("/") + "/"
+    columns = ",\n".join(f"  {column} {hive_type}" for column, hive_type in COLUMNS)
+    statements = [
+        f"CREATE EXTERNAL TABLE IF NOT EXISTS {table_name} (\n{columns}\n)\n"
+        f"PARTITIONED BY ({PARTITION_COLUMN} STRING)\n"
+        f"STORED AS {file_format.upper()}\n"
+        f"LOCATION '{location}';"
+    ]
+    for date in sorted(dates):
+        statements.append(f"ALTER TABLE {table_name} ADD IF NOT EXISTS PARTITION ({PARTITION_COLUMN}='{date}') "
+                          f"LOCATION '{location}{PARTITION_COLUMN}={date}';")
+    return "\n".join(statements) + "\n"
+
+
+def acquire_lock(output_dir):
+    path = os.path.join(output_dir, LOCK_NAME)
+    try:
+        descriptor = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        raise SystemExit(f"{path} exists: another compaction is running (remove the file if it is not).")
+    os.write(descriptor, str(os.getpid()).encode())
+    os.close(descriptor)
+    return path
+
+
+def remove_orphans(output_dir, manifest):
+    """Deletes partition files a crashed run wrote but never recorded in the manifest."""
+    recorded = {os.path.join(partition_dir(output_dir, date), partition["file"])
+                for date, partition in manifest.partitions.items()}
+    removed = 0
+    for path in glob.glob(os.path.join(output_dir, f"{PARTITION_COLUMN}=*", "*")):
+        if path not in recorded:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def compact(args):
+    os.makedirs(args.output, exist_ok=True)
+    manifest = Manifest(os.path.join(args.output, MANIFEST_NAME))
+    if manifest.format and manifest.format != args.format:
+        raise SystemExit(f"{args.output} holds {manifest.format} files; rerun with --format {manifest.format}.")
+
+    new, young, changed = plan(args.input, args.glob, manifest, args.min_age)
+    for name in changed:
+        print(f"WARNING: {name} changed size since it was compacted; its new rows are not picked up.")
+    print(f"{len(new)} new source files, {len(manifest.sources)} already compacted, {len(young)} too recent.")
+
+    start = time.perf_counter()
+    incoming, source_rows, rejected, source_bytes = {}, {}, 0, 0
+    for name in new:
+        path = os.path.join(args.input, name)
+        size = os.path.getsize(path)
+        partitions, file_rejected = read_source(path)
+        for date, records in partitions.items():
+            incoming.setdefault(date, []).extend(records)
+        source_rows[name] = (size, sum(len(records) for records in partitions.values()), file_rejected,
+                             sorted(partitions))
+        rejected += file_rejected
+        source_bytes += size
+    rows = sum(count for _, count, _, _ in source_rows.values())
+    print(f"Read {rows} rows ({rejected} rejected) from {source_bytes / 1e6:.1f} MB of CSV "
+          f"for {len(incoming)} partitions in {time.perf_counter() - start:.2f} s.")
+    if args.dry_run:
+        for date in sorted(incoming):
+            state = "rewrite" if date in manifest.partitions else "new"
+            print(f"  {PARTITION_COLUMN}={date}: {len(incoming[date])} rows ({state})")
+        return
+
+    file_format = ColumnarFormat(args.format)
+    lock_path = acquire_lock(args.output)
+    try:
+        orphans = remove_orphans(args.output, manifest)
+        if orphans:
+            print(f"Removed {orphans} partition files left behind by an interrupted run.")
+        run_id = time.strftime("%Y%m%d%H%M%S", time.gmtime()) + f"-{os.getpid()}"
+        replaced, written_bytes = [], 0
+        for date, records in sorted(incoming.items()):
+            directory = partition_dir(args.output, date)
+            os.makedirs(directory, exist_ok=True)
+            tables = [file_format.from_records(records)]
+            previous = manifest.partitions.get(date)
+            if previous:
+                tables.insert(0, file_format.read(os.path.join(directory, previous["file"])))
+                replaced.append(os.path.join(directory, previous["file"]))
+            table = file_format.merge(tables)
+
+            file_name = f"part-{run_id}{file_format.extension}"
+            # Hive skips files starting with "_", so a half-written file is never read
+            temporary_path = os.path.join(directory, "_" + file_name)
+            file_format.write(table, temporary_path)
+            os.replace(temporary_path, os.path.join(directory, file_name))
+            written_bytes += os.path.getsize(os.path.join(directory, file_name))
+            manifest.partitions[date] = {"file": file_name, "rows": table.num_rows}
+
+        compacted_at = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+        for name in new:
+            size, count, file_rejected, dates = source_rows[name]
+            manifest.sources[name] = {"size": size, "rows": count, "rejected": file_rejected, "partitions": dates,
+                                      "compacted_at": compacted_at}
+        manifest.format = args.format
+        manifest.save()
+        # The manifest now points at the new files, so the merged ones can go
+        for path in replaced:
+            os.remove(path)
+    finally:
+        os.remove(lock_path)
+
+    ddl = build_ddl(args.table, args.location, args.format, manifest.partitions)
+    ddl_path = args.ddl_output or os.path.join(args.output, DDL_NAME)
+    with open(ddl_path, "w") as ddl_file:
+        ddl_file.write(ddl)
+    total_rows = sum(partition["rows"] for partition in manifest.partitions.values())
+    print(f"Wrote {len(incoming)} partitions ({len(replaced)} rewritten, {written_bytes / 1e6:.1f} MB "
+          f"{args.format.upper()}) in {time.perf_counter() - start:.2f} s. The table now has {total_rows} rows "
+          f"in {len(manifest.partitions)} partitions.")
+    print(f"DDL written to {ddl_path}.")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", required=True, help="Directory of raw CSV batch files (the HDFS landing dir).")
+    parser.add_argument("--glob", default="*.csv", help="Source file pattern inside --input.")
+    parser.add_argument("--output", required=True, help="Directory of the partitioned table.")
+    parser.add_argument("--format", choices=["orc", "parquet"], default="orc")
+    parser.add_argument("--min-age", type=float, default=MIN_AGE_SECONDS,
+                        help="Skip source files modified less than this many seconds ago.")
+    parser.add_argument("--table", default=TABLE_NAME, help="Table name in the generated DDL.")
+    parser.add_argument("--location", default=TABLE_LOCATION, help="HDFS location of --output in the DDL.")
+    parser.add_argument("--ddl-output", default=None, help=f"Where to write the DDL (default: <output>/{DDL_NAME}).")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be compacted.")
+    return parser.parse_args()
+
+
+def main():
+    compact(parse_args())
+
+
+if __name__ == "__main__":
+    main()
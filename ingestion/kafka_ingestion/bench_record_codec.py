@@ -0,0 +1,98 @@
+"""
+Compares the record_codec binary encoding with the JSON payload of
+`ayaachi_car_park`: bytes per record (raw and gzip-compressed, as a Kafka
+batch would be) and encode/decode throughput. Decoding JSON includes the
+int/float conversions consumers do; decoding binary yields typed values.
+
+Compressed sizes gzip `--batch-bytes` of messages at a time, like the Kafka
+producer compressing each batch.
+
+Records come from data/dataset.csv (the real car parks) followed by
+`--generated` records from the producer's bulk generator. Every record is
+checked to round-trip through the binary encoding unchanged.
+
+Usage:
+    python bench_record_codec.py --generated 100000 --frame-records 20
+"""
+import argparse
+import gzip
+import json
+import time
+
+from mock_data_producer import (BulkRecordGenerator, DATASET_PATH, RECORD_FIELDS, encode_json_block,
+                                load_replay_rows, make_parking_lots, serialize_record)
+from record_codec import (decode_frame, encode_columns, encode_frame, encode_record, encode_record_body,
+                          to_json_record)
+
+
+def json_decode(value):
+    record = json.loads(value)
+    return (int(record["id"]), int(record["capacity"]), float(record["latitude"]), float(record["longitude"]),
+            int(record["occupancy"]), int(record["queue_length"]), int(record["is_special_day"]))
+
+
+def timed(label, fn, records):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<34} {records / elapsed / 1000:9.0f} k records/s")
+    return result
+
+
+def sizes(label, messages, records, batch_bytes):
+    raw = sum(len(message) for message in messages)
+    compressed, batch, batched = 0, [], 0
+    for message in messages + [None]:
+        if message is None or batched + len(message) > batch_bytes:
+            compressed += len(gzip.compress(b"".join(batch)))
+            batch, batched = [], 0
+        if message is not None:
+            batch.append(message)
+            batched += len(message)
+    print(f"  {label:<34} {raw / records:7.1f} B/record raw, {compressed / records:6.1f} B/record gzip, "
+          f"{len(messages)} messages")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--generated", type=int, default=100000, help="Generated records on top of the dataset.")
+    parser.add_argument("--frame-records", type=int, default=20, help="Records per batched binary frame.")
+    parser.add_argument("--batch-bytes", type=int, default=16384, help="Producer batch size for the gzip sizes.")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    args = parser.parse_args()
+
+    records = [record for _, record in load_replay_rows(args.dataset)]
+    columns = BulkRecordGenerator(make_parking_lots(2000)).generate_block(args.generated)
+    records += [dict(zip(RECORD_FIELDS, row)) for row in zip(*[
+        columns[name].tolist() if hasattr(columns[name], "tolist") else columns[name] for name in RECORD_FIELDS
+    ])]
+    records = [{name: str(value) for name, value in record.items()} for record in records]
+    count = len(records)
+
+    json_messages = [serialize_record(record) for record in records]
+    binary_messages = [encode_record(record) for record in records]
+    frames = [encode_frame([encode_record_body(record) for record in records[index:index + args.frame_records]])
+              for index in range(0, count, args.frame_records)]
+    for record, message in zip(records, binary_messages):
+        assert to_json_record(decode_frame(message)[0]) == record, f"round trip changed {record}"
+
+    print(f"{count} records ({count - args.generated} from the dataset, {args.generated} generated)\n")
+    print("Size:")
+    sizes("JSON", json_messages, count, args.batch_bytes)
+    sizes("binary, one record per message", binary_messages, count, args.batch_bytes)
+    sizes(f"binary, {args.frame_records} records per frame", frames, count, args.batch_bytes)
+
+    print("\nEncode:")
+    timed("JSON json.dumps", lambda: [serialize_record(record) for record in records], count)
+    timed("binary from JSON-style dicts", lambda: [encode_record(record) for record in records], count)
+    timed("JSON block template (producer)", lambda: encode_json_block(columns), args.generated)
+    timed("binary block columns (producer)", lambda: encode_columns(columns), args.generated)
+
+    print("\nDecode:")
+    timed("JSON json.loads + int/float", lambda: [json_decode(message) for message in json_messages], count)
+    timed("binary, one record per message", lambda: [decode_frame(message) for message in binary_messages], count)
+    timed(f"binary, {args.frame_records} records per frame", lambda: [decode_frame(frame) for frame in frames], count)
+
+
+if __name__ == "__main__":
+    main()
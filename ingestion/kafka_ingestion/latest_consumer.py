@@ -0,0 +1,386 @@
+"""
+Streaming consumer that keeps the latest record per car park in HBase.
+
+Replaces the per-record puts of the `CarParkHBaseIngestion` Spark job (and
+the full-table ROW_NUMBER() rewrite in insertion_into_hbase.hql) for the
+`ayaachi_parking_availability_latest` table. Records from the
+`ayaachi_car_park` topic are compacted in memory into the newest record per
+`system_code_number` (by record timestamp, so late or replayed records never
+overwrite newer ones). Changed car parks are written every `--flush-ms` as
+one batched put per car park, and the source offsets are committed only
+after the write succeeds (at-least-once; replays are harmless).
+
+Local stand-ins make it testable without a cluster: `--source file` reads
+the JSON lines written by `mock_data_producer.py --sink file` (with the byte
+offset checkpointed to `--checkpoint`), and `--sink memory` keeps the table
+in memory, optionally charging `--rpc-ms` per HBase round trip:
+
+    python mock_data_producer.py --sink file --output records.jsonl --rate 0 --count 200000 --lots 2000
+    python latest_consumer.py --source file --input records.jsonl --sink memory --rpc-ms 2
+    python latest_consumer.py --no-security --brokers localhost:9092 --hbase-host localhost
+
+Kafka values may be JSON or record_codec binary frames (`--format binary` in
+the producer); for a file source, pass `--format binary` to read the
+producer's length-prefixed binary file.
+"""
+import argparse
+import gzip
+import json
+import os
+import signal
+import struct
+import time
+from datetime import datetime, timezone
+
+from mock_data_producer import KAFKA_BROKERS, KAFKA_TOPIC, SECURITY_CONFIG
+from record_codec import decode_message
+
+HBASE_TABLE = 'ayaachi_parking_availability_latest'
+HBASE_FAMILY = 'data'
+CONSUMER_GROUP = 'ayaachi_latest_consumer'
+FLUSH_MS = 1000  # Coalescing window: changed car parks are written at most this often
+MAX_DIRTY = 5000  # Flush early once this many car parks are waiting
+POLL_RECORDS = 2000
+
+
+def parse_record(record):
+    """
+    Converts a decoded record (JSON or binary) into (system_code_number, record
+    timestamp, HBase columns), computing available_occupancy like the Spark job.
+    """
+    capacity = int(record["capacity"])
+    occupancy = int(record["occupancy"])
+    queue_length = int(record["queue_length"])
+    if "record_timestamp" in record:
+        timestamp = datetime.fromtimestamp(record["record_timestamp"], timezone.utc).replace(tzinfo=None)
+    else:
+        timestamp = datetime.strptime(f"{record['last_updated_date']} {record['last_updated_time']}", "%d-%m-%Y %H:%M:%S")
+    columns = {
+        "capacity": str(capacity),
+        "occupancy": str(occupancy),
+        "available_occupancy": str(capacity - occupancy - queue_length),
+        "queue_length": str(queue_length),
+        "traffic_condition": record["traffic_condition_nearby"],
+        "latitude": str(float(record["latitude"])),
+        "longitude": str(float(record["longitude"])),
+        "last_updated": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    return record["system_code_number"], timestamp, columns
+
+
+class LatestTable:
+    """
+    The newest record per car park, plus the set of car parks changed since
+    the last flush. An update only wins if its record timestamp is not older
+    than the one held, so out-of-order and replayed records are dropped.
+    """
+
+    def __init__(self):
+        self.rows = {}  # system_code_number -> (timestamp, columns)
+        self.dirty = {}  # system_code_number -> time the pending update was received
+        self.received = 0
+        self.applied = 0
+        self.stale = 0
+        self.coalesced = 0
+
+    def seed(self, system_code_number, timestamp, columns):
+        """Loads a row already in HBase without marking it dirty."""
+        self.rows[system_code_number] = (timestamp, columns)
+
+    def update(self, system_code_number, timestamp, columns, received_at):
+        self.received += 1
+        current = self.rows.get(system_code_number)
+        if current is not None and timestamp < current[0]:
+            self.stale += 1
+            return
+        self.rows[system_code_number] = (timestamp, columns)
+        self.applied += 1
+        if system_code_number in self.dirty:
+            self.coalesced += 1
+        self.dirty[system_code_number] = received_at
+
+    def drain(self):
+        """Returns [(system_code_number, columns, received_at)] for the changed car parks and clears them."""
+        changed = [(lot, self.rows[lot][1], received_at) for lot, received_at in self.dirty.items()]
+        self.dirty = {}
+        return changed
+
+
+# Sources
+
+class KafkaSource:
+    """Consumes the topic with auto-commit off; offsets are committed after each flush."""
+
+    def __init__(self, args):
+        from kafka import KafkaConsumer
+
+        self.consumer = KafkaConsumer(
+            args.topic,
+            bootstrap_servers=args.brokers,
+            group_id=args.group,
+            enable_auto_commit=False,
+            auto_offset_reset='earliest',
+            max_poll_records=POLL_RECORDS,
+            **(SECURITY_CONFIG if not args.no_security else {})
+        )
+        self.exhausted = False
+
+    def poll(self, timeout_ms):
+        batches = self.consumer.poll(timeout_ms=timeout_ms)
+        return [message.value for messages in batches.values() for message in messages]
+
+    def commit(self):
+        self.consumer.commit()
+
+    def close(self):
+        self.consumer.close()
+
+
+class FileSource:
+    """
+    Reads JSON lines (or length-prefixed binary messages) from a file,
+    resuming from the byte offset stored in the checkpoint file. With
+    `follow`, keeps waiting for new lines at the end of the file like
+    `tail -f`; otherwise it is exhausted at EOF.
+    """
+
+    def __init__(self, path, checkpoint_path=None, follow=False, length_prefixed=False):
+        self.checkpoint_path = checkpoint_path
+        self.length_prefixed = length_prefixed
+        self.follow = follow and not path.endswith('.gz')
+        self.file = gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+        self.offset = self._load_checkpoint()
+        self.file.seek(self.offset)
+        self.exhausted = False
+
+    def poll(self, timeout_ms):
+        values = []
+        while len(values) < POLL_RECORDS:
+            position = self.file.tell()
+            line = self._read_message()
+            if line is None:
+                # EOF or a partially written line: rewind and wait for more
+                self.file.seek(position)
+                if not values:
+                    if self.follow:
+                        time.sleep(timeout_ms / 1000)
+                    else:
+                        self.exhausted = True
+                break
+            if line.strip():
+                values.append(line)
+        self.offset = self.file.tell()
+        return values
+
+    def _read_message(self):
+        """Returns the next complete message, or None at EOF or on a partially written one."""
+        if self.length_prefixed:
+            header = self.file.read(4)
+            if len(header) < 4:
+                return None
+            length = struct.unpack("<I", header)[0]
+            value = self.file.read(length)
+            return value if len(value) == length else None
+        line = self.file.readline()
+        return line[:-1] if line.endswith(b"\n") else None
+
+    def commit(self):
+        if self.checkpoint_path:
+            tmp_path = self.checkpoint_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({"offset": self.offset}, f)
+            os.replace(tmp_path, self.checkpoint_path)
+
+    def close(self):
+        self.file.close()
+
+    def _load_checkpoint(self):
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                return json.load(f)["offset"]
+        return 0
+
+
+# Sinks
+
+class HBaseSink:
+    """Writes changed rows with one batched mutation request per flush."""
+
+    def __init__(self, args):
+        import happybase
+
+        self.connection = happybase.Connection(host=args.hbase_host, port=args.hbase_port)
+        self.table = self.connection.table(args.table)
+        self.batch_size = args.batch_size
+        self.round_trips = 0
+
+    def load(self):
+        """Yields (system_code_number, columns) for the rows already in the table."""
+        prefix = f"{HBASE_FAMILY}:".encode('utf-8')
+        for row_key, data in self.table.scan(columns=[HBASE_FAMILY.encode('utf-8')]):
+            yield row_key.decode('utf-8'), {
+                key[len(prefix):].decode('utf-8'): value.decode('utf-8') for key, value in data.items()
+            }
+
+    def write(self, rows):
+        with self.table.batch(batch_size=self.batch_size) as batch:
+            for system_code_number, columns in rows:
+                batch.put(system_code_number.encode('utf-8'), {
+                    f"{HBASE_FAMILY}:{name}".encode('utf-8'): value.encode('utf-8') for name, value in columns.items()
+                })
+        self.round_trips += -(-len(rows) // self.batch_size)
+
+    def close(self):
+        self.connection.close()
+
+
+class MemorySink:
+    """HBase stand-in: keeps the table in a dict, charging `rpc_ms` per batched round trip."""
+
+    def __init__(self, batch_size, rpc_ms=0):
+        self.rows = {}
+        self.batch_size = batch_size
+        self.rpc_ms = rpc_ms
+        self.round_trips = 0
+
+    def load(self):
+        return iter(list(self.rows.items()))
+
+    def write(self, rows):
+        round_trips = -(-len(rows) // self.batch_size)
+        time.sleep(self.rpc_ms * round_trips / 1000)
+        self.round_trips += round_trips
+        for system_code_number, columns in rows:
+            self.rows[system_code_number] = dict(columns)
+
+    def close(self):
+        pass
+
+
+# Consumer loop
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class LatestConsumer:
+    def __init__(self, source, sink, flush_ms=FLUSH_MS, max_dirty=MAX_DIRTY):
+        self.source = source
+        self.sink = sink
+        self.flush_interval = flush_ms / 1000
+        self.max_dirty = max_dirty
+        self.table = LatestTable()
+        self.puts = 0
+        self.flushes = 0
+        self.errors = 0
+        self.visible_after = []  # seconds from receiving a record to its row being written
+        self.running = True
+
+    def bootstrap(self):
+        """Seeds the in-memory table from the sink so replays cannot overwrite newer rows."""
+        for system_code_number, columns in self.sink.load():
+            if "last_updated" in columns:
+                timestamp = datetime.strptime(columns["last_updated"], "%Y-%m-%d %H:%M:%S")
+                self.table.seed(system_code_number, timestamp, columns)
+        print(f"Loaded {len(self.table.rows)} existing rows.")
+
+    def run(self):
+        last_flush = time.monotonic()
+        while self.running and not self.source.exhausted:
+            values = self.source.poll(timeout_ms=max(1, int(self.flush_interval * 1000 / 4)))
+            received_at = time.monotonic()
+            for value in values:
+                try:
+                    records = decode_message(value)
+                except ValueError as e:
+                    self.errors += 1
+                    print(f"ERROR decoding message: {e}")
+                    continue
+                for record in records:
+                    try:
+                        self.table.update(*parse_record(record), received_at)
+                    except (ValueError, KeyError) as e:
+                        self.errors += 1
+                        print(f"ERROR processing record: {e}")
+            now = time.monotonic()
+            if now - last_flush >= self.flush_interval or len(self.table.dirty) >= self.max_dirty:
+                self.flush()
+                last_flush = now
+        self.flush()
+
+    def flush(self):
+        changed = self.table.drain()
+        if changed:
+            self.sink.write([(lot, columns) for lot, columns, _ in changed])
+            written_at = time.monotonic()
+            self.visible_after += [written_at - received_at for _, _, received_at in changed]
+            self.puts += len(changed)
+            self.flushes += 1
+        # Offsets only move past records whose rows are written
+        self.source.commit()
+
+    def report(self, elapsed):
+        table = self.table
+        visible = sorted(self.visible_after)
+        print(f"Consumed {table.received} records in {elapsed:.2f} s ({table.received / max(elapsed, 1e-9):.0f} records/s), "
+              f"{table.stale} stale dropped, {table.coalesced} coalesced, {self.errors} errors")
+        print(f"HBase: {self.puts} row puts in {self.sink.round_trips} round trips over {self.flushes} flushes, "
+              f"{len(table.rows)} car parks; {self.puts / max(table.received, 1):.3f} puts per record "
+              f"(the Spark job does 1 put and 1 round trip per record)")
+        print("Visible after ms: " + ", ".join(
+            f"p{int(fraction * 100)} {percentile(visible, fraction) * 1000:.1f}" for fraction in (0.5, 0.95, 0.99)
+        ) + f", max {(visible[-1] if visible else 0) * 1000:.1f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", choices=["kafka", "file"], default="kafka")
+    parser.add_argument("--input", default="mock_records.jsonl", help="JSON lines file for --source file.")
+    parser.add_argument("--format", choices=["json", "binary"], default="json",
+                        help="Encoding of the --source file input (Kafka values are detected per message).")
+    parser.add_argument("--follow", action="store_true", help="Keep reading the input file as it grows.")
+    parser.add_argument("--checkpoint", default=None, help="Offset checkpoint file for --source file.")
+    parser.add_argument("--brokers", nargs="+", default=KAFKA_BROKERS)
+    parser.add_argument("--topic", default=KAFKA_TOPIC)
+    parser.add_argument("--group", default=CONSUMER_GROUP)
+    parser.add_argument("--no-security", action="store_true", help="Connect without SASL_SSL (e.g. a local broker).")
+    parser.add_argument("--sink", choices=["hbase", "memory"], default="hbase")
+    parser.add_argument("--hbase-host", default="localhost")
+    parser.add_argument("--hbase-port", type=int, default=9090)
+    parser.add_argument("--table", default=HBASE_TABLE)
+    parser.add_argument("--rpc-ms", type=float, default=0, help="Simulated round trip time for --sink memory.")
+    parser.add_argument("--flush-ms", type=int, default=FLUSH_MS, help="Coalescing window between HBase writes.")
+    parser.add_argument("--max-dirty", type=int, default=MAX_DIRTY, help="Flush early once this many car parks changed.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Puts per HBase round trip.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.source == "kafka":
+        source = KafkaSource(args)
+    else:
+        source = FileSource(args.input, args.checkpoint, args.follow, length_prefixed=args.format == "binary")
+    sink = HBaseSink(args) if args.sink == "hbase" else MemorySink(args.batch_size, args.rpc_ms)
+    consumer = LatestConsumer(source, sink, flush_ms=args.flush_ms, max_dirty=args.max_dirty)
+
+    def stop(signum, frame):
+        consumer.running = False
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    consumer.bootstrap()
+    print(f"Consuming from {args.topic if args.source == 'kafka' else args.input} into {args.table} ({args.sink})...")
+    start = time.perf_counter()
+    try:
+        consumer.run()
+    finally:
+        consumer.report(time.perf_counter() - start)
+        source.close()
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,63 @@
+"""
+Mock data producer and load generator for the `ayaachi_car_park` topic.
+
+With no arguments it behaves like the original producer: 200 records, one
+every 5 seconds, to the course Kafka cluster. For load tests, raise the
+target rate, the number of synthetic car parks and the number of producer
+processes, tune batching (linger/batch size/compression), or write to a local
+sink instead of Kafka to benchmark offline:
+
+    python mock_data_producer.py --rate 20000 --count 200000 --lots 5000 --processes 4 --linger-ms 20 --compression gzip
+    python mock_data_producer.py --sink file --output records.jsonl.gz --rate 0 --count 500000
+    python mock_data_producer.py --sink null --rate 0 --count 1000000 --processes 4
+
+Records are generated in vectorized blocks (`--generator record` uses the
+original one-record-at-a-time generator). `--replay` streams the real
+data/dataset.csv history instead, at `--speed` times the original pace:
+
+    python mock_data_producer.py --replay --speed 3600 --sink file --output replay.jsonl
+
+`--format binary` sends the compact encoding of record_codec.py instead of
+JSON; with `--frame-records N` up to N records of the same car park share one
+message (the file sink length-prefixes binary messages instead of writing lines):
+
+    python mock_data_producer.py --format binary --frame-records 20 --rate 0 --count 200000 --linger-ms 20
+
+Each run reports the achieved throughput and the send-to-acknowledgement
+latency percentiles (for local sinks, send-to-flush of the batch).
+"""
+import argparse
+import calendar
+import csv
+import gzip
 import json
-import time
+import multiprocessing
+import os
 import random
+import struct
+import time
+import zlib
 from datetime import datetime, timedelta
-from kafka import KafkaProducer
-from faker import Faker
 from typing import Dict
 
+import numpy as np
+
+from record_codec import encode_columns, encode_frame, encode_record_body
+
 
 KAFKA_BROKERS = ['boot-public-byg.mpcs53014kafka.2siu49.c2.kafka.us-east-1.amazonaws.com:9196']
 KAFKA_TOPIC = 'ayaachi_car_park'
 SLEEP_TIME = 5  # Seconds to wait between sending messages
 NUM_MESSAGES = 200 # Total messages to send
 
+# Producer batching defaults (kafka-python defaults: no linger, 16 KB batches)
+LINGER_MS = 0
+BATCH_SIZE = 16384
+REPORT_INTERVAL = 5  # Seconds between progress lines
+BLOCK_SIZE = 4096  # Records generated per vectorized block
+
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "dataset.csv")
+
 
 SECURITY_CONFIG: Dict[str, str] = {
     'security_protocol': 'SASL_SSL',
@@ -35,12 +81,22 @@ PARKING_LOTS = {
     "BHMBCCBRD05": {"cap": 630, "lat": 52.4770, "lon": -1.9030}
 }
 
-fake = Faker()
-producer = KafkaProducer(
-    bootstrap_servers=KAFKA_BROKERS,
-    value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-    **SECURITY_CONFIG # Pass security settings
-)
+
+def make_parking_lots(num_lots, seed=0):
+    """
+    Returns `num_lots` car parks: the real ones from PARKING_LOTS first, then
+    synthetic ones (BHMSYN00001, ...) scattered around Birmingham city centre.
+    """
+    lots = dict(list(PARKING_LOTS.items())[:num_lots])
+    rng = random.Random(seed)
+    for index in range(1, num_lots - len(lots) + 1):
+        lots[f"BHMSYN{index:05d}"] = {
+            "cap": rng.randint(50, 1500),
+            "lat": round(52.4800 + rng.uniform(-0.05, 0.05), 4),
+            "lon": round(-1.8900 + rng.uniform(-0.08, 0.08), 4),
+        }
+    return lots
+
 
 def generate_mock_record(lot_id, data, record_id):
     """Generates a single mock parking record with snake_case keys."""
@@ -80,22 +136,415 @@ def generate_mock_record(lot_id, data, record_id):
     return record, available_occupancy
 
 
-record_counter = 0
-print(f"Starting producer. Sending {NUM_MESSAGES} messages to {KAFKA_TOPIC}...")
+def serialize_record(record):
+    return json.dumps(record).encode('utf-8')
+
+
+# Bulk generation
+
+VEHICLE_TYPES = ["car", "bike", "truck"]
+TRAFFIC_CONDITIONS = ["low", "average", "high"]
+
+# Same bytes as serialize_record() for the same field values
+RECORD_TEMPLATE = (
+    '{"id": "%s", "system_code_number": "%s", "capacity": "%s", "latitude": "%s", "longitude": "%s", '
+    '"occupancy": "%s", "vehicle_type": "%s", "traffic_condition_nearby": "%s", "queue_length": "%s", '
+    '"is_special_day": "%s", "last_updated_date": "%s", "last_updated_time": "%s"}'
+)
+RECORD_FIELDS = ["id", "system_code_number", "capacity", "latitude", "longitude", "occupancy", "vehicle_type",
+                 "traffic_condition_nearby", "queue_length", "is_special_day", "last_updated_date", "last_updated_time"]
+
+
+class BulkRecordGenerator:
+    """
+    Generates blocks of mock records with vectorized sampling. The records
+    follow the same rules as `generate_mock_record`: occupancy between 10%
+    and 95% of capacity, a queue of 1-5 vehicles only above 70% occupancy,
+    `available_occupancy = capacity - occupancy - queue_length`, and a
+    timestamp 1-60 seconds in the past.
+    """
+
+    def __init__(self, lots, seed=0):
+        self.lot_ids = list(lots)
+        self.capacities = np.array([data['cap'] for data in lots.values()], dtype=np.int64)
+        self.latitudes = [str(data['lat']) for data in lots.values()]
+        self.longitudes = [str(data['lon']) for data in lots.values()]
+        # int() truncation of the same float products as generate_mock_record
+        self.min_occupancy = (self.capacities * 0.1).astype(np.int64)
+        self.max_occupancy = (self.capacities * 0.95).astype(np.int64)
+        self.queue_threshold = (self.capacities * 0.7).astype(np.int64)
+        self.rng = np.random.default_rng(seed)
+
+    def generate_block(self, size, first_id=1, id_step=1):
+        """Returns a dict of columns for `size` records with ids first_id, first_id + id_step, ..."""
+        rng = self.rng
+        lots = rng.integers(0, len(self.lot_ids), size)
+        capacities = self.capacities[lots]
+        occupancy = rng.integers(self.min_occupancy[lots], self.max_occupancy[lots] + 1)
+        queue_length = np.where(occupancy > self.queue_threshold[lots], rng.integers(1, 6, size), 0)
+
+        # Only 60 distinct timestamps per block: format each once
+        now = datetime.now().replace(microsecond=0)
+        stamps = [now - timedelta(seconds=offset) for offset in range(61)]
+        dates = [stamp.strftime("%d-%m-%Y") for stamp in stamps]
+        times = [stamp.strftime("%H:%M:%S") for stamp in stamps]
+        epochs = [calendar.timegm(stamp.timetuple()) for stamp in stamps]
+        offsets = rng.integers(1, 61, size).tolist()
+
+        lot_list = lots.tolist()
+        return {
+            "id": [str(first_id + index * id_step) for index in range(size)],
+            "system_code_number": [self.lot_ids[lot] for lot in lot_list],
+            "capacity": capacities,
+            "latitude": [self.latitudes[lot] for lot in lot_list],
+            "longitude": [self.longitudes[lot] for lot in lot_list],
+            "occupancy": occupancy,
+            "vehicle_type": [VEHICLE_TYPES[code] for code in rng.integers(0, 3, size).tolist()],
+            "traffic_condition_nearby": [TRAFFIC_CONDITIONS[code] for code in rng.integers(0, 3, size).tolist()],
+            "queue_length": queue_length,
+            "is_special_day": rng.integers(0, 2, size),
+            "last_updated_date": [dates[offset] for offset in offsets],
+            "last_updated_time": [times[offset] for offset in offsets],
+            "record_timestamp": [epochs[offset] for offset in offsets],
+            "available_occupancy": capacities - occupancy - queue_length,
+        }
+
+
+def encode_json_block(columns):
+    """Serializes a block of columns into one JSON value per record."""
+    fields = [columns[name].tolist() if isinstance(columns[name], np.ndarray) else columns[name]
+              for name in RECORD_FIELDS]
+    return [(RECORD_TEMPLATE % row).encode('utf-8') for row in zip(*fields)]
+
+
+class FrameBuffer:
+    """
+    Groups binary record bodies into frames of up to `frame_records` records
+    of the same car park, so frames keep the per-car-park key and ordering.
+    A frame is sent when it is full or its first record has waited `linger_ms`.
+    """
+
+    def __init__(self, frame_records, linger_ms):
+        self.frame_records = frame_records
+        self.linger = linger_ms / 1000
+        self.pending = {}  # lot id -> (first buffered at, bodies)
+
+    def add(self, lot_id, body):
+        """Returns the [(lot id, frame, record count)] ready to send."""
+        now = time.perf_counter()
+        first_at, bodies = self.pending.setdefault(lot_id, (now, []))
+        bodies.append(body)
+        if len(bodies) >= self.frame_records:
+            del self.pending[lot_id]
+            return [(lot_id, encode_frame(bodies), len(bodies))]
+        if now - first_at >= self.linger:
+            return self.drain(older_than=now - self.linger)
+        return []
+
+    def drain(self, older_than=None):
+        ready = [lot_id for lot_id, (first_at, _) in self.pending.items() if older_than is None or first_at <= older_than]
+        frames = []
+        for lot_id in ready:
+            _, bodies = self.pending.pop(lot_id)
+            frames.append((lot_id, encode_frame(bodies), len(bodies)))
+        return frames
+
+
+# Replay
+
+def load_replay_rows(path=DATASET_PATH):
+    """
+    Reads data/dataset.csv into records in time order, as (epoch seconds, record)
+    pairs with the Kafka field names. `available_occupancy` is not in the
+    dataset; it is derived by the consumers.
+    """
+    rows = []
+    with open(path, newline='') as csv_file:
+        reader = csv.reader(csv_file)
+        next(reader)  # header
+        for row in reader:
+            record = dict(zip(RECORD_FIELDS, row))
+            timestamp = datetime.strptime(f"{record['last_updated_date']} {record['last_updated_time']}", "%d-%m-%Y %H:%M:%S")
+            rows.append((timestamp.timestamp(), record))
+    rows.sort(key=lambda item: item[0])
+    return rows
+
+
+# Sinks
+
+class KafkaSink:
+    """Sends records asynchronously to Kafka, keyed by car park so each car park stays ordered within a partition."""
+
+    def __init__(self, args, latencies, errors):
+        from kafka import KafkaProducer
+
+        self.latencies = latencies
+        self.errors = errors
+        self.topic = args.topic
+        self.producer = KafkaProducer(
+            bootstrap_servers=args.brokers,
+            linger_ms=args.linger_ms,
+            batch_size=args.batch_size,
+            compression_type=args.compression,
+            acks=args.acks,
+            **(SECURITY_CONFIG if not args.no_security else {})
+        )
+
+    def send(self, key, value):
+        sent_at = time.perf_counter()
+        future = self.producer.send(self.topic, key=key, value=value)
+        future.add_callback(lambda _: self.latencies.append(time.perf_counter() - sent_at))
+        future.add_errback(lambda _: self.errors.append(1))
+
+    def close(self):
+        self.producer.flush()
+        self.producer.close()
+
+
+class FileSink:
+    """
+    Local stand-in for a broker: buffers records into batches like the Kafka
+    producer (flushed on `batch_size` bytes or `linger_ms`) and appends them
+    as JSON lines to a file (gzip-compressed if it ends in .gz). With no path
+    the batches are discarded, which measures generation and serialization only.
+    """
+
+    def __init__(self, args, latencies, errors, path=None):
+        self.latencies = latencies
+        self.errors = errors
+        # Binary messages can contain newlines, so they are length-prefixed instead
+        self.length_prefixed = args.format == "binary"
+        self.linger = args.linger_ms / 1000
+        self.batch_size = args.batch_size
+        self.file = None
+        if path:
+            self.file = gzip.open(path, 'ab') if path.endswith('.gz') else open(path, 'ab')
+        self.buffer = []
+        self.sent_at = []
+        self.buffered_bytes = 0
+
+    def send(self, key, value):
+        now = time.perf_counter()
+        self.buffer.append(value)
+        self.sent_at.append(now)
+        self.buffered_bytes += len(value) + 1
+        if self.buffered_bytes >= self.batch_size or now - self.sent_at[0] >= self.linger:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        if self.file is not None and self.length_prefixed:
+            self.file.write(b"".join(struct.pack("<I", len(value)) + value for value in self.buffer))
+        elif self.file is not None:
+            self.file.write(b"\n".join(self.buffer) + b"\n")
+        flushed_at = time.perf_counter()
+        self.latencies.extend(flushed_at - sent_at for sent_at in self.sent_at)
+        self.buffer, self.sent_at, self.buffered_bytes = [], [], 0
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+
+
+def open_sink(args, worker, latencies, errors):
+    if args.sink == "kafka":
+        return KafkaSink(args, latencies, errors)
+    if args.sink == "file":
+        # One file per process so writers do not interleave partial lines
+        path = args.output if args.processes == 1 else f"{args.output}.{worker}"
+        return FileSink(args, latencies, errors, path)
+    return FileSink(args, latencies, errors)
+
+
+# Load generation
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def generated_records(args, worker, count, rate):
+    """
+    Yields (due offset in seconds, lot id, value, available) for this process's
+    generated records; with --format binary the value is an unframed record body.
+    """
+    lots = make_parking_lots(args.lots, seed=args.seed)
+    if args.generator == "record":
+        lot_items = list(lots.items())
+        random.seed(args.seed + worker)
+        for i in range(count):
+            lot_id, data = random.choice(lot_items)
+            mock_data, calculated_avail = generate_mock_record(lot_id, data, i * args.processes + worker + 1)
+            value = serialize_record(mock_data) if args.format == "json" else encode_record_body(mock_data)
+            yield (i / rate if rate else 0), lot_id, value, calculated_avail
+        return
+
+    generator = BulkRecordGenerator(lots, seed=args.seed + worker)
+    # Keep blocks to ~100 ms of sending so generated timestamps stay fresh
+    block_size = min(args.block_size, max(1, int(rate / 10))) if rate else args.block_size
+    done = 0
+    while done < count:
+        size = min(block_size, count - done)
+        columns = generator.generate_block(size, first_id=done * args.processes + worker + 1, id_step=args.processes)
+        values = encode_json_block(columns) if args.format == "json" else encode_columns(columns)
+        for i, (lot_id, value, available) in enumerate(zip(columns["system_code_number"], values,
+                                                           columns["available_occupancy"].tolist())):
+            yield ((done + i) / rate if rate else 0), lot_id, value, available
+        done += size
+
+
+def replayed_records(args, worker, rows):
+    """
+    Yields this process's share of the dataset.csv history, split by car park so
+    each car park stays ordered, due at the original inter-arrival times divided
+    by `--speed`. With `--rebase-time` the timestamps are rewritten to the send time.
+    """
+    if not rows:
+        return
+    first_timestamp = rows[0][0]
+    wall_start = time.time()
+    for timestamp, record in rows:
+        if args.processes > 1 and zlib.crc32(record["system_code_number"].encode('utf-8')) % args.processes != worker:
+            continue
+        due = (timestamp - first_timestamp) / args.speed if args.speed else 0
+        if args.rebase_time:
+            sent_at = datetime.fromtimestamp(wall_start + due)
+            record = dict(record, last_updated_date=sent_at.strftime("%d-%m-%Y"),
+                          last_updated_time=sent_at.strftime("%H:%M:%S"))
+        available = int(record["capacity"]) - int(record["occupancy"]) - int(record["queue_length"])
+        value = serialize_record(record) if args.format == "json" else encode_record_body(record)
+        yield due, record["system_code_number"], value, available
+
+
+def run_producer(args, worker, results):
+    """Produces this process's share of the records at its share of the target rate (or replay pace)."""
+    if args.replay:
+        records = replayed_records(args, worker, load_replay_rows(args.dataset)[:args.count])
+    else:
+        count = args.count // args.processes + (1 if worker < args.count % args.processes else 0)
+        rate = args.rate / args.processes if args.rate > 0 else 0
+        records = generated_records(args, worker, count, rate)
+    latencies, errors = [], []
+    sink = open_sink(args, worker, latencies, errors)
+    frames = FrameBuffer(args.frame_records, args.linger_ms) if args.format == "binary" else None
+
+    sent = sent_bytes = 0
+    start = last_report = time.perf_counter()
+    for due, lot_id, value, calculated_avail in records:
+        if due:
+            # Pace against the schedule rather than sleeping a fixed time per record
+            delay = start + due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        if frames is None:
+            sink.send(lot_id.encode('utf-8'), value)
+            sent += 1
+            sent_bytes += len(value)
+        else:
+            for frame_lot_id, frame, count in frames.add(lot_id, value):
+                sink.send(frame_lot_id.encode('utf-8'), frame)
+                sent += count
+                sent_bytes += len(frame)
+
+        if args.verbose:
+            shown = value.decode('utf-8') if frames is None else f"{len(value)} bytes"
+            print(f"Sent: {lot_id} | Calculated Avail: {calculated_avail} | {shown}")
+        now = time.perf_counter()
+        if worker == 0 and now - last_report >= REPORT_INTERVAL:
+            print(f"[producer 0] {sent} records, {sent / (now - start):.0f} msg/s")
+            last_report = now
+
+    for frame_lot_id, frame, count in (frames.drain() if frames is not None else []):
+        sink.send(frame_lot_id.encode('utf-8'), frame)
+        sent += count
+        sent_bytes += len(frame)
+    sink.close()
+    elapsed = time.perf_counter() - start
+    results.put((sent, sent_bytes, len(errors), elapsed, latencies))
+
+
+def report(results, processes):
+    sent = sent_bytes = errors = 0
+    elapsed = 0.0
+    latencies = []
+    for _ in range(processes):
+        count, worker_bytes, worker_errors, worker_elapsed, worker_latencies = results.get()
+        sent += count
+        sent_bytes += worker_bytes
+        errors += worker_errors
+        elapsed = max(elapsed, worker_elapsed)
+        latencies += worker_latencies
+    latencies.sort()
+    print(f"Sent {sent} records ({sent_bytes / 1e6:.1f} MB) in {elapsed:.2f} s: "
+          f"{sent / elapsed:.0f} msg/s, {sent_bytes / 1e6 / elapsed:.2f} MB/s, {errors} errors")
+    print("Latency ms: " + ", ".join(
+        f"p{int(fraction * 100)} {percentile(latencies, fraction) * 1000:.2f}" for fraction in (0.5, 0.95, 0.99)
+    ) + f", max {(latencies[-1] if latencies else 0) * 1000:.2f} ({len(latencies)} acknowledged)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=None,
+                        help=f"Total records to send (default {NUM_MESSAGES}, or the whole dataset with --replay).")
+    parser.add_argument("--rate", type=float, default=1 / SLEEP_TIME,
+                        help="Target records per second across all processes; 0 for as fast as possible.")
+    parser.add_argument("--lots", type=int, default=len(PARKING_LOTS), help="Number of car parks, synthetic beyond the real ones.")
+    parser.add_argument("--processes", type=int, default=1, help="Producer processes, each with its own producer.")
+    parser.add_argument("--sink", choices=["kafka", "file", "null"], default="kafka")
+    parser.add_argument("--output", default="mock_records.jsonl", help="Output file for --sink file (.gz to compress).")
+    parser.add_argument("--brokers", nargs="+", default=KAFKA_BROKERS)
+    parser.add_argument("--topic", default=KAFKA_TOPIC)
+    parser.add_argument("--no-security", action="store_true", help="Connect without SASL_SSL (e.g. a local broker).")
+    parser.add_argument("--linger-ms", type=int, default=LINGER_MS, help="How long to wait to fill a batch.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Maximum batch size in bytes.")
+    parser.add_argument("--compression", choices=["gzip", "snappy", "lz4", "zstd"], default=None)
+    parser.add_argument("--acks", default=1, type=lambda value: value if value == "all" else int(value))
+    parser.add_argument("--format", choices=["json", "binary"], default="json",
+                        help="Message encoding: the original JSON or the compact record_codec encoding.")
+    parser.add_argument("--frame-records", type=int, default=1,
+                        help="With --format binary, records of one car park per message (waits up to --linger-ms).")
+    parser.add_argument("--generator", choices=["bulk", "record"], default="bulk",
+                        help="Vectorized block generator or the original per-record generator.")
+    parser.add_argument("--block-size", type=int, default=BLOCK_SIZE, help="Records per generated block.")
+    parser.add_argument("--replay", action="store_true", help="Replay data/dataset.csv instead of generating records.")
+    parser.add_argument("--dataset", default=DATASET_PATH, help="CSV history to replay.")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay speed-up over the original inter-arrival times; 0 for as fast as possible.")
+    parser.add_argument("--rebase-time", action="store_true", help="Rewrite replayed timestamps to the send time.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Print every record sent.")
+    args = parser.parse_args()
+    if args.count is None:
+        args.count = NUM_MESSAGES if not args.replay else 2 ** 62
+    # The original one-record-every-5-seconds mode prints each record
+    args.verbose = args.verbose or (not args.replay and 0 < args.rate <= 1)
+    return args
 
-for i in range(NUM_MESSAGES):
-    # Cycle through parking lots
-    lot_id, data = random.choice(list(PARKING_LOTS.items()))
 
-    record_counter += 1
-    mock_data, calculated_avail = generate_mock_record(lot_id, data, record_counter)
+def main():
+    args = parse_args()
+    source = f"{args.dataset} at {args.speed:g}x" if args.replay else f"{args.count} records for {args.lots} car parks"
+    print(f"Starting producer. Sending {source} to "
+          f"{args.topic if args.sink == 'kafka' else args.sink} with {args.processes} process(es)...")
 
-    # Send the message
-    producer.send(KAFKA_TOPIC, value=mock_data)
+    results = multiprocessing.Queue()
+    if args.processes == 1:
+        run_producer(args, 0, results)
+    else:
+        workers = [multiprocessing.Process(target=run_producer, args=(args, worker, results))
+                   for worker in range(args.processes)]
+        for process in workers:
+            process.start()
+    report(results, args.processes)
+    if args.processes > 1:
+        for process in workers:
+            process.join()
+    print("Production complete.")
 
-    print(f"Sent: {mock_data['system_code_number']} | Calculated Avail: {calculated_avail}")
-    print(f"Raw JSON sent: {mock_data}")
-    time.sleep(SLEEP_TIME)
 
-producer.flush()
-print("Production complete.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()